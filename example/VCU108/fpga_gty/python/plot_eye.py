@@ -27,12 +27,13 @@ import argparse
 import matplotlib.pyplot as plt
 import numpy as np
 import os
-import pandas as pd
+
+import xfcp.eyescan
 
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('-i', '--input', type=str, default='', help="input CSV file")
+    parser.add_argument('-i', '--input', type=str, default='', help="input eye scan file (binary or CSV)")
     parser.add_argument('-d', '--directory', type=str, default='.', help="output directory")
     parser.add_argument('-o', '--output', type=str, default=None, help="output file")
     parser.add_argument('-t', '--text', action='store_true', help="add text")
@@ -43,18 +44,9 @@ def main():
     if name is None:
         name = os.path.basename(os.path.splitext(args.input)[0])
 
-    df = pd.read_csv(args.input, comment="#")
-
-    horiz_offsets = df['horiz_offset'].unique()
-    vert_offsets = df['vert_offset'].unique()
-
-    df['ber'] = df['error_count'] / df['bit_count']
-
-    df2 = df.groupby(['horiz_offset', 'vert_offset'], as_index=False)['ber'].sum()
-
-    print(df2)
+    meta, records = xfcp.eyescan.load(args.input)
 
-    ber = df2.pivot_table(index='vert_offset', columns='horiz_offset', values='ber').values
+    horiz_offsets, vert_offsets, ber = xfcp.eyescan.ber_grid(records)
 
     print(ber)
 
@@ -38,6 +38,8 @@ def main():
     parser.add_argument('-p', '--port', type=str, default='/dev/ttyUSB1', help="Port")
     parser.add_argument('-b', '--baud', type=int, default=115200, help="Baud rate")
     parser.add_argument('-H', '--host', type=str, help="Host (i.e. 192.168.1.128:14000)")
+    parser.add_argument('-s', '--soak', type=float, default=0, help="PRBS soak test duration (s)")
+    parser.add_argument('-r', '--line_rate', type=float, default=10.3125e9, help="Line rate (bps)")
 
     args = parser.parse_args()
 
@@ -75,10 +77,8 @@ def main():
     # enumerate i2c bus
 
     print("I2C bus slave addresses:")
-    for k in range(128):
-        n[2].read_i2c(k, 1)
-        if n[2].get_i2c_status() == 0:
-            print(hex(k))
+    for k in n[2].scan():
+        print(hex(k))
 
     # loopback test
 
@@ -152,6 +152,19 @@ def main():
             ch.is_rx_prbs_error(),
             ch.get_rx_prbs_err_count()))
 
+    if args.soak:
+        print("PRBS soak test")
+
+        mon = xfcp.gty_node.PRBSMonitor(xcvr, args.line_rate)
+        mon.run(args.soak)
+
+        for ch, locked, bits, errors, ber, lower, upper in mon.summary():
+            print("[%s] [%s]%s locked: %d  bits: %d  errors: %d  BER: %.3g (%.3g - %.3g)" % (
+                '.'.join(str(x) for x in ch.path),
+                ch.name,
+                ' [{}]'.format(ch.ext_str) if ch.ext_str else '',
+                locked, bits, errors, ber, lower, upper))
+
 
 if __name__ == "__main__":
     main()
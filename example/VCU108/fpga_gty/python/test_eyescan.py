@@ -24,219 +24,13 @@ THE SOFTWARE.
 """
 
 import argparse
-import datetime
 import time
 
 import xfcp.interface
 import xfcp.node
 import xfcp.i2c_node
 import xfcp.gty_node
-
-
-class EyeScanChannel:
-    def __init__(self, xcvr):
-        self.xcvr = xcvr
-
-        self.file = None
-        self.file_name = None
-
-        self.prescale = 4
-        self.horz_start = -32
-        self.horz_stop = 32
-        self.horz_step = 4
-        self.vert_start = -32
-        self.vert_stop = 32
-        self.vert_step = 4
-        self.vs_range = 0
-
-        self.data_width = None
-        self.int_data_width = None
-
-        self.horz_offset = 0
-        self.vert_offset = 0
-        self.ut_sign = 0
-
-        self.data = []
-        self.running = False
-
-    def start(self):
-        self.running = False
-
-        if self.file_name:
-            self.file = open(self.file_name, 'w')
-
-            self.file.write("# eyescan\n")
-            self.file.write(f"# date: {datetime.datetime.now()}\n")
-            self.file.write("# node path: %s\n" % '.'.join(str(x) for x in self.xcvr.path))
-            self.file.write(f"# node name: {self.xcvr.name}\n")
-            if self.xcvr.ext_str:
-                self.file.write(f"# node extended ID: {self.xcvr.ext_str}\n")
-
-        self.data_width = self.xcvr.get_rx_data_width()
-        self.int_data_width = self.xcvr.get_rx_int_data_width()
-
-        if self.file:
-            self.file.write(f"# data width: {self.data_width}\n")
-            self.file.write(f"# int data width: {self.int_data_width}\n")
-            self.file.write(f"# ES prescale: {2**(self.prescale+1)} (raw {self.prescale})\n")
-            self.file.write("horiz_offset,vert_offset,ut_sign,bit_count,error_count\n")
-
-        # init and check for proper alignment
-        self.xcvr.set_es_control(0x00)
-
-        self.xcvr.set_es_prescale(4)
-        self.xcvr.set_es_errdet_en(1)
-
-        if self.xcvr.get_es_mask_width() == 80:
-            self.xcvr.set_es_sdata_mask(0xffffffffff0000000000 | (0xffffffffff >> self.int_data_width))
-            self.xcvr.set_es_qual_mask(0xffffffffffffffffffff)
-        else:
-            self.xcvr.set_es_sdata_mask(0xffffffffffffffffffff00000000000000000000 | (0xffffffffffffffffffff >> self.int_data_width))
-            self.xcvr.set_es_qual_mask(0xffffffffffffffffffffffffffffffffffffffff)
-
-        self.xcvr.set_rx_eyescan_vs_range(self.vs_range)
-
-        self.xcvr.set_es_horz_offset(0x800)
-        self.xcvr.set_rx_eyescan_vs_neg_dir(0)
-        self.xcvr.set_rx_eyescan_vs_code(0)
-        self.xcvr.set_rx_eyescan_vs_ut_sign(0)
-
-        self.xcvr.set_es_eye_scan_en(1)
-
-        self.xcvr.rx_pma_reset()
-        time.sleep(0.5)
-
-        for k in range(10):
-            for k in range(30):
-                if self.xcvr.get_tx_reset_done() and self.xcvr.get_rx_reset_done():
-                    break
-                time.sleep(0.1)
-
-            if not self.xcvr.get_tx_reset_done() or not self.xcvr.get_rx_reset_done():
-                print(f"[{self.xcvr.name}] Error: channel stuck in reset")
-                return
-
-            time.sleep(0.1)
-
-            # check for lock
-            self.xcvr.set_es_control(0x01)
-
-            while not self.xcvr.get_es_control_status() & 1:
-                pass
-
-            self.xcvr.set_es_control(0x00)
-            error_count = self.xcvr.get_es_error_count()
-            sample_count = self.xcvr.get_es_sample_count()*2**(1+4)
-            bit_count = sample_count*self.int_data_width
-
-            ber = error_count/bit_count
-
-            if ber < 0.01:
-                break
-
-            print(f"[{self.xcvr.name}] High BER ({ber:.02f}), resetting eye scan logic")
-
-            self.xcvr.set_es_horz_offset(0x880)
-            self.xcvr.set_eyescan_reset(1)
-            self.xcvr.set_es_horz_offset(0x800)
-            self.xcvr.set_eyescan_reset(0)
-
-        if ber > 0.01:
-            print(f"[{self.xcvr.name}] High BER, alignment failed")
-            return
-
-        # set up for measurement
-        self.horz_offset = self.horz_start
-        self.vert_offset = self.vert_start
-        self.ut_sign = 0
-
-        self.xcvr.set_es_control(0x00)
-        self.xcvr.set_es_prescale(self.prescale)
-        self.xcvr.set_es_errdet_en(1)
-        self.xcvr.set_es_horz_offset((self.horz_offset & 0x7ff) | 0x800)
-        self.xcvr.set_rx_eyescan_vs_neg_dir(self.vert_offset < 0)
-        self.xcvr.set_rx_eyescan_vs_code(abs(self.vert_offset))
-        self.xcvr.set_rx_eyescan_vs_ut_sign(self.ut_sign)
-
-        # start
-        self.xcvr.set_es_control(0x01)
-
-        self.running = True
-
-    def step(self):
-        if not self.running:
-            return False
-
-        if not self.xcvr.get_es_control_status() & 1:
-            return True
-
-        self.xcvr.set_es_control(0x00)
-        error_count = self.xcvr.get_es_error_count()
-        sample_count = self.xcvr.get_es_sample_count()*2**(1+self.prescale)
-        bit_count = sample_count*self.int_data_width
-
-        data = (self.horz_offset, self.vert_offset, self.ut_sign, bit_count, error_count)
-        self.data.append(data)
-
-        line = f"{self.horz_offset},{self.vert_offset},{self.ut_sign},{bit_count},{error_count}"
-
-        print(f"[{self.xcvr.name}] {line}")
-
-        if self.file:
-            self.file.write(f"{line}\n")
-            self.file.flush()
-
-        restart = False
-
-        if not self.ut_sign:
-            self.ut_sign = 1
-            restart = True
-        else:
-            self.ut_sign = 0
-
-        self.xcvr.set_rx_eyescan_vs_ut_sign(self.ut_sign)
-
-        if restart:
-            self.xcvr.set_es_control(0x01)
-            return True
-
-        if self.vert_offset < self.vert_stop:
-            self.vert_offset += self.vert_step
-            restart = True
-        else:
-            self.vert_offset = self.vert_start
-
-        self.xcvr.set_rx_eyescan_vs_neg_dir(self.vert_offset < 0)
-        self.xcvr.set_rx_eyescan_vs_code(abs(self.vert_offset))
-
-        if restart:
-            self.xcvr.set_es_control(0x01)
-            return True
-
-        if self.horz_offset < self.horz_stop:
-            self.horz_offset += self.horz_step
-            restart = True
-        else:
-            # done
-            self.running = False
-
-        self.xcvr.set_es_horz_offset((self.horz_offset & 0x7ff) | 0x800)
-
-        if restart:
-            self.xcvr.set_es_control(0x01)
-            return True
-
-        self.running = False
-        return False
-
-    def run(self):
-        self.start()
-
-        done = False
-        while not done:
-            done = True
-            if self.step():
-                done = False
+import xfcp.eyescan
 
 
 def main():
@@ -340,11 +134,9 @@ def main():
 
     print("Init eye scan")
 
-    es_ch_list = []
-    for ch in xcvr:
-        es_ch = EyeScanChannel(ch)
-        es_ch_list.append(es_ch)
+    es = xfcp.eyescan.EyeScan(xcvr)
 
+    for es_ch in es.channels:
         es_ch.prescale = 8
         es_ch.horz_start = -32
         es_ch.horz_stop = 32
@@ -354,18 +146,21 @@ def main():
         es_ch.vert_step = 12
         es_ch.vs_range = 0
 
-        es_ch.file_name = "eyescan-%s.csv" % '.'.join(str(x) for x in ch.path)
+        es_ch.file_name = "eyescan-%s.eye" % '.'.join(str(x) for x in es_ch.xcvr.path)
+
+    es.start()
 
-        es_ch.start()
+    for es_ch in es.channels:
+        if es_ch.error:
+            print(f"[{es_ch.xcvr.name}] Error: {es_ch.error}")
 
     print("Running measurement")
 
-    done = False
-    while not done:
-        done = True
-        for ch in es_ch_list:
-            if ch.step():
-                done = False
+    while es.poll():
+        time.sleep(es.poll_period)
+
+    for es_ch in es.channels:
+        print(f"[{es_ch.xcvr.name}] {len(es_ch.data)} points")
 
     print("Done")
 
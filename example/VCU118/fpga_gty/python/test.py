@@ -75,10 +75,8 @@ def main():
     # enumerate i2c bus
 
     print("I2C bus slave addresses:")
-    for k in range(128):
-        n[2].read_i2c(k, 1)
-        if n[2].get_i2c_status() == 0:
-            print(hex(k))
+    for k in n[2].scan():
+        print(hex(k))
 
     # loopback test
 
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+
+Copyright (c) 2026 Missing Link Electronics, Inc.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import argparse
+import os
+import random
+import struct
+import timeit
+
+from xfcp.interface import cobs_encode, cobs_decode
+
+
+# byte at a time reference implementation (same as tb/xfcp.py)
+def ref_cobs_encode(block):
+    block = bytearray(block)
+    enc = bytearray()
+
+    seg = bytearray()
+    code = 1
+
+    new_data = True
+
+    for b in block:
+        if b == 0:
+            enc.append(code)
+            enc.extend(seg)
+            code = 1
+            seg = bytearray()
+            new_data = True
+        else:
+            code += 1
+            seg.append(b)
+            new_data = True
+            if code == 255:
+                enc.append(code)
+                enc.extend(seg)
+                code = 1
+                seg = bytearray()
+                new_data = False
+
+    if new_data:
+        enc.append(code)
+        enc.extend(seg)
+
+    return bytes(enc)
+
+
+def ref_cobs_decode(block):
+    block = bytearray(block)
+    dec = bytearray()
+
+    code = 0
+
+    i = 0
+
+    if 0 in block:
+        return None
+
+    while i < len(block):
+        code = block[i]
+        i += 1
+        if i+code-1 > len(block):
+            return None
+        dec.extend(block[i:i+code-1])
+        i += code-1
+        if code < 255 and i < len(block):
+            dec.append(0)
+
+    return bytes(dec)
+
+
+def check(count):
+    blocks = [b'', b'\x00', b'\x00\x00', b'\x01', b'\x01\x00']
+
+    for n in (253, 254, 255, 508, 509):
+        blocks.append(b'\x01'*n)
+        blocks.append(b'\x01'*n + b'\x00')
+        blocks.append(b'\x00' + b'\x01'*n)
+
+    for k in range(count):
+        n = random.randrange(1024)
+        # vary zero density
+        p = random.choice((0.0, 0.01, 0.1, 0.5))
+        blocks.append(bytes(0 if random.random() < p else random.randrange(1, 256) for i in range(n)))
+
+    for block in blocks:
+        enc = cobs_encode(block)
+        if enc != ref_cobs_encode(block):
+            raise Exception("encode mismatch for %r" % block)
+        if cobs_decode(enc) != ref_cobs_decode(enc) or cobs_decode(enc) != block:
+            raise Exception("decode mismatch for %r" % block)
+
+    # malformed input
+    for block in (b'\x05\x01', b'\x01\x00', b'\xff', b'\x02', b'\x03\x01', b'\x02\x01\xff'):
+        if cobs_decode(block) != ref_cobs_decode(block):
+            raise Exception("decode mismatch for %r" % block)
+
+    print("Checked %d blocks against reference implementation" % len(blocks))
+
+
+def packet_block(size):
+    # memory read response: path, tagged rpath, 4 byte address and 2 byte
+    # count, whose zero bytes split the frame into short code groups
+    return bytes([0, 1, 0xfe, 3, 0, 0xff, 0x11, 0, 0x10, 0, 0]) + struct.pack('<H', size) + os.urandom(size)
+
+
+def bench(size, repeat, packet=False):
+    block = packet_block(size) if packet else os.urandom(size)
+    enc = cobs_encode(block)
+
+    number = max(1, 2**20 // size)
+
+    t_ref_enc = min(timeit.repeat(lambda: ref_cobs_encode(block), number=number, repeat=repeat)) / number
+    t_enc = min(timeit.repeat(lambda: cobs_encode(block), number=number, repeat=repeat)) / number
+    t_ref_dec = min(timeit.repeat(lambda: ref_cobs_decode(enc), number=number, repeat=repeat)) / number
+    t_dec = min(timeit.repeat(lambda: cobs_decode(enc), number=number, repeat=repeat)) / number
+
+    print("%6d B%s encode %9.2f us -> %8.2f us (%5.1fx)  decode %9.2f us -> %8.2f us (%5.1fx)" % (
+        size, 'p' if packet else ' ',
+        t_ref_enc*1e6, t_enc*1e6, t_ref_enc/t_enc,
+        t_ref_dec*1e6, t_dec*1e6, t_ref_dec/t_dec))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="Timing repetitions")
+    parser.add_argument('-c', '--check', type=int, default=1000, help="Random blocks to check")
+
+    args = parser.parse_args()
+
+    check(args.check)
+
+    size = 64
+    while size <= 65536:
+        bench(size, args.repeat)
+        size *= 4
+
+    # short packet frames, marked 'p'
+    for size in (16, 64, 224):
+        bench(size, args.repeat, packet=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -34,5 +34,9 @@ setup(
     setup_requires=['setuptools_scm'],
     install_requires=[
         'pyserial',
-    ]
+    ],
+    extras_require={
+        'async': ['pyserial-asyncio'],
+        'eyescan': ['numpy'],
+    }
 )
@@ -0,0 +1,251 @@
+"""
+
+Copyright (c) 2026 Missing Link Electronics, Inc.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import asyncio
+import collections
+import random
+import struct
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from xfcp import packet
+from xfcp import interface
+
+
+def id_payload(ntype, name, extra=b''):
+    p = bytearray(32)
+    struct.pack_into('<H', p, 0, ntype)
+    p[2:2+len(extra)] = extra
+    n = name.encode()[:16]
+    p[16:16+len(n)] = n
+    return bytes(p)
+
+
+class Switch(object):
+    def __init__(self, children, name='XFCP Switch'):
+        self.children = children
+        self.id = id_payload(0x0100, name, bytes([1, len(children)]))
+
+
+class Memory(object):
+    def __init__(self, size=4096, aw=32, dw=32, cw=16, ntype=0x8001, name='RAM'):
+        self.mem = bytearray(size)
+        self.aw = (aw+7)//8
+        self.cw = (cw+7)//8
+        self.id = id_payload(ntype, name, struct.pack('<HHHH', aw, dw, 8, cw))
+
+    def handle(self, req):
+        p = bytes(req.payload)
+        addr = int.from_bytes(p[:self.aw], 'little')
+        count = int.from_bytes(p[self.aw:self.aw+self.cw], 'little')
+        hdr = addr.to_bytes(self.aw, 'little')
+        if req.ptype == 0x10:
+            return 0x11, hdr+count.to_bytes(self.cw, 'little')+bytes(self.mem[addr:addr+count])
+        data = p[self.aw+self.cw:]
+        self.mem[addr:addr+len(data)] = data
+        return 0x13, hdr+len(data).to_bytes(self.cw, 'little')
+
+
+class I2CMaster(object):
+    # command stream model of xfcp_mod_i2c_master; devices maps an address
+    # to a bytearray accessed through a one byte register pointer, and
+    # cycle maps an address to the number of accesses it NACKs after a
+    # write with stop (write cycle)
+    def __init__(self, devices, cycle=None):
+        self.devices = devices
+        self.cycle = cycle or {}
+        self.busy = {}
+        self.ptr = {a: 0 for a in devices}
+        self.addr = 0
+        self.first = True
+        self.missed = 0
+        self.id = id_payload(0x2C01, 'I2C Master')
+        # completed writes, (device address, register pointer at start)
+        self.log = []
+
+    def present(self, addr):
+        if addr not in self.devices:
+            return False
+        if self.busy.get(addr, 0) > 0:
+            self.busy[addr] -= 1
+            return False
+        return True
+
+    def handle(self, req):
+        p = bytes(req.payload)
+        out = bytearray()
+        i = 0
+
+        while i < len(p):
+            c = p[i]
+            i += 1
+            if c & 0x80:
+                if self.addr != c & 0x7f:
+                    self.first = True
+                self.addr = c & 0x7f
+                out.append(c)
+            elif c == 0x40:
+                out += bytes([0x40, 0x08 if self.missed else 0x00])
+                self.missed = 0
+            elif c == 0x60:
+                out += p[i-1:i+2]
+                i += 2
+            else:
+                if c & 0x01:
+                    self.first = True
+                count = 1
+                hdr = bytes([c])
+                if c & 0x10:
+                    count = p[i]
+                    hdr = bytes([c, count])
+                    i += 1
+                ok = self.present(self.addr)
+                if not ok:
+                    self.missed = 1
+                dev = self.devices.get(self.addr)
+                if c & 0x04:
+                    data = p[i:i+count]
+                    i += count
+                    out += hdr+data
+                    if ok:
+                        start = self.ptr[self.addr] if not self.first else data[0]
+                        if self.first:
+                            self.ptr[self.addr] = data[0]
+                            data = data[1:]
+                            self.first = False
+                        for b in data:
+                            dev[self.ptr[self.addr] % len(dev)] = b
+                            self.ptr[self.addr] += 1
+                        if c & 0x08:
+                            self.log.append((self.addr, start))
+                            if self.addr in self.cycle:
+                                self.busy[self.addr] = self.cycle[self.addr]
+                elif c & 0x02:
+                    data = bytearray(b'\xff'*count)
+                    if ok:
+                        for k in range(count):
+                            data[k] = dev[self.ptr[self.addr] % len(dev)]
+                            self.ptr[self.addr] += 1
+                    out += hdr+data
+                if c & 0x08:
+                    self.first = True
+
+        return 0x2D, bytes(out)
+
+
+class ModelInterface(interface.Interface):
+    # synchronous interface to a model tree; responses carry the node path
+    # in path and echo the request rpath, like the switch RTL
+    def __init__(self, root, window=1, shuffle=False, max_packet_size=None, address=None):
+        super().__init__(window)
+        self.root = root
+        self.shuffle = shuffle
+        self.max_packet_size = max_packet_size
+        self.address = address
+        self.rx = collections.deque()
+        self.round_trips = 0
+        self.packets = 0
+
+    def route(self, path):
+        d = self.root
+        for p in path:
+            if not isinstance(d, Switch) or p >= len(d.children):
+                return None
+            d = d.children[p]
+        return d
+
+    def send_packets(self, pkts):
+        self.round_trips += 1
+        super().send_packets(pkts)
+
+    def respond(self, pkt):
+        # response frame for a request, None if no node answers it
+        self.packets += 1
+        data = pkt.build()
+        if self.max_packet_size is not None:
+            assert len(data) <= self.max_packet_size
+        req = packet.parse(bytes(data))
+        d = self.route(req.path)
+        if d is None:
+            return None
+        if req.ptype == 0xfe:
+            ptype, payload = 0xff, d.id
+        else:
+            ptype, payload = d.handle(req)
+        return packet.Packet(payload, tuple(req.path), tuple(req.rpath), ptype).build()
+
+    def send(self, pkt):
+        resp = self.respond(pkt)
+        if resp is None:
+            return
+        if self.shuffle and self.rx and random.random() < 0.5:
+            self.rx.insert(random.randrange(len(self.rx)+1), resp)
+        else:
+            self.rx.append(resp)
+
+    def receive(self):
+        if not self.rx:
+            raise TimeoutError("timed out waiting for response")
+        return packet.parse(bytes(self.rx.popleft()))
+
+
+class AsyncModelInterface(interface.AsyncInterface):
+    # asyncio interface to a model tree; each response is delivered through
+    # call_later after delay(request) seconds, or never if that is None
+    def __init__(self, root, timeout=1, window=8, max_packet_size=None, delay=None):
+        super().__init__(timeout, window)
+        self.model = ModelInterface(root, max_packet_size=max_packet_size)
+        self.max_packet_size = max_packet_size
+        self.delay = delay or (lambda pkt: 0)
+        self.sent = []
+
+    async def open(self):
+        pass
+
+    def close(self):
+        self.connection_lost(None)
+
+    def send(self, pkt):
+        self.sent.append(pkt)
+        resp = self.model.respond(pkt)
+        delay = self.delay(pkt)
+        if resp is not None and delay is not None:
+            asyncio.get_event_loop().call_later(delay, self.packet_received, packet.parse(resp))
+
+
+def quad(q):
+    return Switch([Memory(1 << 12, aw=16, dw=16, ntype=0x8A83, name='CH%d' % c) for c in range(4)] +
+        [Memory(1 << 12, aw=16, dw=16, ntype=0x8A82, name='COM')], name='Quad %d' % q)
+
+
+def tree():
+    # 53 nodes, 4 levels
+    return Switch([
+        Memory(4096, name='RAM'),
+        Switch([quad(q) for q in range(4)]),
+        Switch([quad(q) for q in range(4, 8)]),
+        I2CMaster({0x50: bytearray(256)}),
+    ])
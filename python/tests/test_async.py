@@ -0,0 +1,258 @@
+import asyncio
+import random
+
+import pytest
+
+import model
+
+from xfcp import gty_node
+from xfcp import i2c_node
+from xfcp import interface
+from xfcp import node
+from xfcp import packet
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_coroutines_on_sync_interface():
+    intf = model.ModelInterface(model.tree(), window=8, max_packet_size=64)
+    root = intf.enumerate()
+    ram = root.find_by_type(node.MemoryNode)[0]
+    ch = root.find_by_type(gty_node.GTYE3ChannelNode)[0]
+    i2c = root.find_by_type(i2c_node.I2CNode)[0]
+
+    async def main():
+        await ram.write_dword_async(0, 0x12345678)
+        assert await ram.read_dword_async(0) == 0x12345678
+
+        # chunked at 64 byte packets
+        data = bytes(range(256))
+        assert await ram.write_async(0x100, data) == len(data)
+        assert await ram.read_async(0x100, len(data)) == data
+        assert await ram.read_scattered_async([0x100, 0x104, 0x1f0], ws=4) == \
+            [int.from_bytes(data[k:k+4], 'little') for k in (0, 4, 0xf0)]
+
+        await ch.write_word_async(0x10, 0xabcd)
+        assert await ch.read_word_async(0x10) == 0xabcd
+        assert await i2c.scan_async() == [0x50]
+
+    run(main())
+
+
+def test_late_response_is_not_taken_for_the_next():
+    # the first read times out and its response arrives while the second
+    # read is in flight, even with a window of one
+    delays = iter([0.25, 0.15])
+    intf = model.AsyncModelInterface(model.Switch([model.Memory()]), timeout=0.2, window=1,
+        delay=lambda pkt: next(delays, 0) if pkt.ptype == 0x10 else 0)
+
+    async def main():
+        root = await intf.enumerate()
+        ram = root.children[0]
+        await ram.write_async(0, b'\x11'*4)
+        await ram.write_async(4, b'\x22'*4)
+        try:
+            await ram.read_async(0, 4)
+        except asyncio.TimeoutError:
+            pass
+        else:
+            assert False, "read did not time out"
+        return await ram.read_async(4, 4)
+
+    assert run(main()) == b'\x22'*4
+
+
+def shuffled(pkt):
+    # random delays, so that responses come back out of order
+    return random.random()*0.01
+
+
+def tree_shape(root):
+    return sorted((n.path, n.ntype, n.name) for n in root.find_by_type(node.Node))
+
+
+@pytest.mark.parametrize('window', [1, 8])
+def test_enumerate(window):
+    intf = model.AsyncModelInterface(model.tree(), window=window, delay=shuffled)
+    ref = model.ModelInterface(model.tree()).enumerate()
+
+    root = run(intf.enumerate())
+    assert tree_shape(root) == tree_shape(ref)
+    assert len(intf.sent) == 53
+    assert not intf._in_flight
+
+
+def test_chunked_read_write():
+    intf = model.AsyncModelInterface(model.tree(), window=4, max_packet_size=64, delay=shuffled)
+    data = bytes(random.randrange(256) for k in range(1000))
+
+    async def main():
+        root = await intf.enumerate()
+        ram = root.find_by_type(node.MemoryNode)[0]
+        n = len(intf.sent)
+        assert await ram.write_async(0x10, data) == len(data)
+        assert len(intf.sent)-n == -(-len(data)//ram.max_transfer_size())
+        assert await ram.read_async(0x10, len(data)) == data
+        assert await ram.read_words_async(0x10, 4, 4) == [int.from_bytes(data[k:k+4], 'little') for k in range(0, 16, 4)]
+        return ram
+
+    ram = run(main())
+    assert ram.max_transfer_size() < 64
+
+
+def test_out_of_order_responses():
+    # every response arrives after all later ones
+    intf = model.AsyncModelInterface(model.tree(), window=16)
+
+    async def main():
+        root = await intf.enumerate()
+        ram = root.find_by_type(node.MemoryNode)[0]
+        await ram.write_dwords_async(0, list(range(100, 116)))
+        intf.delay = lambda pkt: 0.02-0.001*(len(intf.sent) % 16)
+        return await asyncio.gather(*[ram.read_dword_async(4*k) for k in range(16)])
+
+    assert run(main()) == list(range(100, 116))
+    assert not intf._in_flight
+
+
+def test_node_coroutines():
+    intf = model.AsyncModelInterface(model.tree(), delay=shuffled)
+
+    async def main():
+        root = await intf.enumerate()
+        ch = root.find_by_type(gty_node.GTYE3ChannelNode)[0]
+        await ch.set_es_prescale_async(5)
+        await ch.set_es_control_async(3)
+        await ch.set_es_qualifier_async(0x123456789abcdef)
+        assert await ch.get_es_prescale_async() == 5
+        assert await ch.read_word_async(0x003c*2) == 0x0c05
+        assert await ch.get_es_qualifier_async() == 0x123456789abcdef
+
+        i2c = root.find_by_type(i2c_node.I2CNode)[0]
+        assert await i2c.scan_async() == [0x50]
+        tx = i2c.transaction()
+        tx.write_reg(0x50, b'\x10\x01\x02\x03')
+        tx.write_read(0x50, b'\x10', 3)
+        assert (await tx.execute_async())[-1].value == b'\x01\x02\x03'
+
+    run(main())
+
+
+def test_timeout():
+    intf = model.AsyncModelInterface(model.tree(), timeout=0.05)
+
+    async def main():
+        root = await intf.enumerate()
+        ram = root.find_by_type(node.MemoryNode)[0]
+        intf.delay = lambda pkt: None
+        with pytest.raises(asyncio.TimeoutError):
+            await ram.read_dword_async(0)
+        assert not intf._in_flight
+
+        # later requests still work
+        intf.delay = lambda pkt: 0
+        return await ram.read_dword_async(0)
+
+    assert run(main()) == 0
+
+
+def test_connection_lost():
+    intf = model.AsyncModelInterface(model.tree())
+
+    async def main():
+        root = await intf.enumerate()
+        ram = root.find_by_type(node.MemoryNode)[0]
+        intf.delay = lambda pkt: None
+        txns = [ram.submit_read(0, 4) for k in range(3)]
+        asyncio.get_event_loop().call_later(0.01, intf.connection_lost, OSError("link down"))
+        return await asyncio.gather(*txns, return_exceptions=True)
+
+    res = run(main())
+    assert all(isinstance(r, OSError) for r in res)
+    assert not intf._in_flight
+
+
+class ModelServer(asyncio.DatagramProtocol):
+    # UDP endpoint in front of a model tree
+    def __init__(self, root):
+        self.model = model.ModelInterface(root)
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        req = packet.parse(data)
+        resp = self.model.respond(packet.Packet(req.payload, req.path, req.rpath, req.ptype))
+        if resp is not None:
+            self.transport.sendto(resp, addr)
+
+
+def test_udp_interface():
+    async def main():
+        loop = asyncio.get_event_loop()
+        server, proto = await loop.create_datagram_endpoint(lambda: ModelServer(model.tree()), local_addr=('127.0.0.1', 0))
+        port = server.get_extra_info('sockname')[1]
+        try:
+            async with interface.AsyncUDPInterface('127.0.0.1:%d' % port, timeout=1) as intf:
+                root = await intf.enumerate()
+                ram = root.find_by_type(node.MemoryNode)[0]
+                data = bytes(range(256))*12
+                assert await ram.write_async(0, data) == len(data)
+                assert await ram.read_async(0, len(data)) == data
+                return len(root.find_by_type(node.Node))
+        finally:
+            server.close()
+
+    assert run(main()) == 52
+
+
+class ModelSerialWriter(object):
+    # stream writer that answers COBS framed requests from a model tree
+    def __init__(self, root, reader):
+        self.model = model.ModelInterface(root)
+        self.reader = reader
+
+    def write(self, data):
+        for frame in data.split(b'\x00')[:-1]:
+            req = packet.parse(interface.cobs_decode(frame))
+            resp = self.model.respond(packet.Packet(req.payload, req.path, req.rpath, req.ptype))
+            if resp is not None:
+                asyncio.get_event_loop().call_soon(self.reader.feed_data, interface.cobs_encode(resp)+b'\x00')
+
+    def close(self):
+        pass
+
+
+def open_serial(intf):
+    # what open() does, minus pyserial-asyncio
+    intf.reader = asyncio.StreamReader()
+    intf.writer = ModelSerialWriter(model.tree(), intf.reader)
+    intf._reader_task = asyncio.ensure_future(intf._run_reader())
+
+
+def test_serial_interface():
+    intf = interface.AsyncSerialInterface(timeout=1)
+
+    async def main():
+        open_serial(intf)
+        try:
+            root = await intf.enumerate()
+            ram = root.find_by_type(node.MemoryNode)[0]
+            await ram.write_async(0, bytes(range(100)))
+            assert await ram.read_async(0, 100) == bytes(range(100))
+
+            # a closed link fails requests in flight
+            reader = intf.reader
+            intf.writer.write = lambda data: asyncio.get_event_loop().call_soon(reader.feed_eof)
+            with pytest.raises(asyncio.IncompleteReadError):
+                await ram.read_dword_async(0)
+        finally:
+            intf.close()
+
+    run(main())
@@ -0,0 +1,210 @@
+import pytest
+
+import model
+
+from xfcp import node
+from xfcp import enum_cache
+from xfcp import interface
+import xfcp.gty_node
+import xfcp.i2c_node
+
+
+def check_tree(root):
+    assert root.name == 'XFCP Switch'
+    assert [n.name for n in root] == ['RAM', 'XFCP Switch', 'XFCP Switch', 'I2C Master']
+    assert isinstance(root[3], xfcp.i2c_node.I2CNode)
+    ch = root.get_by_path('2.1.3')
+    assert ch.name == 'CH3' and ch.path == (2, 1, 3) and ch.parent is root[2][1]
+    assert isinstance(ch, xfcp.gty_node.GTYE3ChannelNode)
+    assert len(root.find_by_type(node.Node)) == 52
+    assert len(root.find_by_type(0x8A83)) == 32
+    assert root.get_by_name('Quad 6') is root[2][2]
+
+
+@pytest.mark.parametrize('window', [1, 8])
+@pytest.mark.parametrize('lazy', [False, True])
+def test_enumerate(window, lazy):
+    intf = model.ModelInterface(model.tree(), window=window, shuffle=True)
+    root = intf.enumerate(lazy=lazy)
+    check_tree(root)
+
+    root[0].write(0x10, b'abcd')
+    assert root[0].read(0x10, 4) == b'abcd'
+    assert root.get_by_path('1.0.4').read(0, 2) == b'\x00\x00'
+
+
+def test_enumerate_round_trips():
+    intf = model.ModelInterface(model.tree(), window=8)
+    intf.enumerate()
+    # one round trip per tree level
+    assert intf.round_trips == 4
+    assert intf.packets == 53
+
+
+def test_lazy_get_by_path():
+    intf = model.ModelInterface(model.tree(), window=8)
+    root = intf.enumerate(lazy=True)
+    assert intf.packets == 1
+
+    assert root.get_by_path((1, 2, 3)).name == 'CH3'
+    # root, root ports, switch 1 ports, quad 2 ports
+    assert intf.round_trips == 4
+    assert root[2]._children is None
+
+
+def test_enumerate_cache(tmp_path):
+    fn = str(tmp_path / 'enum.json')
+    t = model.tree()
+
+    intf = model.ModelInterface(t, window=8, address='model:0')
+    check_tree(intf.enumerate(cache=fn))
+
+    intf = model.ModelInterface(t, window=8, address='model:0')
+    root = intf.enumerate(cache=fn, lazy=True)
+    assert intf.packets == 1
+    check_tree(root)
+    assert intf.packets == 1
+
+    # unchanged node: a failed access keeps the cache
+    intf._check_cached_node((2, 1, 3))
+    assert intf._cache is not None
+
+    # replaced node: re-identification drops the cache entry
+    t.children[0] = model.Memory(4096, name='RAM X')
+    intf._check_cached_node((0,))
+    assert intf._cache is None
+    assert enum_cache.EnumerationCache(fn).load('model:0', root.id_pkt) is None
+
+
+
+def test_cache_missing_node(tmp_path):
+    fn = str(tmp_path / 'enum.json')
+    t = model.tree()
+    model.ModelInterface(t, address='model:0').enumerate(cache=fn)
+
+    intf = model.ModelInterface(t, address='model:0')
+    root = intf.enumerate(cache=fn)
+    t.children[0] = None
+
+    with pytest.raises(interface.StaleEnumerationError) as exc:
+        root[0].read(0, 4)
+    assert isinstance(exc.value.__cause__, TimeoutError)
+
+    assert intf._cache is None
+    assert enum_cache.EnumerationCache(fn).load('model:0', root.id_pkt) is None
+
+    # the stale tree is dropped, the next get_root() enumerates the design
+    t.children[0] = model.Memory(4096, name='RAM Y')
+    assert intf.get_root() is not root
+    assert intf.get_root()[0].name == 'RAM Y'
+
+
+def test_timeout_without_cache_is_not_stale():
+    t = model.tree()
+    intf = model.ModelInterface(t)
+    root = intf.enumerate()
+    t.children[0] = None
+
+    with pytest.raises(TimeoutError):
+        root[0].read(0, 4)
+    assert intf.get_root() is root
+
+
+class FailingInterface(model.ModelInterface):
+    fail = False
+
+    def send(self, pkt):
+        if self.fail:
+            raise OSError("link down")
+        super().send(pkt)
+
+
+def test_cache_transport_error(tmp_path):
+    fn = str(tmp_path / 'enum.json')
+    t = model.tree()
+    model.ModelInterface(t, address='model:0').enumerate(cache=fn)
+
+    intf = FailingInterface(t, address='model:0')
+    root = intf.enumerate(cache=fn)
+    intf.fail = True
+
+    with pytest.raises(OSError):
+        root[0].read(0, 4)
+    with pytest.raises(OSError):
+        intf._check_cached_node((0,))
+
+    assert intf._cache is not None
+    assert enum_cache.EnumerationCache(fn).load('model:0', root.id_pkt) is not None
+
+
+def test_unknown_response_path():
+    intf = model.ModelInterface(model.tree())
+    with pytest.raises(TimeoutError):
+        intf.identify_paths([(7,)])
+
+
+def test_lazy_lookups():
+    intf = model.ModelInterface(model.tree(), window=8)
+    root = intf.enumerate(lazy=True)
+
+    # subtree is loaded one tree level per round trip
+    assert len(root[1].find_by_type(0x8A83)) == 16
+    assert intf.round_trips == 4
+    assert root[2]._children is None
+
+    assert root.get_by_name('Quad 5') is root[2][1]
+    assert intf.round_trips == 6
+    assert root.index.is_loaded()
+
+    check_tree(root)
+    assert intf.round_trips == 6
+
+
+def walk(n):
+    # depth first, the order the index lookups return nodes in
+    yield n
+    for c in n.children:
+        yield from walk(c)
+
+
+def test_index_lookups():
+    root = model.ModelInterface(model.tree(), window=8).enumerate()
+    nodes = list(walk(root))
+
+    for n in nodes:
+        assert root.get_by_path(n.path) is n
+        assert root.get_by_path(n.path_string()) is n
+    assert root.get_by_path('1.7') is None
+    assert root[1].get_by_path((3, 4)) is root[1][3][4]
+
+    for sub in (root, root[1], root[2][1], root[0]):
+        below = list(walk(sub))[1:]
+        for t in (0x8A83, 0x8A82, 0x0100):
+            assert sub.find_by_type(t) == [n for n in below if n.ntype == t]
+        assert sub.find_by_type(0x8A80, prefix=12) == [n for n in below if n.ntype & 0xfff0 == 0x8A80]
+        assert sub.find_by_type(node.MemoryNode) == [n for n in below if isinstance(n, node.MemoryNode)]
+        for name in ('CH2', 'COM', 'Quad 5', 'RAM'):
+            first = [n for n in below if n.name == name]
+            assert sub.get_by_name(name) is (first[0] if first else None)
+
+    # class lookups include subclasses
+    assert len(root.find_by_type(node.MemoryNode)) == 41
+    assert root[2][3].get_by_name('CH0', recursive=False) is root[2][3][0]
+    assert root.get_by_name('CH0', recursive=False) is None
+
+
+def test_index_replace_and_remove():
+    root = model.ModelInterface(model.tree(), window=8).enumerate()
+    idx = root.index
+    ch = root.get_by_path((1, 0, 0))
+
+    ram = node.enumerate_interface(root.interface, ch.path, ch.parent, model.ModelInterface(model.tree()).identify((0,)))
+    assert idx.get(ch.path) is ram
+    assert root.get_by_name('RAM', recursive=True) is root[0]
+    assert root[1].get_by_name('RAM') is ram
+    assert len(root.find_by_type(0x8A83)) == 31
+
+    idx.remove(ram)
+    assert idx.get(ch.path) is None
+    assert root[1].get_by_name('RAM') is None
+    assert 'RAM' in idx.names and len(idx.names['RAM']) == 1
@@ -0,0 +1,165 @@
+import json
+import struct
+
+import pytest
+
+import model
+
+from xfcp import eyescan
+from xfcp import gty_node
+
+# eye scan error count, sample count, status (byte addresses)
+ES = 0x0251*2
+ES_CONTROL = 0x3c*2
+
+
+def ber_at(h, v):
+    d = max(abs(h)/16, abs(v)/60)
+    return 0.0 if d < 1 else min(0.5, 1e-10*100**((d-1)*10))
+
+
+class GTModel(model.Memory):
+    # GTYE3 channel with an eye scan engine that counts samples on every
+    # status read; errors follow ber_at
+    def __init__(self):
+        super().__init__(1 << 17, aw=16, dw=16, ntype=0x8A83, name='GTY CH')
+        self.set(0xfe00, 0x0500)
+        self.running = False
+        self.dead = False
+
+    def get(self, a):
+        return int.from_bytes(self.mem[a:a+2], 'little')
+
+    def set(self, a, v):
+        self.mem[a:a+2] = v.to_bytes(2, 'little')
+
+    def handle(self, req):
+        addr = int.from_bytes(bytes(req.payload[:2]), 'little')
+        count = int.from_bytes(bytes(req.payload[2:4]), 'little')
+        if req.ptype == 0x10 and addr <= ES+4 < addr+count and self.running:
+            self.samples = min(0xffff, self.samples+max(1, (0xffff*16) >> self.prescale))
+            self.set(ES, min(0xffff, int(self.samples*2**(self.prescale+1)*32*self.ber)))
+            self.set(ES+2, self.samples)
+            self.set(ES+4, 1 if self.samples == 0xffff else 0)
+        prev = self.get(ES_CONTROL) >> 10
+        ret = super().handle(req)
+        ctrl = self.get(ES_CONTROL) >> 10
+        if req.ptype == 0x12 and addr <= ES_CONTROL < addr+count:
+            if ctrl & 1 and not prev & 1:
+                h = self.get(0x4f*2) >> 4
+                h = (h & 0x7ff)-(0x800 if h & 0x400 else 0)
+                vr = self.get(0x97*2)
+                v = -((vr >> 2) & 0x7f) if vr & 0x400 else (vr >> 2) & 0x7f
+                self.prescale = self.get(ES_CONTROL) & 0x1f
+                self.ber = ber_at(h, v)
+                self.samples = 0
+                self.running = True
+                for a in (ES, ES+2, ES+4):
+                    self.set(a, 0)
+            elif not ctrl & 1:
+                self.running = False
+        return ret
+
+
+class DeadModelInterface(model.ModelInterface):
+    def send(self, pkt):
+        d = self.route(pkt.path)
+        if isinstance(d, GTModel) and d.dead:
+            return
+        super().send(pkt)
+
+
+def make(n=2):
+    devs = [GTModel() for k in range(n)]
+    intf = DeadModelInterface(model.Switch(devs), window=8)
+    chs = intf.enumerate().find_by_type(gty_node.GTYE3ChannelNode)
+    es = eyescan.EyeScan(chs, poll_period=0)
+    for ch in es.channels:
+        ch.prescale = 6
+        ch.horz_start, ch.horz_stop, ch.horz_step = -32, 32, 8
+        ch.vert_start, ch.vert_stop, ch.vert_step = -120, 120, 40
+    return es, devs, chs
+
+
+def test_scan_restores_cache():
+    es, devs, chs = make()
+    chs[1].enable_cache()
+    es.run()
+
+    for ch in es.channels:
+        assert ch.error is None
+        assert [d[:3] for d in ch.data] == list(ch.points())
+    assert not chs[0].cache_enabled
+    assert chs[1].cache_enabled
+
+
+def test_failed_scan_restores_cache():
+    es, devs, chs = make()
+    es.start()
+    assert chs[0].cache_enabled
+
+    devs[1].dead = True
+    with pytest.raises(TimeoutError):
+        while es.poll():
+            pass
+
+    assert not es.running()
+    assert not chs[0].cache_enabled and not chs[1].cache_enabled
+
+
+@pytest.mark.parametrize('ext', ['eye', 'csv'])
+def test_adaptive_scan_flags_filled_points(tmp_path, ext):
+    np = pytest.importorskip('numpy')
+
+    reported = []
+    es, devs, chs = make(1)
+    es.callback = lambda ch, data: reported.append(data)
+    ch = es.channels[0]
+    ch.adaptive = True
+    ch.prescale = 8
+    ch.horz_start, ch.horz_stop, ch.horz_step = -32, 32, 2
+    ch.vert_start, ch.vert_stop, ch.vert_step = -120, 120, 6
+    ch.file_name = str(tmp_path / ('scan.'+ext))
+    es.run()
+
+    measured = [d for d in ch.data if not d[5]]
+    filled = [d for d in ch.data if d[5]]
+    assert filled and len(measured) == len(ch.results)
+    horz, vert = ch.grid()
+    assert sorted(d[:3] for d in ch.data) == sorted((h, v, u) for h in horz for v in vert for u in (0, 1))
+    assert reported == ch.data
+
+    meta, records = eyescan.load(ch.file_name)
+    assert int(records['filled'].sum()) == len(filled)
+    assert [tuple(int(x) for x in r) for r in records] == ch.data
+
+    horz, vert, ber = eyescan.ber_grid(records)
+    assert not np.isnan(ber).any()
+    horz, vert, ber = eyescan.ber_grid(records, filled=False)
+    assert np.isnan(ber).sum() == len({d[:2] for d in filled} - {d[:2] for d in measured})
+
+
+def test_load_csv_without_filled_column(tmp_path):
+    pytest.importorskip('numpy')
+
+    fn = tmp_path / 'old.csv'
+    fn.write_text("# eyescan\n# ES prescale: 32 (raw 4)\nhoriz_offset,vert_offset,ut_sign,bit_count,error_count\n0,0,0,1000,0\n4,0,1,1000,5\n")
+    meta, records = eyescan.load(str(fn))
+    assert meta['ES prescale'] == 4
+    assert list(records['filled']) == [0, 0]
+    assert list(records['error_count']) == [0, 5]
+
+
+def test_load_eye_without_filled_field(tmp_path):
+    pytest.importorskip('numpy')
+
+    fn = tmp_path / 'old.eye'
+    header = json.dumps({'ES prescale': 4}).encode()
+    old = struct.Struct('<hhBQQ')
+    fn.write_bytes(eyescan.FILE_MAGIC + struct.pack('<I', len(header)) + header +
+        old.pack(0, 0, 0, 1000, 0) + old.pack(4, 0, 1, 1000, 5))
+    meta, records = eyescan.load(str(fn))
+    assert meta == {'ES prescale': 4}
+    assert list(records['filled']) == [0, 0]
+    assert list(records['horz']) == [0, 4]
+    assert list(records['error_count']) == [0, 5]
@@ -0,0 +1,236 @@
+import pytest
+
+import model
+
+from xfcp import gty_node
+
+
+CHANNELS = [(0x8A81, gty_node.GTHE3ChannelNode), (0x8A91, gty_node.GTHE4ChannelNode),
+    (0x8A83, gty_node.GTYE3ChannelNode), (0x8A93, gty_node.GTYE4ChannelNode)]
+
+
+def make(ntype=0x8A83):
+    dev = model.Memory(1 << 16, aw=16, dw=16, ntype=ntype, name='GT')
+    intf = model.ModelInterface(model.Switch([dev]), window=8)
+    return intf.enumerate()[0], dev, intf
+
+
+def peek(dev, a):
+    return int.from_bytes(dev.mem[a:a+2], 'little')
+
+
+def poke(dev, a, v):
+    dev.mem[a:a+2] = v.to_bytes(2, 'little')
+
+
+def test_cache_write_through():
+    ch, dev, intf = make()
+    ch.enable_cache()
+    poke(dev, 0x10, 0x1234)
+
+    assert ch.read_word(0x10) == 0x1234
+    n = intf.packets
+    assert ch.read_word(0x10) == 0x1234
+
+    # masked write takes the old value from the shadow, no read
+    ch.masked_write(0x10, 0x00f0, 0x0050)
+    assert intf.packets-n == 1
+    assert peek(dev, 0x10) == 0x1254
+    assert ch.read_word(0x10) == 0x1254
+
+    # ranged writes update every register covered
+    ch.write_words(0x20, [1, 2, 3])
+    n = intf.packets
+    assert [ch.read_word(a) for a in (0x20, 0x22, 0x24)] == [1, 2, 3]
+    assert intf.packets == n
+
+
+def test_cache_partial_write_drops_entry():
+    ch, dev, intf = make()
+    ch.enable_cache()
+    poke(dev, 0x30, 0xaaaa)
+    assert ch.read_word(0x30) == 0xaaaa
+
+    ch.write_byte(0x31, 0x55)
+    assert 0x30 not in ch.cache
+    assert ch.read_word(0x30) == 0x55aa
+
+
+def test_cache_invalidate_and_disable():
+    ch, dev, intf = make()
+    ch.enable_cache()
+    ch.read_word(0x40)
+    ch.read_word(0x42)
+
+    # the shadow does not see changes made behind its back
+    poke(dev, 0x40, 7)
+    poke(dev, 0x42, 8)
+    assert (ch.read_word(0x40), ch.read_word(0x42)) == (0, 0)
+
+    ch.invalidate(0x40)
+    assert (ch.read_word(0x40), ch.read_word(0x42)) == (7, 0)
+    ch.invalidate()
+    assert ch.read_word(0x42) == 8
+
+    ch.enable_cache(False)
+    poke(dev, 0x42, 9)
+    assert ch.read_word(0x42) == 9
+    assert not ch.cache
+
+
+@pytest.mark.parametrize('ntype,cls', CHANNELS)
+def test_cache_volatile_regs(ntype, cls):
+    ch, dev, intf = make(ntype)
+    assert type(ch) is cls
+    ch.enable_cache()
+
+    # status, reset and counters are always read from the device
+    for a in sorted(ch.volatile_regs):
+        assert ch.read_word(a) == 0
+        ch.write_word(a, 0x0101)
+        poke(dev, a, 0x0202)
+        assert ch.read_word(a) == 0x0202
+        assert a not in ch.cache
+
+    poke(dev, 0xfe06, 0x0008)
+    assert ch.is_rx_prbs_locked()
+    poke(dev, 0xfe06, 0x0000)
+    assert not ch.is_rx_prbs_locked()
+
+
+def test_cache_scattered_reads():
+    ch, dev, intf = make()
+    ch.enable_cache()
+    for a in (0x50, 0x52, 0x60):
+        poke(dev, a, a)
+
+    assert ch.read_scattered([0x50, 0x52, 0x60, 0xfe06]) == [0x50, 0x52, 0x60, 0]
+    n = intf.packets
+    poke(dev, 0xfe06, 0x0004)
+    assert ch.read_scattered([0x60, 0x50, 0xfe06]) == [0x60, 0x50, 0x0004]
+    # only the volatile register went out
+    assert intf.packets-n == 1
+
+
+COMMONS = [(0x8A80, gty_node.GTHE3CommonNode), (0x8A90, gty_node.GTHE4CommonNode),
+    (0x8A82, gty_node.GTYE3CommonNode), (0x8A92, gty_node.GTYE4CommonNode)]
+
+
+def test_field():
+    words = {0x10: 0xa5a5, 0x12: 0, 0x14: 0}
+
+    f = gty_node.Field('x', 0x10, 0x00f0, 4, offset=2)
+    assert f.decode(words) == 0xa+2
+    f.encode(words, 5)
+    assert words[0x10] == 0xa535
+
+    b = gty_node.Field('b', 0x10, 0x0100, kind='bool')
+    assert b.decode(words) is True
+    b.encode(words, False)
+    assert words[0x10] == 0xa435
+
+    w = gty_node.Field('w', (0x12, 0x14))
+    assert (w.kind, w.regs) == ('wide', (0x12, 0x14))
+    w.encode(words, 0x12345678)
+    assert (words[0x12], words[0x14], w.decode(words)) == (0x5678, 0x1234, 0x12345678)
+
+
+def field_value(f, rng):
+    if f.kind == 'wide':
+        return rng.getrandbits(16*len(f.addr))
+    if f.kind == 'bool':
+        return rng.random() < 0.5
+    return f.offset+rng.randrange((f.mask >> f.shift)+1)
+
+
+@pytest.mark.parametrize('ntype,cls', COMMONS+CHANNELS)
+def test_field_map(ntype, cls):
+    ch, dev, intf = make(ntype)
+    assert type(ch) is cls
+    rng = model.random.Random(ntype)
+
+    for name, f in sorted(cls.field_map.items()):
+        assert hasattr(ch, 'get_'+name)
+        assert hasattr(ch, 'set_'+name) != f.ro
+
+        # background pattern in the registers of the field
+        bg = {a: rng.getrandbits(16) for a in f.regs}
+        for a, v in bg.items():
+            poke(dev, a, v)
+
+        if f.kind == 'wide':
+            assert ch.get_field(name) == sum(bg[a] << 16*k for k, a in enumerate(f.addr))
+        elif f.kind == 'bool':
+            assert ch.get_field(name) is bool(bg[f.addr] & f.mask)
+        else:
+            assert ch.get_field(name) == ((bg[f.addr] & f.mask) >> f.shift)+f.offset
+
+        if f.ro:
+            continue
+
+        val = field_value(f, rng)
+        ch.set_field(name, val)
+        assert ch.get_field(name) == val
+
+        # bits outside the field are left alone
+        if f.kind == 'wide':
+            assert [peek(dev, a) for a in f.addr] == [(val >> 16*k) & 0xffff for k in range(len(f.addr))]
+        else:
+            raw = f.mask if f.kind == 'bool' and val else (0 if f.kind == 'bool' else (val-f.offset) << f.shift)
+            assert peek(dev, f.addr) == (bg[f.addr] & ~f.mask) | raw
+
+
+def test_field_variants():
+    # same names, variant specific registers and masks
+    assert gty_node.GTHE3ChannelNode.field_map['rx_prbs_err_count'].addr == (0x015e*2, 0x015f*2)
+    for cls in (gty_node.GTHE4ChannelNode, gty_node.GTYE3ChannelNode, gty_node.GTYE4ChannelNode):
+        assert cls.field_map['rx_prbs_err_count'].addr == (0x025e*2, 0x025f*2)
+
+    assert 'qpll1_ips_en' not in gty_node.GTHE3CommonNode.field_map
+    assert gty_node.GTYE4CommonNode.field_map['qpll1_ips_en'].mask == 0x0040
+    assert gty_node.GTHE4CommonNode.field_map['qpll0_clkout_rate'].kind == 'bool'
+
+    ch, dev, intf = make(0x8A81)
+    dev.mem[0x015e*2:0x015e*2+4] = (0x12345678).to_bytes(4, 'little')
+    assert ch.get_rx_prbs_err_count() == 0x12345678
+
+
+def test_submit_fields():
+    ch, dev, intf = make()
+    poke(dev, 0x003c*2, 0xffff)
+    txns = ch.submit_fields({'es_prescale': 3, 'es_control': 0x15, 'es_qualifier': 0x123456789abcdef})
+    for txn in txns:
+        txn.result()
+
+    # one write per register
+    assert len(txns) == 1+len(ch.field_map['es_qualifier'].regs)
+    assert peek(dev, 0x003c*2) == (0x15 << 10) | 0x03e0 | 3
+    assert ch.get_es_qualifier() == 0x123456789abcdef
+
+
+def test_snapshot_restore():
+    ch, dev, intf = make()
+    rng = model.random.Random(1)
+    regs = sorted({a for f in ch.field_map.values() for a in f.regs})
+    for a in regs:
+        poke(dev, a, rng.getrandbits(16))
+
+    n = intf.packets
+    snap = ch.snapshot()
+    assert intf.packets-n < len(regs)//2
+    assert snap == {name: ch.get_field(name) for name in ch.field_map}
+
+    orig = {a: peek(dev, a) for a in regs}
+    poke(dev, 0x003c*2, orig[0x003c*2] ^ 0x0100)
+    poke(dev, 0x0044*2, orig[0x0044*2] ^ 0xffff)
+    poke(dev, 0xfe00, orig[0xfe00] ^ 0x0001)
+    es_err = ch.field_map['es_error_count'].addr
+    poke(dev, es_err, 1)
+
+    assert ch.restore(snap) == [0x003c*2, 0x0044*2]
+    # volatile registers are not written back
+    orig.update({0xfe00: orig[0xfe00] ^ 0x0001, es_err: 1})
+    assert {a: peek(dev, a) for a in regs} == orig
+
+    # nothing to do the second time round
+    assert ch.restore(snap) == []
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+import model
+
+from xfcp import i2c_devices
+import xfcp.i2c_node
+
+
+def make(devices, cycle=None, max_packet_size=None, window=8):
+    bus = model.I2CMaster(devices, cycle)
+    intf = model.ModelInterface(model.Switch([bus, model.Switch([model.I2CMaster({0x40: bytearray(256)})])]),
+        window=window, max_packet_size=max_packet_size)
+    return intf.enumerate()[0], bus, intf
+
+
+@pytest.mark.parametrize('max_packet_size', [None, 1472, 60])
+def test_scan(max_packet_size):
+    n, bus, intf = make({0x00: bytearray(4), 0x50: bytearray(256), 0x74: bytearray(8)}, max_packet_size=max_packet_size)
+    # leave a missed ack pending
+    n.read_i2c(0x33, 1)
+    assert n.scan() == [0x00, 0x50, 0x74]
+    assert n.scan(range(0x60, 0x80)) == [0x74]
+
+
+def test_scan_tree():
+    n, bus, intf = make({0x50: bytearray(256)})
+    found = {m.path: a for m, a in i2c_devices.scan_tree(intf.get_root()).items()}
+    assert found == {(0,): [0x50], (1, 0): [0x40]}
+
+
+@pytest.mark.parametrize('max_packet_size', [None, 1472, 200, 64])
+def test_transaction(max_packet_size):
+    n, bus, intf = make({0x50: bytearray(1024), 0x68: bytearray(256)}, max_packet_size=max_packet_size)
+    img = os.urandom(700)
+
+    tx = n.transaction()
+    tx.set_prescale(250)
+    tx.set_addr(0x50).write(b'\x00'+img, stop=True)
+    for k in range(40):
+        tx.write_reg(0x68, bytes([k, k ^ 0x5a]))
+    tx.write_read(0x50, b'\x00', 700)
+    tx.set_addr(0x33).read(1, stop=True).status()
+    res = tx.execute()
+
+    assert len(res) == len(tx.ops)
+    assert res[0] == ('prescale', None, 250)
+    assert res[2] == ('write', 0x50, 701)
+    assert res[-4] == ('read', 0x50, img)
+    assert res[-1].op == 'status' and res[-1].value & 0x08
+    assert bytes(bus.devices[0x50][:700]) == img
+    assert bytes(bus.devices[0x68][:40]) == bytes(k ^ 0x5a for k in range(40))
+
+
+@pytest.mark.parametrize('cycle', [0, 5, 100])
+def test_eeprom_write(cycle):
+    n, bus, intf = make({0x50: bytearray(256), 0x51: bytearray(256)}, cycle={0x50: cycle, 0x51: cycle})
+    ee = i2c_devices.I2CEEPROM(n, 0x50, size=512, page_size=16)
+    img = os.urandom(500)
+
+    ee.write(3, img)
+
+    pages = list(ee.pages(3, img))
+    # every page programmed exactly once, in order
+    assert bus.log == [(0x50 | (off >> 8), off & 0xff) for off, chunk in pages]
+    assert bytes(bus.devices[0x50][3:])+bytes(bus.devices[0x51][:247]) == img
+    assert ee.read(3, 500) == img
+
+
+def test_eeprom_timeout():
+    n, bus, intf = make({0x50: bytearray(256)}, cycle={0x50: 10**9})
+    with pytest.raises(Exception):
+        i2c_devices.I2CEEPROM(n, 0x57, timeout=0.01).write(0, b'abc')
+    with pytest.raises(Exception):
+        i2c_devices.I2CEEPROM(n, 0x50, timeout=0.01).write(0, b'abcdefghijk')
+    assert len(bus.log) == 1
+
+
+def test_register_device():
+    n, bus, intf = make({0x68: bytearray(256)})
+
+    dev = i2c_devices.I2CRegisterDevice(n, 0x68, value_width=2)
+    dev.write_regs({0x10: 0x1234, 0x11: 0x5678, 0x12: 0x9abc, 0x30: 0x1})
+    # merged into two block writes
+    assert bus.log == [(0x68, 0x10), (0x68, 0x30)]
+    assert bytes(bus.devices[0x68][0x10:0x16]) == bytes.fromhex('123456789abc')
+    assert dev.read_regs([0x12, 0x10, 0x30, 0x11]) == [0x9abc, 0x1234, 0x1, 0x5678]
+
+    dev = i2c_devices.I2CRegisterDevice(n, 0x68)
+    dev.write_regs([(0x20, 1), (0x20, 2), (0x21, 3)])
+    assert dev.read_regs(range(0x20, 0x22)) == [2, 3]
+    dev.update_reg(0x21, 0x0c, 0xff)
+    assert dev.read_reg(0x21) == 0x0f
@@ -0,0 +1,154 @@
+import pytest
+
+import model
+
+from xfcp import node
+from xfcp import packet
+
+
+class RecordingInterface(model.ModelInterface):
+    # keeps the packets of every send_packets call
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bursts = []
+
+    def send_packets(self, pkts):
+        self.bursts.append([(tuple(p.path), tuple(p.rpath)) for p in pkts])
+        super().send_packets(pkts)
+
+
+def make(**kwargs):
+    intf = RecordingInterface(model.tree(), **kwargs)
+    ram = intf.enumerate().find_by_type(node.MemoryNode)[0]
+    ram.write(0, bytes(range(256)))
+    del intf.bursts[:]
+    return intf, ram
+
+
+def test_window_tags_requests():
+    intf, ram = make(window=4)
+
+    with intf.batch():
+        txns = [ram.submit_read_int(4*k, 4) for k in range(16)]
+    assert [txn.result() for txn in txns] == [int.from_bytes(bytes(range(4*k, 4*k+4)), 'little') for k in range(16)]
+
+    # never more than window requests outstanding, each with its own tag
+    assert len(intf.bursts[0]) == 4
+    assert all(len(b) <= 4 for b in intf.bursts)
+    tags = [rpath for b in intf.bursts for path, rpath in b]
+    assert all(len(t) == packet.TAG_LEN for t in tags)
+    assert len(set(tags)) == 16
+    assert not intf._in_flight
+
+
+def test_window_one_is_untagged():
+    intf, ram = make(window=1)
+    assert ram.read(0, 4) == bytes(range(4))
+    assert intf.bursts == [[(ram.path, ())]]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_out_of_order_responses(seed):
+    model.random.seed(seed)
+    intf, ram = make(window=8, shuffle=True)
+
+    txns = [ram.submit_read(8*k, 8) for k in range(32)]
+    assert b''.join(txn.result() for txn in txns) == bytes(range(256))
+
+
+def test_response_rpath_is_untagged():
+    intf, ram = make(window=8)
+    pkt = intf.transact(packet.IDRequestPacket(path=ram.path, rpath=(7,)))
+    assert tuple(pkt.rpath) == (7,)
+
+
+def test_unknown_tag_is_dropped():
+    intf, ram = make(window=8)
+
+    # a response to a request that has since been given up on
+    intf.rx.append(packet.Packet(b'', ram.path, (0x55, 0x55), 0x11).build())
+    assert ram.read(16, 4) == bytes(range(16, 20))
+    assert not intf.rx
+
+
+@pytest.mark.parametrize('window', [1, 8])
+@pytest.mark.parametrize('max_packet_size', [None, 64, 101])
+def test_chunking(window, max_packet_size):
+    # the model asserts that no request exceeds max_packet_size
+    intf, ram = make(window=window, max_packet_size=max_packet_size)
+    data = bytes(model.random.randrange(256) for k in range(3000))
+    size = ram.max_transfer_size()
+    assert size % 4 == 0
+    if max_packet_size is not None:
+        assert max_packet_size-24 < size < max_packet_size
+
+    n = intf.packets
+    assert ram.write(10, data) == len(data)
+    assert intf.packets-n == -(-len(data)//size)
+    n = intf.packets
+    assert ram.read(10, len(data)) == data
+    assert intf.packets-n == -(-len(data)//size)
+
+
+def test_chunking_count_width():
+    # an 8 bit count field limits transfers to 252 bytes of 32 bit words
+    intf = model.ModelInterface(model.Switch([model.Memory(cw=8)]), window=8)
+    ram = intf.enumerate()[0]
+    assert ram.max_transfer_size() == 252
+
+    data = bytes(range(256))*4
+    assert ram.write(0, data) == len(data)
+    assert ram.read(0, len(data)) == data
+    assert ram.read_dwords(0, 3) == [0x03020100, 0x07060504, 0x0b0a0908]
+    assert intf.packets == 2+5+5+1
+
+
+@pytest.mark.parametrize('window', [1, 4, 64])
+def test_batch_order(window):
+    intf, ram = make(window=window)
+    ch = intf._root.find_by_type(0x8A83)[0]
+
+    with intf.batch() as b:
+        w1 = b.write_dword(ram, 0, 0x11111111)
+        r1 = b.read_dword(ram, 0)
+        w2 = b.write_dword(ram, 0, 0x22222222)
+        r2 = b.read(ram, 0, 8)
+        r3 = b.read_words(ch, 0x10, 2)
+        b.write_word(ch, 0x10, 0xbeef)
+        r4 = b.read_word(ch, 0x10)
+        # nothing goes out before the batch ends
+        assert not intf.bursts
+
+    # requests are sent in submission order, so reads see earlier writes
+    assert (w1.result(), r1.result(), w2.result()) == (4, 0x11111111, 4)
+    assert r2.result() == b'\x22'*4+bytes(range(4, 8))
+    assert (r3.result(), r4.result()) == ([0, 0], 0xbeef)
+    assert [p for burst in intf.bursts for p, r in burst] == [ram.path]*4+[ch.path]*3
+    if window >= 7:
+        assert len(intf.bursts) == 1
+
+
+def test_nested_batch():
+    intf, ram = make(window=8)
+
+    with intf.batch() as outer:
+        outer.write_dword(ram, 0, 1)
+        with intf.batch() as inner:
+            txn = inner.read_dword(ram, 0)
+        assert not intf.bursts
+    assert txn.result() == 1
+    assert len(intf.bursts) == 1
+
+
+def test_batch_exception_drops_unsent():
+    intf, ram = make(window=8)
+
+    with pytest.raises(ValueError):
+        with intf.batch() as b:
+            txn = b.write_dword(ram, 0, 0x12345678)
+            raise ValueError("abandoned")
+
+    with pytest.raises(ValueError):
+        txn.result()
+    assert not intf.bursts
+    assert ram.read_dword(0) == 0x03020100
@@ -0,0 +1,194 @@
+import logging
+
+import pytest
+
+import model
+
+from xfcp import ltile_htile_node
+
+
+class StatusMemory(model.Memory):
+    # register 0x500 behaves like the soft accumulator control: bit 1
+    # (reset) clears itself and bit 7 (done) is set by hardware after
+    # every write
+    def __init__(self):
+        super().__init__(1 << 16, ntype=0x9A83, name='LTile')
+        self.log = []
+
+    def handle(self, req):
+        ret = super().handle(req)
+        if req.ptype == 0x12:
+            addr = int.from_bytes(bytes(req.payload[:4]), 'little')
+            self.log.append((addr, bytes(self.mem[addr:addr+2])))
+            if addr == 0x500 << 2:
+                self.mem[addr] = (self.mem[addr] & ~0x02) | 0x80
+        return ret
+
+
+def make(window):
+    dev = StatusMemory()
+    dev.mem[0x500 << 2] = 0x10
+    dev.mem[0x210 << 2] = 0xff
+    intf = model.ModelInterface(model.Switch([dev]), window=window)
+    return intf.enumerate()[0], dev
+
+
+def reference(n, addr_off, seq):
+    for addr, mask, val in seq:
+        n.masked_write((addr_off << 11) + addr, mask, val)
+
+
+def test_apply_sequence_rereads_repeated_registers():
+    seq = ltile_htile_node.PRBS_SOFT_ACCUMULATOR_SEQ + ltile_htile_node.TRANSCEIVER_PRBS_COMPONENTS_SEQ
+
+    for window in (1, 8):
+        n, dev = make(window)
+        n.apply_sequence(0, seq)
+
+        ref, ref_dev = make(window)
+        reference(ref, 0, seq)
+
+        assert isinstance(n, ltile_htile_node.LTileHTileNode)
+        assert dev.log == ref_dev.log
+        assert dev.mem == ref_dev.mem
+
+
+class SoftAccMemory(model.Memory):
+    # soft accumulator model: a rising snap bit clears done, and done is
+    # set by the third following read of the control register, when the
+    # live counts are latched into the count registers
+    def __init__(self, channels):
+        super().__init__(channels << 13, ntype=0x9A83, name='LTile')
+        self.live = {a: (0, 0) for a in range(channels)}
+        self.pending = {}
+        self.ctrl_writes = []
+
+    def reg(self, addr_off, reg):
+        return ((addr_off << 11) + reg) << 2
+
+    def latch(self, a):
+        err, bits = self.live[a]
+        for i in range(7):
+            self.mem[self.reg(a, ltile_htile_node.PRBS_SOFT_ACC_ERR_CNT+i)] = (err >> 8*i) & 0xff
+            self.mem[self.reg(a, ltile_htile_node.PRBS_SOFT_ACC_BIT_CNT+i)] = (bits >> 8*i) & 0xff
+        self.mem[self.reg(a, 0x500)] |= 0x08
+
+    def handle(self, req):
+        addr = int.from_bytes(bytes(req.payload[:4]), 'little')
+        a, ctrl = addr >> 13, addr & 0x1fff == 0x500 << 2
+        if ctrl and req.ptype == 0x10 and a in self.pending:
+            self.pending[a] -= 1
+            if not self.pending[a]:
+                del self.pending[a]
+                self.latch(a)
+        prev = self.mem[addr] if ctrl else 0
+        ret = super().handle(req)
+        if ctrl and req.ptype == 0x12:
+            val = self.mem[addr]
+            self.ctrl_writes.append((a, val))
+            # done is read-only
+            self.mem[addr] = (val & ~0x08) | (prev & 0x08)
+            if val & 0x04 and not prev & 0x04:
+                self.mem[addr] &= ~0x08
+                self.pending[a] = 3
+        return ret
+
+
+def test_snapshot_waits_for_done():
+    dev = SoftAccMemory(4)
+    for a in range(4):
+        dev.mem[dev.reg(a, 0x500)] = 0x09 if a != 2 else 0x05
+        dev.live[a] = (a, (1 << 49)+a*1000)
+        # counts from an earlier snapshot
+        dev.mem[dev.reg(a, ltile_htile_node.PRBS_SOFT_ACC_ERR_CNT)] = 0x55
+
+    intf = model.ModelInterface(model.Switch([dev]), window=8)
+    n = intf.enumerate()[0]
+    intf.round_trips = 0
+
+    assert n.snapshot_prbs_soft_acc(range(4)) == {a: dev.live[a] for a in range(4)}
+
+    # one batch each to read control, set snap, poll three times and read
+    assert intf.round_trips == 6
+    # done is never written, and the snap bit is back to where it was
+    assert not any(val & 0x08 for a, val in dev.ctrl_writes)
+    assert [dev.mem[dev.reg(a, 0x500)] & 0x07 for a in range(4)] == [0x01, 0x01, 0x05, 0x01]
+
+    dev.live[1] = (7, 70)
+    assert n.get_prbs_soft_acc_cnt(1) == (7, 70)
+
+
+def test_snapshot_times_out():
+    dev = SoftAccMemory(1)
+    dev.latch = lambda a: None
+    n = model.ModelInterface(model.Switch([dev])).enumerate()[0]
+
+    try:
+        n.snapshot_prbs_soft_acc([0], timeout=0.05)
+    except Exception as ex:
+        assert 'prbs_done' in str(ex)
+    else:
+        assert False, "snapshot did not time out"
+
+
+def test_dump_reg_space(capsys):
+    dev = model.Memory(1 << 16, ntype=0x9A83, name='LTile')
+    rng = model.random.Random(2)
+    dev.mem[:] = bytes(rng.getrandbits(8) for k in range(len(dev.mem)))
+    intf = model.ModelInterface(model.Switch([dev]), window=8, max_packet_size=1500)
+    n = intf.enumerate()[0]
+
+    # addr_off selects the channel window, register addr is at addr << 2
+    p = intf.packets
+    dump = n.dump_reg_space(1, 0, ltile_htile_node.CHANNEL_REG_SPACE)
+    assert intf.packets-p == 6
+    assert list(dump) == [dev.mem[((1 << 11)+a) << 2] for a in range(0x800)]
+    assert list(dump[0x400:0x410]) == [n.masked_read((1 << 11)+a, 0xff) for a in range(0x400, 0x410)]
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 0x800
+    assert lines[0x480] == "Address: 0x480: " + hex(dump[0x480])
+
+    part = n.read_reg_space(0, 0x200, 0x220)
+    assert list(part) == [dev.mem[a << 2] for a in range(0x200, 0x220)]
+
+
+def test_diff_reg_space():
+    dump = [0x10, 0x11, 0x12, 0x13]
+    assert ltile_htile_node.diff_reg_space(dump, [0x10, 0x01, 0x12, 0x03, 0x99]) == [(1, 0x11, 0x01), (3, 0x13, 0x03)]
+
+    # known-good values of a few registers, dump starting at 0x210
+    ref = {0x20f: 0, 0x210: 0x10, 0x212: 0x02, 0x214: 0}
+    assert ltile_htile_node.diff_reg_space(dump, ref, start=0x210) == [(0x212, 0x12, 0x02)]
+
+    intf = model.ModelInterface(model.Switch([model.Memory(1 << 16, ntype=0x9A83)]), window=8)
+    n = intf.enumerate()[0]
+    before = n.read_reg_space(0)
+    n.masked_write(0x164, 0x80, 0x80)
+    assert ltile_htile_node.diff_reg_space(n.read_reg_space(0), before) == [(0x164, 0x80, 0)]
+
+
+def test_print_verbosity_alias(caplog):
+    n, dev = make(8)
+    logger = ltile_htile_node.logger
+    level = logger.level
+    try:
+        with pytest.deprecated_call():
+            ltile_htile_node.PRINT_VERBOSITY = ltile_htile_node.PRINT_VERBOSITY_TRACE
+        assert logger.level == logging.DEBUG
+        assert ltile_htile_node.PRINT_VERBOSITY == ltile_htile_node.PRINT_VERBOSITY_TRACE
+
+        n.masked_write(0x210, 0x1f, 0x09)
+        assert any('masked_write' in r.getMessage() for r in caplog.records)
+        caplog.clear()
+
+        with pytest.deprecated_call():
+            ltile_htile_node.PRINT_VERBOSITY = ltile_htile_node.PRINT_VERBOSITY_QUIET
+        assert ltile_htile_node.PRINT_VERBOSITY == ltile_htile_node.PRINT_VERBOSITY_QUIET
+        n.masked_write(0x210, 0x1f, 0x09)
+        assert not caplog.records
+
+        logger.setLevel(logging.WARNING)
+        assert ltile_htile_node.PRINT_VERBOSITY == ltile_htile_node.PRINT_VERBOSITY_WARN
+    finally:
+        logger.setLevel(level)
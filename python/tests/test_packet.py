@@ -0,0 +1,95 @@
+import pytest
+
+import model
+
+from xfcp import packet
+
+
+FRAMES = [
+    bytes([1, 2, 0xFE, 3, 4, 0xFF, 0x20, 0xAA, 0xBB]),
+    bytes([1, 0xFF, 0x20, 0xAA]),
+    # path longer than the header search window
+    bytes([1]*70 + [0xFF, 0x20, 5]),
+]
+
+
+@pytest.mark.parametrize('frame', FRAMES)
+@pytest.mark.parametrize('wrap', [bytes, bytearray, memoryview, lambda b: memoryview(b'\xfe\xff'+b)[2:]])
+def test_parse(frame, wrap):
+    pkt = packet.parse(wrap(frame))
+    ref = packet.parse(frame)
+    assert (pkt.path, pkt.rpath, pkt.ptype, bytes(pkt.payload)) == (ref.path, ref.rpath, ref.ptype, bytes(ref.payload))
+    assert pkt.build() == frame
+
+
+@pytest.mark.parametrize('frame', [b'\x01\x02', bytes(80)])
+def test_parse_missing_terminator(frame):
+    with pytest.raises(ValueError):
+        packet.parse(memoryview(frame))
+
+
+def test_build_returns_bytes():
+    t = packet.MemoryAccessTemplate((1, 2), 0x12, 32, 16)
+    wr = packet.WriteRequestPacket()
+    wr.path = (1,)
+    wr.data = bytearray(b'\x11\x22')
+
+    for pkt in (packet.Packet(bytearray(b'ab'), (1,), (2,), 0x10),
+            packet.Packet(memoryview(b'ab'), (1,), (), 0x10),
+            packet.IDRequestPacket(path=(1, 2)),
+            wr, t.request(0x10, 2, bytearray(b'\x11\x22')), t.request(0x10, 0)):
+        assert type(pkt.build()) is bytes
+
+
+WIDTHS = [(8, 8), (16, 16), (24, 16), (32, 16), (40, 24), (64, 32)]
+
+
+@pytest.mark.parametrize('aw,cw', WIDTHS)
+@pytest.mark.parametrize('rpath', [(), (3, 1), (9, 0x22, 0x33)])
+@pytest.mark.parametrize('ptype', [0x10, 0x12])
+def test_template_request(aw, cw, rpath, ptype):
+    t = packet.MemoryAccessTemplate((1, 4), ptype, aw, cw)
+    addr = 0x123456789abcdef0 & ((1 << aw)-1)
+    data = bytes(range(5)) if ptype == 0x12 else b''
+    count = len(data) if data else 5
+
+    pkt = t.request(addr, count, bytearray(data))
+    pkt.rpath = rpath
+    frame = pkt.build()
+
+    # same bytes as the generic packet class
+    ref = packet.MemoryAccessPacket(ptype=ptype, path=(1, 4), rpath=rpath)
+    ref.addr_width, ref.count_width = aw, cw
+    ref.addr, ref.count, ref.data = addr, count, data
+    assert frame == ref.build()
+
+    # and parses back to the same fields
+    req = packet.parse(frame)
+    req.addr_width, req.count_width = aw, cw
+    req.parse()
+    assert (req.ptype, req.path, req.rpath) == (ptype, (1, 4), rpath)
+    assert (req.addr, req.count, bytes(req.data)) == (addr, count, data)
+
+
+@pytest.mark.parametrize('aw,cw', WIDTHS)
+def test_template_unpack(aw, cw):
+    t = packet.MemoryAccessTemplate((), 0x10, aw, cw)
+    addr = (1 << aw)-3
+    resp = packet.ReadResponsePacket(path=(2,))
+    resp.addr_width, resp.count_width = aw, cw
+    resp.addr, resp.count, resp.data = addr, 8, bytes(range(0x80, 0x88))
+
+    pkt = packet.parse(resp.build())
+    a, c, data = t.unpack(pkt.payload)
+    assert (a, c, bytes(data)) == (addr, 8, bytes(range(0x80, 0x88)))
+    assert t.word_struct(8).unpack_from(pkt.payload)[-1] == 0x8786858483828180
+
+
+@pytest.mark.parametrize('aw,cw', [(16, 8), (24, 24), (64, 16)])
+def test_template_node_access(aw, cw):
+    intf = model.ModelInterface(model.Switch([model.Memory(aw=aw, cw=cw)]), window=8)
+    ram = intf.enumerate()[0]
+    assert ram.write(0x40, bytes(range(16))) == 16
+    assert ram.read(0x40, 16) == bytes(range(16))
+    assert ram.read_dword(0x44) == 0x07060504
+    assert ram.read_qword(0x48) == 0x0f0e0d0c0b0a0908
@@ -0,0 +1,125 @@
+import pytest
+
+import model
+
+from xfcp import gty_node
+
+
+ERR_LO = 0x025e*2
+ERR_HI = 0x025f*2
+
+
+def channel(name):
+    return model.Memory(1 << 16, aw=16, dw=16, ntype=0x8A83, name=name)
+
+
+class Clock(object):
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def make(monkeypatch, n=2, line_rate=1e9):
+    devs = [channel('CH%d' % k) for k in range(n)]
+    intf = model.ModelInterface(model.Switch(devs), window=8)
+    chs = intf.enumerate().find_by_type(gty_node.GTYE3ChannelNode)
+    clock = Clock()
+    monkeypatch.setattr(gty_node.time, 'monotonic', clock)
+    return gty_node.PRBSMonitor(chs, line_rate), devs, clock, intf
+
+
+def set_lane(dev, err_count, locked=True, error=False):
+    dev.mem[0xfe06:0xfe08] = ((0x0008 if locked else 0) | (0x0004 if error else 0)).to_bytes(2, 'little')
+    dev.mem[ERR_LO:ERR_LO+2] = (err_count & 0xffff).to_bytes(2, 'little')
+    dev.mem[ERR_HI:ERR_HI+2] = (err_count >> 16).to_bytes(2, 'little')
+
+
+def test_monitor_counts_bits_and_errors(monkeypatch):
+    mon, devs, clock, intf = make(monkeypatch)
+    set_lane(devs[0], 100)
+    set_lane(devs[1], 0)
+    mon.poll()
+
+    intf.round_trips = 0
+    clock.t = 2.0
+    set_lane(devs[0], 150)
+    set_lane(devs[1], 0, error=True)
+    mon.poll()
+
+    # one batch per poll for all lanes
+    assert intf.round_trips == 1
+    assert [(lane.bits, lane.errors) for lane in mon.lanes] == [(2*10**9, 50), (2*10**9, 0)]
+    assert mon.ber() == 50/(4*10**9)
+    assert mon.lanes[1].xcvr.rx_prbs_error
+    assert mon.lanes[0].recent(1.0) == (2*10**9, 50)
+
+    node, locked, bits, errors, ber, lower, upper = mon.summary()[0]
+    assert node is mon.lanes[0].xcvr and locked and errors == 50
+    assert lower < ber < upper
+
+
+def test_monitor_lock_loss(monkeypatch):
+    mon, devs, clock, intf = make(monkeypatch, 1)
+    set_lane(devs[0], 0)
+    mon.poll()
+
+    # errors while unlocked are not counted
+    clock.t = 1.0
+    set_lane(devs[0], 1000, locked=False)
+    mon.poll()
+    clock.t = 2.0
+    set_lane(devs[0], 2000)
+    mon.poll()
+    clock.t = 3.0
+    set_lane(devs[0], 2010)
+    mon.poll()
+
+    lane = mon.lanes[0]
+    assert (lane.bits, lane.errors, lane.lock_losses) == (10**9, 10, 1)
+
+
+def test_counter_wrap(monkeypatch):
+    mon, devs, clock, intf = make(monkeypatch, 1)
+    set_lane(devs[0], 0xfffffff0)
+    mon.poll()
+    clock.t = 1.0
+    set_lane(devs[0], 0x10)
+    mon.poll()
+    assert mon.lanes[0].errors == 0x20
+
+
+@pytest.mark.parametrize('before', [5000, 0x7fffffff, 0xfffffff0])
+def test_counter_reset(monkeypatch, before):
+    # a reset (rx_prbs_cnt_reset or by the user) is not a wrap, even from
+    # near the top of the counter when the wrap would exceed the bits sent
+    mon, devs, clock, intf = make(monkeypatch, 1, line_rate=10)
+    set_lane(devs[0], before)
+    mon.poll()
+    clock.t = 1.0
+    set_lane(devs[0], 3)
+    mon.poll()
+    assert mon.lanes[0].errors == 3
+    assert mon.lanes[0].ber() == 0.3
+
+
+def test_reset_clears_totals(monkeypatch):
+    mon, devs, clock, intf = make(monkeypatch, 1)
+    set_lane(devs[0], 0)
+    mon.poll()
+    clock.t = 1.0
+    set_lane(devs[0], 7)
+    mon.poll()
+    mon.reset()
+    assert (mon.lanes[0].bits, mon.lanes[0].errors, len(mon.lanes[0].history)) == (0, 0, 0)
+
+
+def test_monitor_rejects_mixed_interfaces():
+    chs = []
+    for k in range(2):
+        intf = model.ModelInterface(model.Switch([channel('CH')]))
+        chs += intf.enumerate().find_by_type(gty_node.GTYE3ChannelNode)
+
+    with pytest.raises(Exception, match="same interface"):
+        gty_node.PRBSMonitor(chs, 1e9)
@@ -0,0 +1,156 @@
+import queue
+import types
+
+import pytest
+
+import model
+
+from xfcp import interface
+from xfcp import packet
+
+
+class ModelPort(object):
+    # stands in for a serial port in front of a model tree; responses can
+    # be held back to play them out late
+    def __init__(self, root):
+        self.model = model.ModelInterface(root)
+        self.rx = queue.Queue()
+        self.writes = []
+        self.held = []
+        self.hold = False
+        self.in_waiting = 0
+
+    def write(self, data):
+        self.writes.append(data)
+        for frame in data.split(b'\x00')[:-1]:
+            req = packet.parse(interface.cobs_decode(frame))
+            self.model.send(packet.Packet(req.payload, req.path, req.rpath, req.ptype))
+        while self.model.rx:
+            frame = interface.cobs_encode(bytes(self.model.rx.popleft()))+b'\x00'
+            if self.hold:
+                self.held.append(frame)
+            else:
+                self.rx.put(frame)
+
+    def release(self):
+        for frame in self.held:
+            self.rx.put(frame)
+        self.held = []
+
+    def read(self, count):
+        try:
+            return self.rx.get(timeout=0.05)
+        except queue.Empty:
+            return b''
+
+    def close(self):
+        pass
+
+
+def make(timeout=10):
+    port = ModelPort(model.tree())
+    intf = interface.SerialInterface(driver=types.SimpleNamespace(serial=port), timeout=timeout)
+    return port, intf
+
+
+def test_serial_pipelines():
+    port, intf = make()
+    try:
+        assert intf.window > 1
+        root = intf.enumerate()
+        assert port.model.packets == 53
+
+        mem = root.find_by_type(interface.node.MemoryNode)[0]
+        data = bytes(range(64))
+        del port.writes[:]
+        with intf.batch():
+            for k in range(8):
+                mem.submit_write(k*8, data[k*8:(k+1)*8])
+            txns = [mem.submit_read(k*8, 8) for k in range(8)]
+        assert b''.join(txn.result() for txn in txns) == data
+        # several requests go out in each write
+        assert len(port.writes) < 16
+        assert max(w.count(b'\x00') for w in port.writes) > 1
+    finally:
+        intf.close()
+
+
+def test_serial_drops_late_response():
+    port, intf = make(timeout=0.2)
+    try:
+        root = intf.enumerate()
+        mem = root.find_by_type(interface.node.MemoryNode)[0]
+        mem.write(0, b'\x11'*4)
+        mem.write(4, b'\x22'*4)
+
+        port.hold = True
+        with pytest.raises(TimeoutError):
+            mem.read(0, 4)
+        port.hold = False
+
+        # the response to the timed out read arrives ahead of the next one
+        port.release()
+        assert mem.read(4, 4) == b'\x22'*4
+    finally:
+        intf.close()
+
+
+def test_serial_logs_malformed_frame(caplog):
+    port, intf = make(timeout=0.2)
+    try:
+        root = intf.enumerate()
+        mem = root.find_by_type(interface.node.MemoryNode)[0]
+
+        # a frame with a bad COBS code and one without a packet header
+        port.rx.put(b'\x05\x01\x00' + interface.cobs_encode(b'\x01\x02') + b'\x00')
+        mem.write(0, b'\x33'*4)
+        assert mem.read(0, 4) == b'\x33'*4
+
+        msgs = [r.getMessage() for r in caplog.records if r.name == 'xfcp.interface']
+        assert len(msgs) == 2
+        assert all('dropping malformed frame' in m for m in msgs)
+    finally:
+        intf.close()
+
+
+class FailingPort(ModelPort):
+    def read(self, count):
+        if self.fail:
+            raise OSError("device disconnected")
+        return super().read(count)
+
+
+def test_serial_error_is_sticky():
+    port = FailingPort(model.tree())
+    port.fail = False
+    intf = interface.SerialInterface(driver=types.SimpleNamespace(serial=port), timeout=10)
+    try:
+        mem = intf.enumerate().find_by_type(interface.node.MemoryNode)[0]
+
+        port.fail = True
+        intf._reader.join(1)
+        assert not intf._reader.is_alive()
+
+        # every later access fails with the port error, not a timeout
+        for k in range(3):
+            with pytest.raises(OSError, match="disconnected"):
+                mem.read(0, 4)
+        with pytest.raises(OSError, match="disconnected"):
+            intf.receive()
+        with pytest.raises(OSError, match="disconnected"):
+            intf.send(packet.IDRequestPacket())
+    finally:
+        intf.close()
+
+
+def test_serial_close_without_cancel_read():
+    # the reader blocks in read() up to the port timeout, which is kept
+    # short when the port cannot cancel a read
+    port = ModelPort(model.tree())
+    port.timeout = None
+    intf = interface.SerialInterface(driver=types.SimpleNamespace(serial=port), timeout=10)
+    assert port.timeout == intf.READ_POLL_PERIOD
+    intf.timeout = 30
+    assert port.timeout == intf.READ_POLL_PERIOD
+    intf.close()
+    assert not intf._reader.is_alive()
@@ -0,0 +1,87 @@
+"""
+
+Copyright (c) 2026 Missing Link Electronics, Inc.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import json
+import os
+
+from . import packet
+
+
+def default_cache_file():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'xfcp', 'enumeration.json')
+
+
+class EnumerationCache(object):
+    """On-disk cache of enumerated node trees
+
+    Entries are keyed by interface address and hold the raw ID payload of
+    every node by path.  An entry is only used when the root node still
+    returns the same ID (type, name and extended ID string).
+    """
+
+    def __init__(self, file_name=None):
+        self.file_name = file_name or default_cache_file()
+
+    def _load_all(self):
+        try:
+            with open(self.file_name, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _store_all(self, entries):
+        d = os.path.dirname(self.file_name)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        tmp = self.file_name + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp, self.file_name)
+
+    def load(self, address, root_pkt):
+        # {path: ID response packet} for a matching entry, else None
+        entry = self._load_all().get(address)
+        if entry is None or bytes.fromhex(entry['root']) != bytes(root_pkt.payload):
+            return None
+
+        id_pkts = {}
+        for path, payload in entry['nodes']:
+            path = tuple(path)
+            id_pkts[path] = packet.IDResponsePacket(bytes.fromhex(payload), (), path)
+        id_pkts[()] = root_pkt
+        return id_pkts
+
+    def store(self, address, id_pkts):
+        entries = self._load_all()
+        entries[address] = {
+            'root': bytes(id_pkts[()].payload).hex(),
+            'nodes': [[list(path), bytes(pkt.payload).hex()] for path, pkt in sorted(id_pkts.items())],
+        }
+        self._store_all(entries)
+
+    def invalidate(self, address):
+        entries = self._load_all()
+        if entries.pop(address, None) is not None:
+            self._store_all(entries)
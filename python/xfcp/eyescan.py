@@ -0,0 +1,673 @@
+"""
+
+Copyright (c) 2022 Alex Forencich
+Copyright (c) 2026 Missing Link Electronics, Inc.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import datetime
+import json
+import logging
+import struct
+import time
+
+logger = logging.getLogger(__name__)
+
+# es_control_status
+ES_STATUS_DONE = 0x1
+
+
+def sweep(start, stop, step):
+    # start, start+step, ... up to and including the first value >= stop
+    val = start
+    while True:
+        yield val
+        if val >= stop:
+            break
+        val += step
+
+
+# binary result file: magic, header length, JSON metadata header, then
+# packed little-endian records; filled is set on points an adaptive scan
+# skipped and filled in from a measured neighbour
+FILE_MAGIC = b'XFCPEYE\x00'
+RECORD_FIELDS = ('horz', 'vert', 'ut_sign', 'bit_count', 'error_count', 'filled')
+RECORD_STRUCT = struct.Struct('<hhBQQB')
+CSV_FIELDS = ('horiz_offset', 'vert_offset', 'ut_sign', 'bit_count', 'error_count', 'filled')
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("eye scan result arrays require the numpy package")
+    return numpy
+
+
+RECORD_TYPES = {'horz': '<i2', 'vert': '<i2', 'ut_sign': 'u1', 'bit_count': '<u8', 'error_count': '<u8', 'filled': 'u1'}
+
+
+def record_dtype(fields=RECORD_FIELDS):
+    np = _numpy()
+    return np.dtype([(f, RECORD_TYPES[f]) for f in fields])
+
+
+class EyeScanWriter(object):
+    """Buffered binary eye scan result writer
+
+    Records are packed as they arrive and written out in blocks of
+    buffer_size bytes, so the file stays usable if a scan is interrupted.
+    """
+
+    def __init__(self, file_name, meta, buffer_size=65536):
+        self.file = open(file_name, 'wb')
+        self.buffer_size = buffer_size
+        self.buf = bytearray()
+
+        header = json.dumps(dict(meta, fields=RECORD_FIELDS)).encode()
+        self.file.write(FILE_MAGIC + struct.pack('<I', len(header)) + header)
+
+    def write(self, data):
+        self.buf += RECORD_STRUCT.pack(*data)
+        if len(self.buf) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buf)
+        self.buf.clear()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class CSVEyeScanWriter(EyeScanWriter):
+    def __init__(self, file_name, meta, buffer_size=65536):
+        self.file = open(file_name, 'w')
+        self.buffer_size = buffer_size
+        self.buf = []
+        self.buf_len = 0
+
+        self.file.write("# eyescan\n")
+        for key, val in meta.items():
+            if val is None:
+                continue
+            if key.endswith('prescale'):
+                val = f"{2**(val+1)} (raw {val})"
+            self.file.write(f"# {key}: {val}\n")
+        self.file.write(','.join(CSV_FIELDS)+"\n")
+
+    def write(self, data):
+        line = "%d,%d,%d,%d,%d,%d\n" % data
+        self.buf.append(line)
+        self.buf_len += len(line)
+        if self.buf_len >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(''.join(self.buf))
+        self.buf = []
+        self.buf_len = 0
+        self.file.flush()
+
+
+def open_writer(file_name, meta, buffer_size=65536):
+    # CSV for .csv file names, binary records otherwise
+    if file_name.lower().endswith('.csv'):
+        return CSVEyeScanWriter(file_name, meta, buffer_size)
+    return EyeScanWriter(file_name, meta, buffer_size)
+
+
+def _parse_meta(val):
+    # "32 (raw 4)" -> 4, numbers -> int
+    if val.endswith(')') and '(raw ' in val:
+        val = val[val.index('(raw ')+5:-1]
+    try:
+        return int(val)
+    except ValueError:
+        return val
+
+
+def load(file_name):
+    """Load eye scan results, returns (meta, records)
+
+    records is a numpy structured array with the fields in RECORD_FIELDS.
+    Both the binary format and the CSV format are accepted.
+    """
+    np = _numpy()
+    dtype = record_dtype()
+
+    with open(file_name, 'rb') as f:
+        data = f.read()
+
+    if data.startswith(FILE_MAGIC):
+        offset = len(FILE_MAGIC)
+        header_len, = struct.unpack_from('<I', data, offset)
+        offset += 4
+        meta = json.loads(data[offset:offset+header_len].decode())
+        offset += header_len
+        # files from before the filled field do not list their fields
+        file_dtype = record_dtype(meta.pop('fields', RECORD_FIELDS[:5]))
+        count = (len(data)-offset) // file_dtype.itemsize
+        file_records = np.frombuffer(data, file_dtype, count, offset)
+        if file_dtype == dtype:
+            return meta, file_records
+        records = np.zeros(count, dtype)
+        for f in file_dtype.names:
+            records[f] = file_records[f]
+        return meta, records
+
+    meta = {}
+    rows = []
+    for line in data.decode().splitlines():
+        if line.startswith('#'):
+            key, sep, val = line[1:].partition(':')
+            if sep:
+                meta[key.strip()] = _parse_meta(val.strip())
+        elif line and not line.startswith(CSV_FIELDS[0]):
+            row = tuple(int(x) for x in line.split(','))
+            # files from before the filled column hold only measured points
+            rows.append(row + (0,)*(len(CSV_FIELDS)-len(row)))
+    return meta, np.array(rows, dtype=dtype)
+
+
+def ber_grid(records, filled=True):
+    """BER grid from eye scan records, returns (horz, vert, ber)
+
+    ber[i, j] is the BER at vert[i], horz[j], with both UT signs summed
+    as plot_eye.py always did; points that were not measured are NaN.
+    With filled=False, points filled in by an adaptive scan are NaN as
+    well, on the same grid.
+    """
+    np = _numpy()
+
+    horz, hi = np.unique(records['horz'], return_inverse=True)
+    vert, vi = np.unique(records['vert'], return_inverse=True)
+
+    if not filled:
+        keep = records['filled'] == 0
+        records, hi, vi = records[keep], hi[keep], vi[keep]
+
+    ber = np.zeros((len(vert), len(horz)))
+    seen = np.zeros((len(vert), len(horz)), dtype=bool)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        point_ber = records['error_count'] / records['bit_count']
+    np.add.at(ber, (vi, hi), point_ber)
+    seen[vi, hi] = True
+    ber[~seen] = np.nan
+
+    return horz, vert, ber
+
+
+def coarse_indices(n, k):
+    # every k-th grid index, always including both ends
+    idx = list(range(0, n, k))
+    if idx[-1] != n-1:
+        idx.append(n-1)
+    return idx
+
+
+class EyeScanChannel(object):
+    def __init__(self, xcvr):
+        self.xcvr = xcvr
+
+        self.file = None
+        self.file_name = None
+
+        self.prescale = 4
+        self.horz_start = -32
+        self.horz_stop = 32
+        self.horz_step = 4
+        self.vert_start = -32
+        self.vert_stop = 32
+        self.vert_step = 4
+        self.vs_range = 0
+
+        # adaptive scan: measure a coarse grid first and refine only the
+        # cells the BER contour passes through, start every dwell at
+        # min_prescale and only raise it (up to prescale) while a point has
+        # seen no errors, and end a dwell early once it has target_errors
+        self.adaptive = False
+        self.coarse_step = 4
+        self.min_prescale = 0
+        self.prescale_step = 2
+        self.target_errors = 100
+        self.ber_threshold = 0.0
+
+        self.data_width = None
+        self.int_data_width = None
+
+        self.horz_offset = 0
+        self.vert_offset = 0
+        self.ut_sign = 0
+
+        self.dwell_prescale = 4
+        self.bits = 0
+        self.errors = 0
+
+        self.data = []
+        self.results = {}
+        self.running = False
+        self.error = None
+
+        # DRP cache state of xcvr before the scan, restored by release
+        self.saved_cache = None
+
+        self._points = None
+
+    def grid(self):
+        return (list(sweep(self.horz_start, self.horz_stop, self.horz_step)),
+            list(sweep(self.vert_start, self.vert_stop, self.vert_step)))
+
+    def points(self):
+        if self.adaptive:
+            yield from self.adaptive_points()
+            return
+
+        # scan order: horizontal outer, vertical, then both UT signs
+        horz, vert = self.grid()
+        for h in horz:
+            for v in vert:
+                for ut_sign in (0, 1):
+                    yield h, v, ut_sign
+
+    def is_open(self, horz, vert):
+        bits = errors = 0
+        for ut_sign in (0, 1):
+            b, e = self.results[(horz, vert, ut_sign)]
+            bits += b
+            errors += e
+        return errors <= self.ber_threshold*bits
+
+    def cells(self):
+        # pairs of neighbouring coarse grid indices along each axis
+        horz, vert = self.grid()
+        ci = coarse_indices(len(horz), self.coarse_step)
+        cj = coarse_indices(len(vert), self.coarse_step)
+        return list(zip(ci, ci[1:])) or [(0, 0)], list(zip(cj, cj[1:])) or [(0, 0)]
+
+    def adaptive_points(self):
+        horz, vert = self.grid()
+        ci = coarse_indices(len(horz), self.coarse_step)
+        cj = coarse_indices(len(vert), self.coarse_step)
+
+        for i in ci:
+            for j in cj:
+                for ut_sign in (0, 1):
+                    yield horz[i], vert[j], ut_sign
+
+        # refine cells with both open and closed corners
+        refine = set()
+        hcells, vcells = self.cells()
+        for i0, i1 in hcells:
+            for j0, j1 in vcells:
+                corners = {self.is_open(horz[i], vert[j]) for i in (i0, i1) for j in (j0, j1)}
+                if len(corners) > 1:
+                    refine.update((i, j) for i in range(i0, i1+1) for j in range(j0, j1+1))
+
+        for i, j in sorted(refine):
+            for ut_sign in (0, 1):
+                if (horz[i], vert[j], ut_sign) not in self.results:
+                    yield horz[i], vert[j], ut_sign
+
+    def fill(self):
+        # report points skipped by an adaptive scan with the counts of the
+        # nearest corner of their coarse cell, which all agree on open/closed;
+        # these records are flagged as filled
+        if not self.adaptive:
+            return []
+
+        horz, vert = self.grid()
+        hcells, vcells = self.cells()
+        filled = []
+        seen = set()
+        for i0, i1 in hcells:
+            for j0, j1 in vcells:
+                for i in range(i0, i1+1):
+                    for j in range(j0, j1+1):
+                        for ut_sign in (0, 1):
+                            point = (horz[i], vert[j], ut_sign)
+                            if point in self.results or point in seen:
+                                continue
+                            seen.add(point)
+                            ni = i0 if i-i0 <= i1-i else i1
+                            nj = j0 if j-j0 <= j1-j else j1
+                            bits, errors = self.results[(horz[ni], vert[nj], ut_sign)]
+                            filled.append(self.record(bits, errors, point, True))
+        return filled
+
+    def meta(self):
+        return {
+            'date': str(datetime.datetime.now()),
+            'node path': '.'.join(str(x) for x in self.xcvr.path),
+            'node name': self.xcvr.name,
+            'node extended ID': self.xcvr.ext_str or None,
+            'data width': self.data_width,
+            'int data width': self.int_data_width,
+            'ES prescale': self.prescale,
+            'ES min prescale': self.min_prescale if self.adaptive else None,
+            'coarse step': self.coarse_step if self.adaptive else None,
+        }
+
+    def open(self):
+        if self.file_name:
+            self.file = open_writer(self.file_name, self.meta())
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+        self.release()
+
+    def release(self):
+        # give xcvr back its DRP cache state from before the scan
+        if self.saved_cache is not None:
+            self.xcvr.enable_cache(self.saved_cache)
+            self.saved_cache = None
+
+    def to_array(self):
+        return _numpy().array(self.data, dtype=record_dtype())
+
+    def bit_count(self, sample_count, prescale):
+        return sample_count*2**(1+prescale)*self.int_data_width
+
+    def begin_point(self):
+        self.bits = 0
+        self.errors = 0
+        self.dwell_prescale = self.min_prescale if self.adaptive else self.prescale
+
+    def dwell_done(self, error_count, sample_count):
+        # accumulate one dwell, returns True once the point is complete
+        self.bits += self.bit_count(sample_count, self.dwell_prescale)
+        self.errors += error_count
+
+        if self.adaptive and not self.errors and self.dwell_prescale < self.prescale:
+            # no errors yet, dwell longer at the same point
+            self.dwell_prescale = min(self.dwell_prescale+self.prescale_step, self.prescale)
+            return False
+        return True
+
+    def end_early(self, error_count):
+        return self.adaptive and error_count >= self.target_errors
+
+    def record(self, bit_count, error_count, point=None, filled=False):
+        if point is None:
+            point = (self.horz_offset, self.vert_offset, self.ut_sign)
+        if not filled:
+            self.results[point] = (bit_count, error_count)
+
+        data = point + (bit_count, error_count, int(filled))
+        self.data.append(data)
+
+        if self.file:
+            self.file.write(data)
+
+        return data
+
+    def next_point(self):
+        try:
+            self.horz_offset, self.vert_offset, self.ut_sign = next(self._points)
+            self.begin_point()
+            self.running = True
+        except StopIteration:
+            self.running = False
+        return self.running
+
+    def point_fields(self):
+        return {
+            'es_control': 0x00,
+            'es_prescale': self.dwell_prescale,
+            'es_horz_offset': (self.horz_offset & 0x7ff) | 0x800,
+            'rx_eyescan_vs_neg_dir': self.vert_offset < 0,
+            'rx_eyescan_vs_code': abs(self.vert_offset),
+            'rx_eyescan_vs_ut_sign': self.ut_sign,
+        }
+
+    def start(self):
+        EyeScan([self]).start()
+
+    def step(self):
+        if not self.running:
+            return False
+        EyeScan([self]).poll()
+        return self.running
+
+    def run(self):
+        EyeScan([self]).run()
+
+
+class EyeScan(object):
+    """Eye scan of several transceiver channels at once
+
+    All channels are aligned and armed together.  Each poll reads the eye
+    scan counters and status of every running channel in one batch, and
+    every channel that finished its point moves on to its next point
+    independently of the others.
+    """
+
+    def __init__(self, channels, poll_period=0.01, callback=None):
+        self.channels = [ch if isinstance(ch, EyeScanChannel) else EyeScanChannel(ch) for ch in channels]
+        self.poll_period = poll_period
+        self.callback = callback
+
+        self.interface = self.channels[0].xcvr.interface if self.channels else None
+
+    def running(self):
+        return [ch for ch in self.channels if ch.running]
+
+    def read_counters(self, channels):
+        # error count, sample count and status of each channel in one batch
+        with self.interface.batch() as b:
+            txns = [b.read_words(ch.xcvr, ch.xcvr.es_counter_regs[0], 3) for ch in channels]
+        return [(err, samp, status & 0x000f) for err, samp, status in (txn.result() for txn in txns)]
+
+    def write_fields(self, channels, *values):
+        # each dict of values is one pipelined write pass over all channels
+        with self.interface.batch():
+            for vals in values:
+                for ch in channels:
+                    ch.xcvr.submit_fields(vals(ch) if callable(vals) else vals)
+
+    def wait_done(self, channels):
+        # poll until every channel finished its current point
+        pending = list(channels)
+        counters = {}
+        while pending:
+            for ch, c in zip(pending, self.read_counters(pending)):
+                if c[2] & ES_STATUS_DONE:
+                    counters[ch] = c
+            pending = [ch for ch in pending if ch not in counters]
+            if pending:
+                time.sleep(self.poll_period)
+        return [counters[ch] for ch in channels]
+
+    def wait_reset_done(self, channels, tries=30):
+        # returns the channels that came out of reset
+        for k in range(tries):
+            with self.interface.batch() as b:
+                txns = [b.read_word(ch.xcvr, 0xfe00) for ch in channels]
+            words = [{0xfe00: txn.result()} for txn in txns]
+            done = [ch.xcvr.field_map['tx_reset_done'].decode(w) and ch.xcvr.field_map['rx_reset_done'].decode(w)
+                for ch, w in zip(channels, words)]
+            if all(done):
+                break
+            time.sleep(0.1)
+        return [ch for ch, d in zip(channels, done) if d]
+
+    def align(self, channels):
+        # init and check for proper alignment
+        for ch in channels:
+            ch.error = None
+            if ch.saved_cache is None:
+                ch.saved_cache = ch.xcvr.cache_enabled
+            ch.xcvr.enable_cache()
+            ch.data_width = ch.xcvr.get_rx_data_width()
+            ch.int_data_width = ch.xcvr.get_rx_int_data_width()
+
+        def masks(ch):
+            if ch.xcvr.get_es_mask_width() == 80:
+                return {'es_sdata_mask': 0xffffffffff0000000000 | (0xffffffffff >> ch.int_data_width),
+                    'es_qual_mask': 0xffffffffffffffffffff}
+            return {'es_sdata_mask': 0xffffffffffffffffffff00000000000000000000 | (0xffffffffffffffffffff >> ch.int_data_width),
+                'es_qual_mask': 0xffffffffffffffffffffffffffffffffffffffff}
+
+        self.write_fields(channels,
+            {'es_control': 0x00},
+            {'es_prescale': 4, 'es_errdet_en': 1},
+            masks,
+            lambda ch: {'rx_eyescan_vs_range': ch.vs_range},
+            {'es_horz_offset': 0x800, 'rx_eyescan_vs_neg_dir': 0, 'rx_eyescan_vs_code': 0, 'rx_eyescan_vs_ut_sign': 0},
+            {'es_eye_scan_en': 1})
+
+        for ch in channels:
+            ch.xcvr.rx_pma_reset()
+        time.sleep(0.5)
+
+        pending = list(channels)
+        for k in range(10):
+            ready = self.wait_reset_done(pending)
+            for ch in pending:
+                if ch not in ready:
+                    ch.error = "channel stuck in reset"
+                    logger.error("[%s] Error: channel stuck in reset", ch.xcvr.name)
+            pending = ready
+            if not pending:
+                break
+
+            time.sleep(0.1)
+
+            # check for lock
+            self.write_fields(pending, {'es_control': 0x01})
+            counters = self.wait_done(pending)
+            self.write_fields(pending, {'es_control': 0x00})
+
+            retry = []
+            for ch, (error_count, sample_count, status) in zip(pending, counters):
+                ber = error_count/ch.bit_count(sample_count, 4)
+                if ber >= 0.01:
+                    logger.info("[%s] High BER (%.02f), resetting eye scan logic", ch.xcvr.name, ber)
+                    retry.append(ch)
+            pending = retry
+
+            if not pending:
+                break
+
+            for ch in pending:
+                ch.xcvr.set_es_horz_offset(0x880)
+                ch.xcvr.set_eyescan_reset(1)
+                ch.xcvr.set_es_horz_offset(0x800)
+                ch.xcvr.set_eyescan_reset(0)
+
+        for ch in pending:
+            ch.error = "high BER, alignment failed"
+            logger.error("[%s] High BER, alignment failed", ch.xcvr.name)
+
+        return [ch for ch in channels if ch.error is None]
+
+    def stop(self):
+        # end the scan of all channels, e.g. after an error
+        for ch in self.channels:
+            ch.running = False
+            ch.close()
+
+    def start(self):
+        try:
+            self._start()
+        except BaseException:
+            self.stop()
+            raise
+
+    def _start(self):
+        for ch in self.channels:
+            ch.running = False
+
+        channels = self.align(self.channels)
+
+        for ch in self.channels:
+            if ch.error is not None:
+                ch.release()
+
+        for ch in channels:
+            ch.open()
+            ch.results = {}
+            ch._points = ch.points()
+            ch.next_point()
+
+        # set up for measurement and start
+        channels = self.running()
+        self.write_fields(channels,
+            {'es_errdet_en': 1},
+            EyeScanChannel.point_fields,
+            {'es_control': 0x01})
+
+    def poll(self):
+        # one sweep over all running channels; returns False once all are done
+        try:
+            return self._poll()
+        except BaseException:
+            self.stop()
+            raise
+
+    def _poll(self):
+        channels = self.running()
+        if not channels:
+            return False
+
+        restart = []
+        for ch, (error_count, sample_count, status) in zip(channels, self.read_counters(channels)):
+            # the counters are live, so an adaptive dwell can end as soon
+            # as it has seen enough errors
+            if not status & ES_STATUS_DONE and not ch.end_early(error_count):
+                continue
+
+            if ch.dwell_done(error_count, sample_count):
+                data = ch.record(ch.bits, ch.errors)
+                if self.callback:
+                    self.callback(ch, data)
+
+                if not ch.next_point():
+                    for data in ch.fill():
+                        if self.callback:
+                            self.callback(ch, data)
+                    ch.close()
+                    continue
+
+            restart.append(ch)
+
+        # restart finished channels, at their next point or with a longer dwell
+        self.write_fields(restart,
+            EyeScanChannel.point_fields,
+            {'es_control': 0x01})
+
+        return bool(self.running())
+
+    def run(self):
+        try:
+            self.start()
+
+            t = time.monotonic()
+            while self.poll():
+                t += self.poll_period
+                time.sleep(max(t-time.monotonic(), 0))
+        finally:
+            self.stop()
@@ -22,6 +22,11 @@ THE SOFTWARE.
 
 """
 
+import collections
+import functools
+import math
+import time
+
 from . import node
 
 PRBS_MODE_OFF = 0x0
@@ -47,351 +52,360 @@ prbs_mode_mapping = {
 }
 
 
-class GTHE3CommonNode(node.MemoryNode):
-    def masked_read(self, addr, mask):
-        return self.read_word(addr) & mask
-
-    def masked_write(self, addr, mask, val):
-        return self.write_word(addr, (self.read_word(addr) & ~mask) | (val & mask))
-
-    # common registers
-    def get_common_cfg0(self):
-        return self.read_word(0x0009*2)
-
-    def set_common_cfg0(self, val):
-        self.write_word(0x0009*2, val)
-
-    def get_common_cfg1(self):
-        return self.read_word(0x0089*2)
-
-    def set_common_cfg1(self, val):
-        self.write_word(0x0089*2, val)
-
-    # QPLL0 registers
-    def get_qpll0_cfg0(self):
-        return self.read_word(0x0008*2)
-
-    def set_qpll0_cfg0(self, val):
-        self.write_word(0x0008*2, val)
-
-    def get_qpll0_cfg1(self):
-        return self.read_word(0x0010*2)
-
-    def set_qpll0_cfg1(self, val):
-        self.write_word(0x0010*2, val)
-
-    def get_qpll0_cfg2(self):
-        return self.read_word(0x0011*2)
-
-    def set_qpll0_cfg2(self, val):
-        self.write_word(0x0011*2, val)
-
-    def get_qpll0_cfg3(self):
-        return self.read_word(0x0015*2)
-
-    def set_qpll0_cfg3(self, val):
-        self.write_word(0x0015*2, val)
-
-    def get_qpll0_cfg4(self):
-        return self.read_word(0x0030*2)
-
-    def set_qpll0_cfg4(self, val):
-        self.write_word(0x0030*2, val)
-
-    def get_qpll0_lock_cfg(self):
-        return self.read_word(0x0012*2)
-
-    def set_qpll0_lock_cfg(self, val):
-        self.write_word(0x0012*2, val)
-
-    def get_qpll0_init_cfg0(self):
-        return self.read_word(0x0013*2)
-
-    def set_qpll0_init_cfg0(self, val):
-        self.write_word(0x0013*2, val)
-
-    def get_qpll0_init_cfg1(self):
-        return self.masked_read(0x0014*2, 0xff00) >> 8
-
-    def set_qpll0_init_cfg1(self, val):
-        self.masked_write(0x0014*2, 0xff00, val << 8)
-
-    def get_qpll0_fbdiv(self):
-        return self.masked_read(0x0014*2, 0x00ff)+2
-
-    def set_qpll0_fbdiv(self, val):
-        self.masked_write(0x0014*2, 0x00ff, val-2)
-
-    def get_qpll0_cp(self):
-        return self.masked_read(0x0016*2, 0x03ff)
-
-    def set_qpll0_cp(self, val):
-        self.masked_write(0x0016*2, 0x03ff, val)
-
-    def get_qpll0_refclk_div(self):
-        return self.masked_read(0x0018*2, 0x0780) >> 7
-
-    def set_qpll0_refclk_div(self, val):
-        self.masked_write(0x0018*2, 0x00780, val << 7)
-
-    def get_qpll0_lpf(self):
-        return self.masked_read(0x0019*2, 0x03ff)
-
-    def set_qpll0_lpf(self, val):
-        self.masked_write(0x0019*2, 0x03ff, val)
-
-    def get_qpll0_cfg1_g3(self):
-        return self.read_word(0x001a*2)
-
-    def set_qpll0_cfg1_g3(self, val):
-        self.write_word(0x001a*2, val)
-
-    def get_qpll0_cfg2_g3(self):
-        return self.read_word(0x001b*2)
-
-    def set_qpll0_cfg2_g3(self, val):
-        self.write_word(0x001b*2, val)
-
-    def get_qpll0_lpf_g3(self):
-        return self.masked_read(0x001c*2, 0x03ff)
-
-    def set_qpll0_lpf_g3(self, val):
-        self.masked_write(0x001c*2, 0x03ff, val)
-
-    def get_qpll0_lock_cfg_g3(self):
-        return self.read_word(0x001d*2)
-
-    def set_qpll0_lock_cfg_g3(self, val):
-        self.write_word(0x001d*2, val)
-
-    def get_qpll0_fbdiv_g3(self):
-        return self.masked_read(0x001f*2, 0x00ff)+2
-
-    def set_qpll0_fbdiv_g3(self, val):
-        self.masked_write(0x001f*2, 0x00ff, val-2)
-
-    def get_rx_rec_clk_out0_sel(self):
-        return self.masked_read(0x001f*2, 0x0003)
-
-    def set_rx_rec_clk_out0_sel(self, val):
-        self.masked_write(0x001f*2, 0x0003, val)
-
-    def get_qpll0_sdm_cfg0(self):
-        return self.read_word(0x0020*2)
-
-    def set_qpll0_sdm_cfg0(self, val):
-        self.write_word(0x0020*2, val)
-
-    def get_qpll0_sdm_cfg1(self):
-        return self.read_word(0x0021*2)
-
-    def set_qpll0_sdm_cfg1(self, val):
-        self.write_word(0x0021*2, val)
-
-    def get_qpll0_sdm_cfg2(self):
-        return self.read_word(0x0024*2)
-
-    def set_qpll0_sdm_cfg2(self, val):
-        self.write_word(0x0024*2, val)
+class Field(object):
+    """DRP register field
+
+    Bits mask of the register at addr, shifted down by shift, plus offset.
+    Boolean fields read as bool; wide fields span the registers listed in
+    addr, least significant word first.  Read-only fields get no setter.
+    """
+
+    __slots__ = ('name', 'addr', 'mask', 'shift', 'kind', 'offset', 'ro')
+
+    def __init__(self, name, addr, mask=0xffff, shift=0, kind='int', offset=0, ro=False):
+        self.name = name
+        self.addr = addr
+        self.mask = mask
+        self.shift = shift
+        self.kind = 'wide' if isinstance(addr, tuple) else kind
+        self.offset = offset
+        self.ro = ro
+
+    @property
+    def regs(self):
+        return self.addr if self.kind == 'wide' else (self.addr,)
+
+    def decode(self, words):
+        if self.kind == 'wide':
+            val = 0
+            for k, a in enumerate(self.addr):
+                val |= words[a] << 16*k
+            return val
+        if self.kind == 'bool':
+            return bool(words[self.addr] & self.mask)
+        return ((words[self.addr] & self.mask) >> self.shift)+self.offset
+
+    def encode(self, words, val):
+        if self.kind == 'wide':
+            for k, a in enumerate(self.addr):
+                words[a] = (val >> 16*k) & 0xffff
+            return
+        if self.kind == 'bool':
+            val = self.mask if val else 0
+        else:
+            val = (val-self.offset) << self.shift
+        words[self.addr] = (words[self.addr] & ~self.mask) | (val & self.mask)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r}, addr={self.addr}, mask={self.mask:#06x}, shift={self.shift}, kind={self.kind!r})"
+
+
+def _field_accessors(name):
+    def get(self):
+        return self.get_field(name)
+
+    def set(self, val):
+        self.set_field(name, val)
+
+    async def get_async(self):
+        return await self.get_field_async(name)
+
+    async def set_async(self, val):
+        await self.set_field_async(name, val)
+
+    return get, set, get_async, set_async
+
+
+class DRPNode(node.MemoryNode):
+    # registers updated by hardware (status, counters, self clearing
+    # controls); these are never served from the shadow cache
+    volatile_regs = frozenset()
+
+    # register map, extended and overridden by name in subclasses
+    fields = []
+    field_map = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        fields = cls.__dict__.get('fields', [])
+        cls.field_map = dict(cls.field_map)
+        cls.field_map.update((f.name, f) for f in fields)
+
+        # generate get_/set_ accessors (and _async variants) unless already
+        # provided; generated accessors look the field up at call time, so
+        # subclasses only need to override the map entry
+        for f in fields:
+            get, set, get_async, set_async = _field_accessors(f.name)
+            methods = [('get_'+f.name, get), ('get_'+f.name+'_async', get_async)]
+            if not f.ro:
+                methods += [('set_'+f.name, set), ('set_'+f.name+'_async', set_async)]
+            for attr, func in methods:
+                if not hasattr(cls, attr):
+                    func.__name__ = attr
+                    func.__qualname__ = cls.__qualname__+'.'+attr
+                    setattr(cls, attr, func)
 
-    def get_qpll0_cp_g3(self):
-        return self.masked_read(0x0025*2, 0x03ff)
-
-    def set_qpll0_cp_g3(self, val):
-        self.masked_write(0x0025*2, 0x03ff, val)
-
-    # QPLL1 registers
-    def get_qpll1_cfg0(self):
-        return self.read_word(0x0088*2)
-
-    def set_qpll1_cfg0(self, val):
-        self.write_word(0x0088*2, val)
-
-    def get_qpll1_cfg1(self):
-        return self.read_word(0x0090*2)
-
-    def set_qpll1_cfg1(self, val):
-        self.write_word(0x0090*2, val)
-
-    def get_qpll1_cfg2(self):
-        return self.read_word(0x0091*2)
-
-    def set_qpll1_cfg2(self, val):
-        self.write_word(0x0091*2, val)
-
-    def get_qpll1_cfg3(self):
-        return self.read_word(0x0095*2)
-
-    def set_qpll1_cfg3(self, val):
-        self.write_word(0x0095*2, val)
-
-    def get_qpll1_cfg4(self):
-        return self.read_word(0x00b0*2)
-
-    def set_qpll1_cfg4(self, val):
-        self.write_word(0x00b0*2, val)
-
-    def get_qpll1_lock_cfg(self):
-        return self.read_word(0x0092*2)
-
-    def set_qpll1_lock_cfg(self, val):
-        self.write_word(0x0092*2, val)
-
-    def get_qpll1_init_cfg0(self):
-        return self.read_word(0x0093*2)
-
-    def set_qpll1_init_cfg0(self, val):
-        self.write_word(0x0093*2, val)
-
-    def get_qpll1_init_cfg1(self):
-        return self.masked_read(0x0094*2, 0xff00) >> 8
-
-    def set_qpll1_init_cfg1(self, val):
-        self.masked_write(0x0094*2, 0xff00, val << 8)
-
-    def get_qpll1_fbdiv(self):
-        return self.masked_read(0x0094*2, 0x00ff)+2
-
-    def set_qpll1_fbdiv(self, val):
-        self.masked_write(0x0094*2, 0x00ff, val-2)
-
-    def get_qpll1_cp(self):
-        return self.masked_read(0x0096*2, 0x03ff)
-
-    def set_qpll1_cp(self, val):
-        self.masked_write(0x0096*2, 0x03ff, val)
-
-    def get_qpll1_refclk_div(self):
-        return self.masked_read(0x0098*2, 0x0780) >> 7
-
-    def set_qpll1_refclk_div(self, val):
-        self.masked_write(0x0098*2, 0x00780, val << 7)
-
-    def get_qpll1_lpf(self):
-        return self.masked_read(0x0099*2, 0x03ff)
-
-    def set_qpll1_lpf(self, val):
-        self.masked_write(0x0099*2, 0x03ff, val)
-
-    def get_qpll1_cfg1_g3(self):
-        return self.read_word(0x009a*2)
-
-    def set_qpll1_cfg1_g3(self, val):
-        self.write_word(0x009a*2, val)
-
-    def get_qpll1_cfg2_g3(self):
-        return self.read_word(0x009b*2)
-
-    def set_qpll1_cfg2_g3(self, val):
-        self.write_word(0x009b*2, val)
-
-    def get_qpll1_lpf_g3(self):
-        return self.masked_read(0x009c*2, 0x03ff)
+    def __init__(self, obj=None):
+        super().__init__(obj)
 
-    def set_qpll1_lpf_g3(self, val):
-        self.masked_write(0x009c*2, 0x03ff, val)
+        self.cache_enabled = False
+        self.cache = {}
 
-    def get_qpll1_lock_cfg_g3(self):
-        return self.read_word(0x009d*2)
+        if isinstance(obj, DRPNode):
+            self.cache_enabled = obj.cache_enabled
+            self.cache = obj.cache
 
-    def set_qpll1_lock_cfg_g3(self, val):
-        self.write_word(0x009d*2, val)
+    def enable_cache(self, val=True):
+        # shadow DRP registers so that masked writes skip the read
+        self.cache_enabled = bool(val)
+        self.cache.clear()
 
-    def get_qpll1_fbdiv_g3(self):
-        return self.masked_read(0x009f*2, 0x00ff)+2
+    def invalidate(self, addr=None):
+        if addr is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(addr, None)
 
-    def set_qpll1_fbdiv_g3(self, val):
-        self.masked_write(0x009f*2, 0x00ff, val-2)
+    def read_word(self, addr):
+        if not self.cache_enabled or addr in self.volatile_regs:
+            return super().read_word(addr)
 
-    def get_rx_rec_clk_out1_sel(self):
-        return self.masked_read(0x009f*2, 0x0003)
+        val = self.cache.get(addr)
+        if val is None:
+            val = super().read_word(addr)
+            self.cache[addr] = val
+        return val
 
-    def set_rx_rec_clk_out1_sel(self, val):
-        self.masked_write(0x009f*2, 0x0003, val)
+    async def read_word_async(self, addr):
+        if not self.cache_enabled or addr in self.volatile_regs:
+            return await super().read_word_async(addr)
 
-    def get_qpll1_sdm_cfg0(self):
-        return self.read_word(0x00a0*2)
+        val = self.cache.get(addr)
+        if val is None:
+            val = await super().read_word_async(addr)
+            self.cache[addr] = val
+        return val
 
-    def set_qpll1_sdm_cfg0(self, val):
-        self.write_word(0x00a0*2, val)
+    def submit_write(self, addr, data):
+        if self.cache_enabled:
+            # write through to the shadow copy of every register covered
+            for a in range(addr & ~1, addr+len(data), 2):
+                k = a-addr
+                if k >= 0 and k+2 <= len(data) and a not in self.volatile_regs:
+                    self.cache[a] = int.from_bytes(data[k:k+2], 'little')
+                else:
+                    self.cache.pop(a, None)
+
+        return super().submit_write(addr, data)
+
+    def read_scattered(self, addrs, ws=2, gap=0):
+        if not self.cache_enabled:
+            return super().read_scattered(addrs, ws, gap)
+
+        miss = [a for a in addrs if a in self.volatile_regs or a not in self.cache]
+        words = dict(zip(miss, super().read_scattered(miss, ws, gap)))
+        for a, w in words.items():
+            if a not in self.volatile_regs:
+                self.cache[a] = w
+        return [words[a] if a in words else self.cache[a] for a in addrs]
+
+    async def read_scattered_async(self, addrs, ws=2, gap=0):
+        if not self.cache_enabled:
+            return await super().read_scattered_async(addrs, ws, gap)
+
+        miss = [a for a in addrs if a in self.volatile_regs or a not in self.cache]
+        words = dict(zip(miss, await super().read_scattered_async(miss, ws, gap)))
+        for a, w in words.items():
+            if a not in self.volatile_regs:
+                self.cache[a] = w
+        return [words[a] if a in words else self.cache[a] for a in addrs]
+
+    def read_field(self, addrs):
+        # field spanning several registers, least significant word first
+        val = 0
+        for k, w in enumerate(self.read_scattered(addrs)):
+            val |= w << 16*k
+        return val
 
-    def get_qpll1_sdm_cfg1(self):
-        return self.read_word(0x00a1*2)
+    def write_field(self, addrs, val):
+        self.write_scattered(addrs, [(val >> 16*k) & 0xffff for k in range(len(addrs))])
 
-    def set_qpll1_sdm_cfg1(self, val):
-        self.write_word(0x00a1*2, val)
+    async def read_field_async(self, addrs):
+        val = 0
+        for k, w in enumerate(await self.read_scattered_async(addrs)):
+            val |= w << 16*k
+        return val
 
-    def get_qpll1_sdm_cfg2(self):
-        return self.read_word(0x00a4*2)
+    async def write_field_async(self, addrs, val):
+        await self.write_scattered_async(addrs, [(val >> 16*k) & 0xffff for k in range(len(addrs))])
+
+    def get_field(self, name):
+        f = self.field_map[name]
+        if f.kind == 'wide':
+            return self.read_field(f.addr)
+        return f.decode({f.addr: self.read_word(f.addr)})
+
+    def set_field(self, name, val):
+        f = self.field_map[name]
+        if f.kind == 'wide':
+            self.write_field(f.addr, val)
+        elif f.mask == 0xffff and f.kind == 'int':
+            # whole register, no need to read it first
+            self.write_word(f.addr, val-f.offset)
+        else:
+            words = {f.addr: self.read_word(f.addr)}
+            f.encode(words, val)
+            self.write_word(f.addr, words[f.addr])
+
+    async def get_field_async(self, name):
+        f = self.field_map[name]
+        if f.kind == 'wide':
+            return await self.read_field_async(f.addr)
+        return f.decode({f.addr: await self.read_word_async(f.addr)})
+
+    async def set_field_async(self, name, val):
+        f = self.field_map[name]
+        if f.kind == 'wide':
+            await self.write_field_async(f.addr, val)
+        elif f.mask == 0xffff and f.kind == 'int':
+            await self.write_word_async(f.addr, val-f.offset)
+        else:
+            words = {f.addr: await self.read_word_async(f.addr)}
+            f.encode(words, val)
+            await self.write_word_async(f.addr, words[f.addr])
+
+    def submit_fields(self, values):
+        # write several fields, one write per register, without waiting for
+        # the responses; partially covered registers are read (or taken from
+        # the shadow cache) first
+        words = {}
+        for name, val in values.items():
+            f = self.field_map[name]
+            for a in f.regs:
+                if a not in words:
+                    words[a] = 0 if f.kind == 'wide' or f.mask == 0xffff else self.read_word(a)
+            f.encode(words, val)
+        return [self.submit_write(a, w.to_bytes(2, 'little')) for a, w in words.items()]
+
+    def snapshot(self, gap=16):
+        # read every mapped register in a few ranged reads, decode locally
+        addrs = sorted({a for f in self.field_map.values() for a in f.regs})
+        words = dict(zip(addrs, self.read_scattered(addrs, gap=gap)))
+        return {name: f.decode(words) for name, f in self.field_map.items()}
+
+    def restore(self, values, gap=16):
+        # write back writable, non-volatile fields, touching only registers
+        # whose contents change; returns the addresses written
+        fields = [f for name, f in self.field_map.items() if name in values and not f.ro and
+            not any(a in self.volatile_regs for a in f.regs)]
+        addrs = sorted({a for f in fields for a in f.regs})
+
+        cur = dict(zip(addrs, self.read_scattered(addrs, gap=gap)))
+        words = dict(cur)
+        for f in fields:
+            f.encode(words, values[f.name])
+
+        diff = [a for a in addrs if words[a] != cur[a]]
+        if diff:
+            self.write_scattered(diff, [words[a] for a in diff])
+        return diff
 
-    def set_qpll1_sdm_cfg2(self, val):
-        self.write_word(0x00a4*2, val)
+    def masked_read(self, addr, mask):
+        return self.read_word(addr) & mask
 
-    def get_qpll1_cp_g3(self):
-        return self.masked_read(0x00a5*2, 0x03ff)
+    def masked_write(self, addr, mask, val):
+        return self.write_word(addr, (self.read_word(addr) & ~mask) | (val & mask))
 
-    def set_qpll1_cp_g3(self, val):
-        self.masked_write(0x00a5*2, 0x03ff, val)
+    async def masked_read_async(self, addr, mask):
+        return (await self.read_word_async(addr)) & mask
+
+    async def masked_write_async(self, addr, mask, val):
+        return await self.write_word_async(addr, ((await self.read_word_async(addr)) & ~mask) | (val & mask))
+
+
+class GTHE3CommonNode(DRPNode):
+    fields = [
+        # common registers
+        Field('common_cfg0', 0x0009*2),
+        Field('common_cfg1', 0x0089*2),
+
+        # QPLL0 registers
+        Field('qpll0_cfg0', 0x0008*2),
+        Field('qpll0_cfg1', 0x0010*2),
+        Field('qpll0_cfg2', 0x0011*2),
+        Field('qpll0_cfg3', 0x0015*2),
+        Field('qpll0_cfg4', 0x0030*2),
+        Field('qpll0_lock_cfg', 0x0012*2),
+        Field('qpll0_init_cfg0', 0x0013*2),
+        Field('qpll0_init_cfg1', 0x0014*2, 0xff00, 8),
+        Field('qpll0_fbdiv', 0x0014*2, 0x00ff, offset=2),
+        Field('qpll0_cp', 0x0016*2, 0x03ff),
+        Field('qpll0_refclk_div', 0x0018*2, 0x0780, 7),
+        Field('qpll0_lpf', 0x0019*2, 0x03ff),
+        Field('qpll0_cfg1_g3', 0x001a*2),
+        Field('qpll0_cfg2_g3', 0x001b*2),
+        Field('qpll0_lpf_g3', 0x001c*2, 0x03ff),
+        Field('qpll0_lock_cfg_g3', 0x001d*2),
+        Field('qpll0_fbdiv_g3', 0x001f*2, 0x00ff, offset=2),
+        Field('rx_rec_clk_out0_sel', 0x001f*2, 0x0003),
+        Field('qpll0_sdm_cfg0', 0x0020*2),
+        Field('qpll0_sdm_cfg1', 0x0021*2),
+        Field('qpll0_sdm_cfg2', 0x0024*2),
+        Field('qpll0_cp_g3', 0x0025*2, 0x03ff),
+
+        # QPLL1 registers
+        Field('qpll1_cfg0', 0x0088*2),
+        Field('qpll1_cfg1', 0x0090*2),
+        Field('qpll1_cfg2', 0x0091*2),
+        Field('qpll1_cfg3', 0x0095*2),
+        Field('qpll1_cfg4', 0x00b0*2),
+        Field('qpll1_lock_cfg', 0x0092*2),
+        Field('qpll1_init_cfg0', 0x0093*2),
+        Field('qpll1_init_cfg1', 0x0094*2, 0xff00, 8),
+        Field('qpll1_fbdiv', 0x0094*2, 0x00ff, offset=2),
+        Field('qpll1_cp', 0x0096*2, 0x03ff),
+        Field('qpll1_refclk_div', 0x0098*2, 0x0780, 7),
+        Field('qpll1_lpf', 0x0099*2, 0x03ff),
+        Field('qpll1_cfg1_g3', 0x009a*2),
+        Field('qpll1_cfg2_g3', 0x009b*2),
+        Field('qpll1_lpf_g3', 0x009c*2, 0x03ff),
+        Field('qpll1_lock_cfg_g3', 0x009d*2),
+        Field('qpll1_fbdiv_g3', 0x009f*2, 0x00ff, offset=2),
+        Field('rx_rec_clk_out1_sel', 0x009f*2, 0x0003),
+        Field('qpll1_sdm_cfg0', 0x00a0*2),
+        Field('qpll1_sdm_cfg1', 0x00a1*2),
+        Field('qpll1_sdm_cfg2', 0x00a4*2),
+        Field('qpll1_cp_g3', 0x00a5*2, 0x03ff),
+    ]
 
 node.register(GTHE3CommonNode, 0x8A80)
 
 
 class GTHE4CommonNode(GTHE3CommonNode):
-    # QPLL0 registers
-    def get_qpll0_clkout_rate(self):
-        return bool(self.masked_read(0x000e*2, 0x0001))
-
-    def set_qpll0_clkout_rate(self, val):
-        self.masked_write(0x000e*2, 0x0001, 0x0001 if val else 0x0000)
+    fields = [
+        # QPLL0 registers
+        Field('qpll0_clkout_rate', 0x000e*2, 0x0001, kind='bool'),
 
-    # QPLL 1 registers
-    def get_qpll1_clkout_rate(self):
-        return bool(self.masked_read(0x008e*2, 0x0001))
-
-    def set_qpll1_clkout_rate(self, val):
-        self.masked_write(0x008e*2, 0x0001, 0x0001 if val else 0x0000)
+        # QPLL 1 registers
+        Field('qpll1_clkout_rate', 0x008e*2, 0x0001, kind='bool'),
+    ]
 
 node.register(GTHE4CommonNode, 0x8A90)
 
 
 class GTYE3CommonNode(GTHE3CommonNode):
-    # QPLL0 registers
-    def get_qpll0_clkout_rate(self):
-        return bool(self.masked_read(0x000e*2, 0x0001))
-
-    def set_qpll0_clkout_rate(self, val):
-        self.masked_write(0x000e*2, 0x0001, 0x0001 if val else 0x0000)
-
-    def get_qpll0_ips_refclk_sel(self):
-        return self.masked_read(0x0018*2, 0x0038) >> 3
-
-    def set_qpll0_ips_refclk_sel(self, val):
-        self.masked_write(0x0018*2, 0x00038, val << 3)
-
-    def get_qpll0_ips_en(self):
-        return bool(self.masked_read(0x0018*2, 0x0001))
-
-    def set_qpll0_ips_en(self, val):
-        self.masked_write(0x0018*2, 0x0001, 0x0001 if val else 0x0000)
-
-    # QPLL 1 registers
-    def get_qpll1_clkout_rate(self):
-        return bool(self.masked_read(0x008e*2, 0x0001))
-
-    def set_qpll1_clkout_rate(self, val):
-        self.masked_write(0x008e*2, 0x0001, 0x0001 if val else 0x0000)
-
-    def get_qpll1_ips_refclk_sel(self):
-        return self.masked_read(0x0098*2, 0x0038) >> 3
-
-    def set_qpll1_ips_refclk_sel(self, val):
-        self.masked_write(0x0098*2, 0x00038, val << 3)
-
-    def get_qpll1_ips_en(self):
-        return bool(self.masked_read(0x0098*2, 0x0040))
-
-    def set_qpll1_ips_en(self, val):
-        self.masked_write(0x0098*2, 0x0040, 0x0040 if val else 0x0000)
+    fields = [
+        # QPLL0 registers
+        Field('qpll0_clkout_rate', 0x000e*2, 0x0001, kind='bool'),
+        Field('qpll0_ips_refclk_sel', 0x0018*2, 0x0038, 3),
+        Field('qpll0_ips_en', 0x0018*2, 0x0001, kind='bool'),
+
+        # QPLL 1 registers
+        Field('qpll1_clkout_rate', 0x008e*2, 0x0001, kind='bool'),
+        Field('qpll1_ips_refclk_sel', 0x0098*2, 0x0038, 3),
+        Field('qpll1_ips_en', 0x0098*2, 0x0040, kind='bool'),
+    ]
 
 node.register(GTYE3CommonNode, 0x8A82)
 
@@ -402,134 +416,132 @@ class GTYE4CommonNode(GTYE3CommonNode):
 node.register(GTYE4CommonNode, 0x8A92)
 
 
-class GTHE3ChannelNode(node.MemoryNode):
+class GTHE3ChannelNode(DRPNode):
+    # reset/reset done, PRBS control/status, eye scan and PRBS counters
+    volatile_regs = frozenset([0xfe00, 0xfe06, 0x0151*2, 0x0152*2, 0x0153*2, 0x015e*2, 0x015f*2])
+
+    # error count, sample count, control status
+    es_counter_regs = (0x0151*2, 0x0152*2, 0x0153*2)
+
+    fields = [
+        # IO to channel
+        Field('reset', 0xfe00, 0x0001, kind='bool'),
+        Field('tx_pcs_reset', 0xfe00, 0x0002, kind='bool'),
+        Field('tx_pma_reset', 0xfe00, 0x0004, kind='bool'),
+        Field('rx_pcs_reset', 0xfe00, 0x0008, kind='bool'),
+        Field('rx_pma_reset', 0xfe00, 0x0010, kind='bool'),
+        Field('rx_dfe_lpm_reset', 0xfe00, 0x0020, kind='bool'),
+        Field('eyescan_reset', 0xfe00, 0x0040, kind='bool'),
+        Field('tx_reset_done', 0xfe00, 0x0100, kind='bool', ro=True),
+        Field('tx_pma_reset_done', 0xfe00, 0x0200, kind='bool', ro=True),
+        Field('rx_reset_done', 0xfe00, 0x0400, kind='bool', ro=True),
+        Field('rx_pma_reset_done', 0xfe00, 0x0800, kind='bool', ro=True),
+        Field('tx_polarity', 0xfe02, 0x0001, kind='bool'),
+        Field('rx_polarity', 0xfe02, 0x0002, kind='bool'),
+        Field('tx_prbs_mode', 0xfe04, 0x000f),
+        Field('rx_prbs_mode', 0xfe04, 0x00f0, 4),
+        Field('tx_elecidle', 0xfe08, 0x0001, kind='bool'),
+        Field('tx_inhibit', 0xfe08, 0x0002, kind='bool'),
+        Field('tx_diffctrl', 0xfe0a, 0x001f),
+        Field('tx_maincursor', 0xfe0c, 0x007f),
+        Field('tx_postcursor', 0xfe0c, 0x001f),
+        Field('tx_precursor', 0xfe0e, 0x001f),
+
+        # RX
+        Field('rx_data_width_raw', 0x0003*2, 0x01e0, 5),
+        Field('rx_int_data_width_raw', 0x0066*2, 0x0003),
+        Field('rx_prbs_err_count', (0x015e*2, 0x015f*2), ro=True),
+
+        # eye scan
+        Field('es_prescale', 0x003c*2, 0x001f),
+        Field('es_eye_scan_en', 0x003c*2, 0x0100, kind='bool'),
+        Field('es_errdet_en', 0x003c*2, 0x0200, kind='bool'),
+        Field('es_control', 0x003c*2, 0xfc00, 10),
+        Field('es_qualifier', tuple(a*2 for a in range(0x003f, 0x0044))),
+        Field('es_qual_mask', tuple(a*2 for a in range(0x0044, 0x0049))),
+        Field('es_sdata_mask', tuple(a*2 for a in range(0x0049, 0x004e))),
+        Field('es_horz_offset', 0x004f*2, 0xfff0, 4),
+        Field('rx_eyescan_vs_range', 0x0097*2, 0x0003),
+        Field('rx_eyescan_vs_code', 0x0097*2, 0x01fc, 2),
+        Field('rx_eyescan_vs_ut_sign', 0x0097*2, 0x0200, kind='bool'),
+        Field('rx_eyescan_vs_neg_dir', 0x0097*2, 0x0400, kind='bool'),
+        Field('es_error_count', 0x0151*2, ro=True),
+        Field('es_sample_count', 0x0152*2, ro=True),
+        Field('es_control_status', 0x0153*2, 0x000f, ro=True),
+
+        # TX
+        Field('tx_data_width_raw', 0x007a*2, 0x000f),
+        Field('tx_int_data_width_raw', 0x0085*2, 0x0c00, 10),
+    ]
+
     def __init__(self, obj=None):
         self.rx_prbs_error = False
         super().__init__(obj)
 
-    def masked_read(self, addr, mask):
-        return self.read_word(addr) & mask
-
-    def masked_write(self, addr, mask, val):
-        return self.write_word(addr, (self.read_word(addr) & ~mask) | (val & mask))
-
-    # IO to channel
-    def get_reset(self):
-        return bool(self.masked_read(0xfe00, 0x0001))
-
-    def set_reset(self, val):
-        self.masked_write(0xfe00, 0x0001, 0x0001 if val else 0x0000)
-
     def reset(self):
         self.set_reset(1)
         self.set_reset(0)
 
-    def get_tx_pcs_reset(self):
-        return bool(self.masked_read(0xfe00, 0x0002))
-
-    def set_tx_pcs_reset(self, val):
-        self.masked_write(0xfe00, 0x0002, 0x0002 if val else 0x0000)
+    async def reset_async(self):
+        await self.set_reset_async(1)
+        await self.set_reset_async(0)
 
     def tx_pcs_reset(self):
         self.set_tx_pcs_reset(1)
         self.set_tx_pcs_reset(0)
 
-    def get_tx_pma_reset(self):
-        return bool(self.masked_read(0xfe00, 0x0004))
-
-    def set_tx_pma_reset(self, val):
-        self.masked_write(0xfe00, 0x0004, 0x0004 if val else 0x0000)
-
     def tx_pma_reset(self):
         self.set_tx_pma_reset(1)
         self.set_tx_pma_reset(0)
 
-    def get_rx_pcs_reset(self):
-        return bool(self.masked_read(0xfe00, 0x0008))
-
-    def set_rx_pcs_reset(self, val):
-        self.masked_write(0xfe00, 0x0008, 0x0008 if val else 0x0000)
-
     def rx_pcs_reset(self):
         self.set_rx_pcs_reset(1)
         self.set_rx_pcs_reset(0)
 
-    def get_rx_pma_reset(self):
-        return bool(self.masked_read(0xfe00, 0x0010))
-
-    def set_rx_pma_reset(self, val):
-        self.masked_write(0xfe00, 0x0010, 0x0010 if val else 0x0000)
-
     def rx_pma_reset(self):
         self.set_rx_pma_reset(1)
         self.set_rx_pma_reset(0)
 
-    def get_rx_dfe_lpm_reset(self):
-        return bool(self.masked_read(0xfe00, 0x0020))
-
-    def set_rx_dfe_lpm_reset(self, val):
-        self.masked_write(0xfe00, 0x0020, 0x0020 if val else 0x0000)
-
     def rx_dfe_lpm_reset(self):
         self.set_rx_dfe_lpm_reset(1)
         self.set_rx_dfe_lpm_reset(0)
 
-    def get_eyescan_reset(self):
-        return bool(self.masked_read(0xfe00, 0x0040))
-
-    def set_eyescan_reset(self, val):
-        self.masked_write(0xfe00, 0x0040, 0x0040 if val else 0x0000)
-
     def eyescan_reset(self):
         self.set_eyescan_reset(1)
         self.set_eyescan_reset(0)
 
-    def get_tx_reset_done(self):
-        return bool(self.masked_read(0xfe00, 0x0100))
-
-    def get_tx_pma_reset_done(self):
-        return bool(self.masked_read(0xfe00, 0x0200))
-
-    def get_rx_reset_done(self):
-        return bool(self.masked_read(0xfe00, 0x0400))
-
-    def get_rx_pma_reset_done(self):
-        return bool(self.masked_read(0xfe00, 0x0800))
-
-    def get_tx_polarity(self):
-        return bool(self.masked_read(0xfe02, 0x0001))
-
-    def set_tx_polarity(self, val):
-        self.masked_write(0xfe02, 0x0001, 0x0001 if val else 0x0000)
-
-    def get_rx_polarity(self):
-        return bool(self.masked_read(0xfe02, 0x0002))
-
-    def set_rx_polarity(self, val):
-        self.masked_write(0xfe02, 0x0002, 0x0002 if val else 0x0000)
-
-    def get_tx_prbs_mode(self):
-        return self.masked_read(0xfe04, 0x000f)
-
     def set_tx_prbs_mode(self, val):
         if type(val) is str:
             val = prbs_mode_mapping[val]
         self.masked_write(0xfe04, 0x000f, val)
 
-    def get_rx_prbs_mode(self):
-        return self.masked_read(0xfe04, 0x00f0) >> 4
+    async def set_tx_prbs_mode_async(self, val):
+        if type(val) is str:
+            val = prbs_mode_mapping[val]
+        await self.masked_write_async(0xfe04, 0x000f, val)
 
     def set_rx_prbs_mode(self, val):
         if type(val) is str:
             val = prbs_mode_mapping[val]
         self.masked_write(0xfe04, 0x00f0, val << 4)
 
+    async def set_rx_prbs_mode_async(self, val):
+        if type(val) is str:
+            val = prbs_mode_mapping[val]
+        await self.masked_write_async(0xfe04, 0x00f0, val << 4)
+
     def tx_prbs_force_error(self):
         self.masked_write(0xfe06, 0x0001, 0x0001)
 
     def rx_err_count_reset(self):
         self.masked_write(0xfe06, 0x0002, 0x0002)
 
+    async def tx_prbs_force_error_async(self):
+        await self.masked_write_async(0xfe06, 0x0001, 0x0001)
+
+    async def rx_err_count_reset_async(self):
+        await self.masked_write_async(0xfe06, 0x0002, 0x0002)
+
     def is_rx_prbs_error(self):
         val = self.rx_prbs_error
         self.rx_prbs_error = False
@@ -540,198 +552,41 @@ class GTHE3ChannelNode(node.MemoryNode):
         self.rx_prbs_error |= bool(w & 0x0004)
         return bool(w & 0x0008)
 
-    def get_tx_elecidle(self):
-        return bool(self.masked_read(0xfe08, 0x0001))
-
-    def set_tx_elecidle(self, val):
-        self.masked_write(0xfe08, 0x0001, 0x0001 if val else 0x0000)
-
-    def get_tx_inhibit(self):
-        return bool(self.masked_read(0xfe08, 0x0002))
-
-    def set_tx_inhibit(self, val):
-        self.masked_write(0xfe08, 0x0002, 0x0002 if val else 0x0000)
-
-    def get_tx_diffctrl(self):
-        return self.masked_read(0xfe0a, 0x001f)
-
-    def set_tx_diffctrl(self, val):
-        self.masked_write(0xfe0a, 0x001f, val)
-
-    def get_tx_maincursor(self):
-        return self.masked_read(0xfe0c, 0x007f)
-
-    def set_tx_maincursor(self, val):
-        self.masked_write(0xfe0c, 0x007f, val)
-
-    def get_tx_postcursor(self):
-        return self.masked_read(0xfe0c, 0x001f)
-
-    def set_tx_postcursor(self, val):
-        self.masked_write(0xfe0c, 0x001f, val)
-
-    def get_tx_precursor(self):
-        return self.masked_read(0xfe0e, 0x001f)
-
-    def set_tx_precursor(self, val):
-        self.masked_write(0xfe0e, 0x001f, val)
-
-    # channel registers
-
-    # RX
-    def get_rx_data_width_raw(self):
-        return self.masked_read(0x0003*2, 0x01e0) >> 5
+    async def is_rx_prbs_error_async(self):
+        val = self.rx_prbs_error
+        self.rx_prbs_error = False
+        return val | bool(await self.masked_read_async(0xfe06, 0x0004))
 
-    def set_rx_data_width_raw(self, val):
-        self.masked_write(0x0003*2, 0x01e0, val << 5)
+    async def is_rx_prbs_locked_async(self):
+        w = await self.masked_read_async(0xfe06, 0x000c)
+        self.rx_prbs_error |= bool(w & 0x0004)
+        return bool(w & 0x0008)
 
     def get_rx_data_width(self):
         dw = self.get_rx_data_width_raw()
         return (8*2**(dw >> 1) * (4 + (dw & 1))) >> 2
 
-    def get_rx_int_data_width_raw(self):
-        return self.masked_read(0x0066*2, 0x0003)
-
-    def set_rx_int_data_width_raw(self, val):
-        self.masked_write(0x0066*2, 0x0003, val)
-
     def get_rx_int_data_width(self):
         dw = self.get_rx_data_width_raw()
         idw = self.get_rx_int_data_width_raw()
         return (16*2**idw * (4 + (dw & 1))) >> 2
 
-    def get_rx_prbs_err_count(self):
-        return self.read_dword(0x015e*2)
-
-    # eye scan
-    def get_es_prescale(self):
-        return self.masked_read(0x003c*2, 0x001f)
-
-    def set_es_prescale(self, val):
-        self.masked_write(0x003c*2, 0x001f, val)
-
-    def get_es_eye_scan_en(self):
-        return bool(self.masked_read(0x003c*2, 0x0100))
-
-    def set_es_eye_scan_en(self, val):
-        self.masked_write(0x003c*2, 0x0100, 0x0100 if val else 0x0000)
-
-    def get_es_errdet_en(self):
-        return bool(self.masked_read(0x003c*2, 0x0200))
-
-    def set_es_errdet_en(self, val):
-        self.masked_write(0x003c*2, 0x0200, 0x0200 if val else 0x0000)
-
-    def get_es_control(self):
-        return self.masked_read(0x003c*2, 0xfc00) >> 10
-
-    def set_es_control(self, val):
-        self.masked_write(0x003c*2, 0xfc00, val << 10)
-
-    def get_es_qualifier(self):
-        val  = self.masked_read(0x003f*2, 0xffff) << 16*0
-        val |= self.masked_read(0x0040*2, 0xffff) << 16*1
-        val |= self.masked_read(0x0041*2, 0xffff) << 16*2
-        val |= self.masked_read(0x0042*2, 0xffff) << 16*3
-        val |= self.masked_read(0x0043*2, 0xffff) << 16*4
-        return val
-
-    def set_es_qualifier(self, val):
-        self.masked_write(0x003f*2, 0xffff, (val >> 64*0))
-        self.masked_write(0x0040*2, 0xffff, (val >> 48*1))
-        self.masked_write(0x0041*2, 0xffff, (val >> 32*2))
-        self.masked_write(0x0042*2, 0xffff, (val >> 16*3))
-        self.masked_write(0x0043*2, 0xffff, (val >> 16*4))
-
-    def get_es_qual_mask(self):
-        val  = self.masked_read(0x0044*2, 0xffff) << 16*0
-        val |= self.masked_read(0x0045*2, 0xffff) << 16*1
-        val |= self.masked_read(0x0046*2, 0xffff) << 16*2
-        val |= self.masked_read(0x0047*2, 0xffff) << 16*3
-        val |= self.masked_read(0x0048*2, 0xffff) << 16*4
-        return val
-
-    def set_es_qual_mask(self, val):
-        self.masked_write(0x0044*2, 0xffff, (val >> 16*0))
-        self.masked_write(0x0045*2, 0xffff, (val >> 16*1))
-        self.masked_write(0x0046*2, 0xffff, (val >> 16*2))
-        self.masked_write(0x0047*2, 0xffff, (val >> 16*3))
-        self.masked_write(0x0048*2, 0xffff, (val >> 16*4))
-
-    def get_es_sdata_mask(self):
-        val  = self.masked_read(0x0049*2, 0xffff) << 16*0
-        val |= self.masked_read(0x004a*2, 0xffff) << 16*1
-        val |= self.masked_read(0x004b*2, 0xffff) << 16*2
-        val |= self.masked_read(0x004c*2, 0xffff) << 16*3
-        val |= self.masked_read(0x004d*2, 0xffff) << 16*4
-        return val
-
-    def set_es_sdata_mask(self, val):
-        self.masked_write(0x0049*2, 0xffff, (val >> 16*0))
-        self.masked_write(0x004a*2, 0xffff, (val >> 16*1))
-        self.masked_write(0x004b*2, 0xffff, (val >> 16*2))
-        self.masked_write(0x004c*2, 0xffff, (val >> 16*3))
-        self.masked_write(0x004d*2, 0xffff, (val >> 16*4))
-
     def get_es_mask_width(self):
         return 80
 
-    def get_es_horz_offset(self):
-        return self.masked_read(0x004f*2, 0xfff0) >> 4
-
-    def set_es_horz_offset(self, val):
-        self.masked_write(0x004f*2, 0xfff0, val << 4)
-
-    def get_rx_eyescan_vs_range(self):
-        return self.masked_read(0x0097*2, 0x0003)
-
-    def set_rx_eyescan_vs_range(self, val):
-        self.masked_write(0x0097*2, 0x0003, val)
-
-    def get_rx_eyescan_vs_code(self):
-        return self.masked_read(0x0097*2, 0x01fc) >> 2
-
-    def set_rx_eyescan_vs_code(self, val):
-        self.masked_write(0x0097*2, 0x01fc, val << 2)
-
-    def get_rx_eyescan_vs_ut_sign(self):
-        return bool(self.masked_read(0x0097*2, 0x0200))
+    def get_es_counters(self):
+        # error count, sample count and control status in one read
+        err, samp, status = self.read_scattered(self.es_counter_regs)
+        return err, samp, status & 0x000f
 
-    def set_rx_eyescan_vs_ut_sign(self, val):
-        self.masked_write(0x0097*2, 0x0200, 0x0200 if val else 0x0000)
-
-    def get_rx_eyescan_vs_neg_dir(self):
-        return bool(self.masked_read(0x0097*2, 0x0400))
-
-    def set_rx_eyescan_vs_neg_dir(self, val):
-        self.masked_write(0x0097*2, 0x0400, 0x0400 if val else 0x0000)
-
-    def get_es_error_count(self):
-        return self.masked_read(0x0151*2, 0xffff)
-
-    def get_es_sample_count(self):
-        return self.masked_read(0x0152*2, 0xffff)
-
-    def get_es_control_status(self):
-        return self.masked_read(0x0153*2, 0x000f)
-
-    # TX
-    def get_tx_data_width_raw(self):
-        return self.masked_read(0x007a*2, 0x000f)
-
-    def set_tx_data_width_raw(self, val):
-        self.masked_write(0x007a*2, 0x000f, val)
+    async def get_es_counters_async(self):
+        err, samp, status = await self.read_scattered_async(self.es_counter_regs)
+        return err, samp, status & 0x000f
 
     def get_tx_data_width(self):
         dw = self.get_tx_data_width_raw()
         return (8*2**(dw >> 1) * (4 + (dw & 1))) >> 2
 
-    def get_tx_int_data_width_raw(self):
-        return self.masked_read(0x0085*2, 0x0c00) >> 10
-
-    def set_tx_int_data_width_raw(self, val):
-        self.masked_write(0x0085*2, 0x0c00, val << 10)
-
     def get_tx_int_data_width(self):
         dw = self.get_tx_data_width_raw()
         idw = self.get_tx_int_data_width_raw()
@@ -741,194 +596,50 @@ node.register(GTHE3ChannelNode, 0x8A81)
 
 
 class GTHE4ChannelNode(GTHE3ChannelNode):
-    # channel registers
-    def get_rx_prbs_err_count(self):
-        return self.read_dword(0x025e*2)
-
-    # eye scan
-    def get_es_qualifier(self):
-        val  = self.masked_read(0x003f*2, 0xffff) << 16*0
-        val |= self.masked_read(0x0040*2, 0xffff) << 16*1
-        val |= self.masked_read(0x0041*2, 0xffff) << 16*2
-        val |= self.masked_read(0x0042*2, 0xffff) << 16*3
-        val |= self.masked_read(0x0043*2, 0xffff) << 16*4
-        val |= self.masked_read(0x00e7*2, 0xffff) << 16*5
-        val |= self.masked_read(0x00e8*2, 0xffff) << 16*6
-        val |= self.masked_read(0x00e9*2, 0xffff) << 16*7
-        val |= self.masked_read(0x00ea*2, 0xffff) << 16*8
-        val |= self.masked_read(0x00eb*2, 0xffff) << 16*9
-        return val
+    volatile_regs = frozenset([0xfe00, 0xfe06, 0x0251*2, 0x0252*2, 0x0253*2, 0x025e*2, 0x025f*2])
 
-    def set_es_qualifier(self, val):
-        self.masked_write(0x003f*2, 0xffff, (val >> 16*0))
-        self.masked_write(0x0040*2, 0xffff, (val >> 16*1))
-        self.masked_write(0x0041*2, 0xffff, (val >> 16*2))
-        self.masked_write(0x0042*2, 0xffff, (val >> 16*3))
-        self.masked_write(0x0043*2, 0xffff, (val >> 16*4))
-        self.masked_write(0x00e7*2, 0xffff, (val >> 16*5))
-        self.masked_write(0x00e8*2, 0xffff, (val >> 16*6))
-        self.masked_write(0x00e9*2, 0xffff, (val >> 16*7))
-        self.masked_write(0x00ea*2, 0xffff, (val >> 16*8))
-        self.masked_write(0x00eb*2, 0xffff, (val >> 16*9))
-
-    def get_es_qual_mask(self):
-        val  = self.masked_read(0x0044*2, 0xffff) << 16*0
-        val |= self.masked_read(0x0045*2, 0xffff) << 16*1
-        val |= self.masked_read(0x0046*2, 0xffff) << 16*2
-        val |= self.masked_read(0x0047*2, 0xffff) << 16*3
-        val |= self.masked_read(0x0048*2, 0xffff) << 16*4
-        val |= self.masked_read(0x00ec*2, 0xffff) << 16*5
-        val |= self.masked_read(0x00ed*2, 0xffff) << 16*6
-        val |= self.masked_read(0x00ee*2, 0xffff) << 16*7
-        val |= self.masked_read(0x00ef*2, 0xffff) << 16*8
-        val |= self.masked_read(0x00f0*2, 0xffff) << 16*9
-        return val
+    es_counter_regs = (0x0251*2, 0x0252*2, 0x0253*2)
 
-    def set_es_qual_mask(self, val):
-        self.masked_write(0x0044*2, 0xffff, (val >> 16*0))
-        self.masked_write(0x0045*2, 0xffff, (val >> 16*1))
-        self.masked_write(0x0046*2, 0xffff, (val >> 16*2))
-        self.masked_write(0x0047*2, 0xffff, (val >> 16*3))
-        self.masked_write(0x0048*2, 0xffff, (val >> 16*4))
-        self.masked_write(0x00ec*2, 0xffff, (val >> 16*5))
-        self.masked_write(0x00ed*2, 0xffff, (val >> 16*6))
-        self.masked_write(0x00ee*2, 0xffff, (val >> 16*7))
-        self.masked_write(0x00ef*2, 0xffff, (val >> 16*8))
-        self.masked_write(0x00f0*2, 0xffff, (val >> 16*9))
-
-    def get_es_sdata_mask(self):
-        val  = self.masked_read(0x0049*2, 0xffff) << 16*0
-        val |= self.masked_read(0x004a*2, 0xffff) << 16*1
-        val |= self.masked_read(0x004b*2, 0xffff) << 16*2
-        val |= self.masked_read(0x004c*2, 0xffff) << 16*3
-        val |= self.masked_read(0x004d*2, 0xffff) << 16*4
-        val |= self.masked_read(0x00f1*2, 0xffff) << 16*5
-        val |= self.masked_read(0x00f2*2, 0xffff) << 16*6
-        val |= self.masked_read(0x00f3*2, 0xffff) << 16*7
-        val |= self.masked_read(0x00f4*2, 0xffff) << 16*8
-        val |= self.masked_read(0x00f5*2, 0xffff) << 16*9
-        return val
+    fields = [
+        # RX
+        Field('rx_prbs_err_count', (0x025e*2, 0x025f*2), ro=True),
 
-    def set_es_sdata_mask(self, val):
-        self.masked_write(0x0049*2, 0xffff, (val >> 16*0))
-        self.masked_write(0x004a*2, 0xffff, (val >> 16*1))
-        self.masked_write(0x004b*2, 0xffff, (val >> 16*2))
-        self.masked_write(0x004c*2, 0xffff, (val >> 16*3))
-        self.masked_write(0x004d*2, 0xffff, (val >> 16*4))
-        self.masked_write(0x00f1*2, 0xffff, (val >> 16*5))
-        self.masked_write(0x00f2*2, 0xffff, (val >> 16*6))
-        self.masked_write(0x00f3*2, 0xffff, (val >> 16*7))
-        self.masked_write(0x00f4*2, 0xffff, (val >> 16*8))
-        self.masked_write(0x00f5*2, 0xffff, (val >> 16*9))
+        # eye scan
+        Field('es_qualifier', tuple(a*2 for a in list(range(0x003f, 0x0044))+list(range(0x00e7, 0x00ec)))),
+        Field('es_qual_mask', tuple(a*2 for a in list(range(0x0044, 0x0049))+list(range(0x00ec, 0x00f1)))),
+        Field('es_sdata_mask', tuple(a*2 for a in list(range(0x0049, 0x004e))+list(range(0x00f1, 0x00f6)))),
+        Field('es_error_count', 0x0251*2, ro=True),
+        Field('es_sample_count', 0x0252*2, ro=True),
+        Field('es_control_status', 0x0253*2, 0x000f, ro=True),
+    ]
 
     def get_es_mask_width(self):
         return 160
 
-    def get_es_error_count(self):
-        return self.masked_read(0x0251*2, 0xffff)
-
-    def get_es_sample_count(self):
-        return self.masked_read(0x0252*2, 0xffff)
-
-    def get_es_control_status(self):
-        return self.masked_read(0x0253*2, 0x000f)
-
 node.register(GTHE4ChannelNode, 0x8A91)
 
 
 class GTYE3ChannelNode(GTHE3ChannelNode):
-    # channel registers
-    def get_rx_prbs_err_count(self):
-        return self.read_dword(0x025e*2)
-
-    # eye scan
-    def get_es_qualifier(self):
-        val  = self.masked_read(0x003f*2, 0xffff) << 16*0
-        val |= self.masked_read(0x0040*2, 0xffff) << 16*1
-        val |= self.masked_read(0x0041*2, 0xffff) << 16*2
-        val |= self.masked_read(0x0042*2, 0xffff) << 16*3
-        val |= self.masked_read(0x0043*2, 0xffff) << 16*4
-        val |= self.masked_read(0x00e7*2, 0xffff) << 16*5
-        val |= self.masked_read(0x00e8*2, 0xffff) << 16*6
-        val |= self.masked_read(0x00e9*2, 0xffff) << 16*7
-        val |= self.masked_read(0x00ea*2, 0xffff) << 16*8
-        val |= self.masked_read(0x00eb*2, 0xffff) << 16*9
-        return val
+    volatile_regs = frozenset([0xfe00, 0xfe06, 0x0251*2, 0x0252*2, 0x0253*2, 0x025e*2, 0x025f*2])
 
-    def set_es_qualifier(self, val):
-        self.masked_write(0x003f*2, 0xffff, (val >> 16*0))
-        self.masked_write(0x0040*2, 0xffff, (val >> 16*1))
-        self.masked_write(0x0041*2, 0xffff, (val >> 16*2))
-        self.masked_write(0x0042*2, 0xffff, (val >> 16*3))
-        self.masked_write(0x0043*2, 0xffff, (val >> 16*4))
-        self.masked_write(0x00e7*2, 0xffff, (val >> 16*5))
-        self.masked_write(0x00e8*2, 0xffff, (val >> 16*6))
-        self.masked_write(0x00e9*2, 0xffff, (val >> 16*7))
-        self.masked_write(0x00ea*2, 0xffff, (val >> 16*8))
-        self.masked_write(0x00eb*2, 0xffff, (val >> 16*9))
-
-    def get_es_qual_mask(self):
-        val  = self.masked_read(0x0044*2, 0xffff) << 16*0
-        val |= self.masked_read(0x0045*2, 0xffff) << 16*1
-        val |= self.masked_read(0x0046*2, 0xffff) << 16*2
-        val |= self.masked_read(0x0047*2, 0xffff) << 16*3
-        val |= self.masked_read(0x0048*2, 0xffff) << 16*4
-        val |= self.masked_read(0x00ec*2, 0xffff) << 16*5
-        val |= self.masked_read(0x00ed*2, 0xffff) << 16*6
-        val |= self.masked_read(0x00ee*2, 0xffff) << 16*7
-        val |= self.masked_read(0x00ef*2, 0xffff) << 16*8
-        val |= self.masked_read(0x00f0*2, 0xffff) << 16*9
-        return val
+    es_counter_regs = (0x0251*2, 0x0252*2, 0x0253*2)
 
-    def set_es_qual_mask(self, val):
-        self.masked_write(0x0044*2, 0xffff, (val >> 16*0))
-        self.masked_write(0x0045*2, 0xffff, (val >> 16*1))
-        self.masked_write(0x0046*2, 0xffff, (val >> 16*2))
-        self.masked_write(0x0047*2, 0xffff, (val >> 16*3))
-        self.masked_write(0x0048*2, 0xffff, (val >> 16*4))
-        self.masked_write(0x00ec*2, 0xffff, (val >> 16*5))
-        self.masked_write(0x00ed*2, 0xffff, (val >> 16*6))
-        self.masked_write(0x00ee*2, 0xffff, (val >> 16*7))
-        self.masked_write(0x00ef*2, 0xffff, (val >> 16*8))
-        self.masked_write(0x00f0*2, 0xffff, (val >> 16*9))
-
-    def get_es_sdata_mask(self):
-        val  = self.masked_read(0x0049*2, 0xffff) << 16*0
-        val |= self.masked_read(0x004a*2, 0xffff) << 16*1
-        val |= self.masked_read(0x004b*2, 0xffff) << 16*2
-        val |= self.masked_read(0x004c*2, 0xffff) << 16*3
-        val |= self.masked_read(0x004d*2, 0xffff) << 16*4
-        val |= self.masked_read(0x00f1*2, 0xffff) << 16*5
-        val |= self.masked_read(0x00f2*2, 0xffff) << 16*6
-        val |= self.masked_read(0x00f3*2, 0xffff) << 16*7
-        val |= self.masked_read(0x00f4*2, 0xffff) << 16*8
-        val |= self.masked_read(0x00f5*2, 0xffff) << 16*9
-        return val
+    fields = [
+        # RX
+        Field('rx_prbs_err_count', (0x025e*2, 0x025f*2), ro=True),
 
-    def set_es_sdata_mask(self, val):
-        self.masked_write(0x0049*2, 0xffff, (val >> 16*0))
-        self.masked_write(0x004a*2, 0xffff, (val >> 16*1))
-        self.masked_write(0x004b*2, 0xffff, (val >> 16*2))
-        self.masked_write(0x004c*2, 0xffff, (val >> 16*3))
-        self.masked_write(0x004d*2, 0xffff, (val >> 16*4))
-        self.masked_write(0x00f1*2, 0xffff, (val >> 16*5))
-        self.masked_write(0x00f2*2, 0xffff, (val >> 16*6))
-        self.masked_write(0x00f3*2, 0xffff, (val >> 16*7))
-        self.masked_write(0x00f4*2, 0xffff, (val >> 16*8))
-        self.masked_write(0x00f5*2, 0xffff, (val >> 16*9))
+        # eye scan
+        Field('es_qualifier', tuple(a*2 for a in list(range(0x003f, 0x0044))+list(range(0x00e7, 0x00ec)))),
+        Field('es_qual_mask', tuple(a*2 for a in list(range(0x0044, 0x0049))+list(range(0x00ec, 0x00f1)))),
+        Field('es_sdata_mask', tuple(a*2 for a in list(range(0x0049, 0x004e))+list(range(0x00f1, 0x00f6)))),
+        Field('es_error_count', 0x0251*2, ro=True),
+        Field('es_sample_count', 0x0252*2, ro=True),
+        Field('es_control_status', 0x0253*2, 0x000f, ro=True),
+    ]
 
     def get_es_mask_width(self):
         return 160
 
-    def get_es_error_count(self):
-        return self.masked_read(0x0251*2, 0xffff)
-
-    def get_es_sample_count(self):
-        return self.masked_read(0x0252*2, 0xffff)
-
-    def get_es_control_status(self):
-        return self.masked_read(0x0253*2, 0x000f)
-
 node.register(GTYE3ChannelNode, 0x8A83)
 
 
@@ -936,3 +647,184 @@ class GTYE4ChannelNode(GTYE3ChannelNode):
     pass
 
 node.register(GTYE4ChannelNode, 0x8A93)
+
+
+@functools.lru_cache(maxsize=None)
+def _normal_quantile(p):
+    # inverse of the standard normal CDF by bisection on math.erf
+    lo, hi = -40.0, 40.0
+    for k in range(100):
+        mid = (lo+hi)/2
+        if 0.5*(1+math.erf(mid/math.sqrt(2))) < p:
+            lo = mid
+        else:
+            hi = mid
+    return (lo+hi)/2
+
+
+def _chi2_quantile(p, df):
+    # Wilson-Hilferty approximation, exact for two degrees of freedom
+    if df == 2:
+        return -2*math.log(1-p)
+    z = _normal_quantile(p)
+    a = 2/(9*df)
+    return df*max(1-a+z*math.sqrt(a), 0)**3
+
+
+def ber_bounds(errors, bits, confidence=0.95):
+    """Two-sided Poisson confidence interval of a BER, returns (lower, upper)"""
+    if not bits:
+        return 0.0, 1.0
+    alpha = 1-confidence
+    lower = _chi2_quantile(alpha/2, 2*errors)/(2*bits) if errors else 0.0
+    upper = _chi2_quantile(1-alpha/2, 2*errors+2)/(2*bits)
+    return lower, min(upper, 1.0)
+
+
+PRBSSample = collections.namedtuple('PRBSSample', ['time', 'bits', 'errors', 'locked'])
+
+
+class PRBSLane(object):
+    def __init__(self, xcvr, line_rate, history=3600):
+        self.xcvr = xcvr
+        self.line_rate = line_rate
+
+        self.err_count_field = xcvr.field_map['rx_prbs_err_count']
+
+        self.locked = False
+        self.err_count = None
+        self.time = None
+
+        self.bits = 0
+        self.errors = 0
+        self.lock_losses = 0
+
+        self.history = collections.deque(maxlen=history)
+
+    def update(self, t, status, err_words):
+        # one poll sample: PRBS status word and raw error counter words
+        locked = bool(status & 0x0008)
+        self.xcvr.rx_prbs_error |= bool(status & 0x0004)
+
+        err_count = self.err_count_field.decode(dict(zip(self.err_count_field.regs, err_words)))
+
+        bits = errors = 0
+        if self.err_count is not None:
+            if locked and self.locked:
+                bits = int(self.line_rate*(t-self.time))
+                errors = err_count-self.err_count
+                if errors < 0:
+                    # the 32 bit counter went backwards: a wrap if the
+                    # difference modulo wraparound fits in the bits sent
+                    # since the last poll, otherwise a counter reset, after
+                    # which it holds the errors since the reset
+                    errors &= 0xffffffff
+                    if errors > bits:
+                        errors = err_count
+                self.bits += bits
+                self.errors += errors
+            elif self.locked:
+                self.lock_losses += 1
+
+        self.locked = locked
+        self.err_count = err_count
+        self.time = t
+
+        sample = PRBSSample(t, bits, errors, locked)
+        self.history.append(sample)
+        return sample
+
+    def ber(self):
+        return self.errors/self.bits if self.bits else 0.0
+
+    def ber_bounds(self, confidence=0.95):
+        return ber_bounds(self.errors, self.bits, confidence)
+
+    def recent(self, duration):
+        # bits and errors over the last duration seconds of history
+        bits = errors = 0
+        if self.time is None:
+            return bits, errors
+        for sample in reversed(self.history):
+            if sample.time <= self.time-duration:
+                break
+            bits += sample.bits
+            errors += sample.errors
+        return bits, errors
+
+
+class PRBSMonitor(object):
+    """PRBS BER monitor for many transceiver channels
+
+    Every poll reads the PRBS status and error counter of all lanes in one
+    batch.  Bits are counted from the line rate (bits per second, a number
+    or a dict keyed by channel node) and the time between polls, only while
+    the lane stayed locked.
+    """
+
+    def __init__(self, channels, line_rate, poll_period=1.0, history=3600, callback=None):
+        self.lanes = []
+        for ch in channels:
+            rate = line_rate[ch] if isinstance(line_rate, dict) else line_rate
+            self.lanes.append(PRBSLane(ch, rate, history))
+
+        self.poll_period = poll_period
+        self.callback = callback
+
+        # every poll is a single batch on one interface
+        self.interface = channels[0].interface if channels else None
+        for ch in channels:
+            if ch.interface is not self.interface:
+                raise Exception("PRBSMonitor: all channels must be on the same interface")
+
+        self.polls = 0
+        self.overruns = 0
+
+    def poll(self):
+        with self.interface.batch() as b:
+            txns = [(b.read_word(lane.xcvr, 0xfe06),
+                b.read_words(lane.xcvr, lane.err_count_field.regs[0], len(lane.err_count_field.regs)))
+                for lane in self.lanes]
+
+        results = [(status.result(), err.result()) for status, err in txns]
+        t = time.monotonic()
+
+        for lane, (status, err_words) in zip(self.lanes, results):
+            lane.update(t, status, err_words)
+
+        self.polls += 1
+
+        if self.callback:
+            self.callback(self)
+
+    def run(self, duration=None):
+        start = time.monotonic()
+        deadline = start
+        while duration is None or time.monotonic()-start < duration:
+            self.poll()
+
+            deadline += self.poll_period
+            now = time.monotonic()
+            if now > deadline:
+                # sweep took longer than the poll period, skip the missed slots
+                self.overruns += 1
+                deadline = now
+            else:
+                time.sleep(deadline-now)
+
+    def reset(self):
+        for lane in self.lanes:
+            lane.bits = 0
+            lane.errors = 0
+            lane.lock_losses = 0
+            lane.history.clear()
+
+    def ber(self):
+        bits = sum(lane.bits for lane in self.lanes)
+        errors = sum(lane.errors for lane in self.lanes)
+        return errors/bits if bits else 0.0
+
+    def summary(self, confidence=0.95):
+        # (node, locked, bits, errors, ber, lower, upper) per lane
+        return [(lane.xcvr, lane.locked, lane.bits, lane.errors, lane.ber())+lane.ber_bounds(confidence)
+            for lane in self.lanes]
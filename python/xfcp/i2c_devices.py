@@ -0,0 +1,229 @@
+"""
+
+Copyright (c) 2026 Missing Link Electronics, Inc.
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+"""
+
+import time
+
+from . import node
+from . import i2c_node
+
+
+def scan_tree(root, addrs=range(128)):
+    # scan the buses of every I2C master below root, with all probes
+    # issued together; returns {node: [addr, ...]}
+    masters = root.find_by_type(i2c_node.I2CNode)
+
+    with root.interface.batch():
+        txns = [m.submit_scan(addrs) for m in masters]
+
+    return {m: [a for txn in t for a in txn.result()] for m, t in zip(masters, txns)}
+
+
+class I2CEEPROM(object):
+    # 24Cxx style EEPROM; with single byte addressing, devices larger than
+    # 256 bytes take the upper offset bits in the device address
+    def __init__(self, i2c, addr=0x50, size=256, page_size=8, addr_width=1, poll_count=64, timeout=0.1):
+        self.i2c = i2c
+        self.addr = addr
+        self.size = size
+        self.page_size = page_size
+        self.addr_width = addr_width
+        # ack polls queued after each page write; a NACKed poll takes about
+        # 10 bit times (100 us at 100 kHz), so 64 polls cover a 5 ms write
+        # cycle with some margin
+        self.poll_count = poll_count
+        self.timeout = timeout
+
+    def device_addr(self, offset):
+        if self.addr_width == 1:
+            return self.addr | (offset >> 8)
+        return self.addr
+
+    def offset_bytes(self, offset):
+        return (offset & ((1 << 8*self.addr_width)-1)).to_bytes(self.addr_width, 'big')
+
+    def block_size(self):
+        # largest range readable without changing the device address
+        return 256 if self.addr_width == 1 else self.size
+
+    def check_range(self, offset, count):
+        if offset < 0 or offset+count > self.size:
+            raise ValueError("Range 0x%x+%d outside of %d byte EEPROM" % (offset, count, self.size))
+
+    def read(self, offset, count):
+        self.check_range(offset, count)
+
+        tx = self.i2c.transaction()
+        bs = self.block_size()
+        ops = []
+
+        k = offset
+        while k < offset+count:
+            n = min(offset+count, (k//bs+1)*bs)-k
+            tx.write_read(self.device_addr(k), self.offset_bytes(k), n)
+            ops.append(len(tx.ops)-1)
+            k += n
+
+        res = tx.execute()
+        return b''.join(res[k].value for k in ops)
+
+    def queue_polls(self, tx, offset, count):
+        # one byte reads, each followed by a status query; the device does
+        # not ack its address until the write cycle has completed
+        idx = []
+        tx.set_addr(self.device_addr(offset))
+        for k in range(count):
+            tx.read(1, start=True, stop=True).status()
+            idx.append(len(tx.ops)-1)
+        return idx
+
+    def wait_ready(self, offset=0):
+        deadline = time.monotonic()+self.timeout
+
+        while True:
+            tx = self.i2c.transaction().status()
+            idx = self.queue_polls(tx, offset, self.poll_count)
+            res = tx.execute()
+            if any(not res[k].value & 0x08 for k in idx):
+                return
+            if time.monotonic() > deadline:
+                raise Exception("EEPROM 0x%02x not responding" % self.addr)
+
+    def pages(self, offset, data):
+        k = 0
+        while k < len(data):
+            n = min(len(data)-k, self.page_size-(offset+k) % self.page_size)
+            yield offset+k, data[k:k+n]
+            k += n
+
+    def write(self, offset, data):
+        # one request per page: the page write, then ack polls; the next
+        # page only goes out once the device has acked a poll, so every
+        # page is programmed once and in order
+        self.check_range(offset, len(data))
+
+        for off, chunk in self.pages(offset, bytes(data)):
+            deadline = time.monotonic()+self.timeout
+
+            while True:
+                tx = self.i2c.transaction()
+                # clear missed ack flag
+                tx.status()
+                tx.set_addr(self.device_addr(off))
+                tx.write(self.offset_bytes(off)+chunk, start=True, stop=True).status()
+                k = len(tx.ops)-1
+                idx = self.queue_polls(tx, off, self.poll_count)
+                res = tx.execute()
+
+                if not res[k].value & 0x08:
+                    break
+
+                # page not acked, nothing was written
+                if time.monotonic() > deadline:
+                    raise Exception("Timed out writing EEPROM 0x%02x at offset 0x%x" % (self.addr, off))
+
+            if all(res[p].value & 0x08 for p in idx):
+                self.wait_ready(off)
+
+        return len(data)
+
+    def verify(self, offset, data):
+        return self.read(offset, len(data)) == bytes(data)
+
+
+class I2CRegisterDevice(object):
+    # register mapped device with 8 or 16 bit register addresses and
+    # values; consecutive registers are merged into block transfers when
+    # the device auto-increments its register pointer
+    def __init__(self, i2c, addr, reg_width=1, value_width=1, byteorder='big', auto_increment=True):
+        self.i2c = i2c
+        self.addr = addr
+        self.reg_width = reg_width
+        self.value_width = value_width
+        self.byteorder = byteorder
+        self.auto_increment = auto_increment
+
+    def reg_bytes(self, reg):
+        return reg.to_bytes(self.reg_width, 'big')
+
+    def runs(self, regs):
+        if self.auto_increment:
+            return node.coalesce(regs)
+        return [(r, 1) for r in sorted(set(regs))]
+
+    def submit_read_regs(self, tx, regs):
+        # queue reads for regs; returns a function mapping the results to
+        # {reg: value}
+        ws = self.value_width
+        ops = []
+
+        for start, count in self.runs(regs):
+            tx.write_read(self.addr, self.reg_bytes(start), count*ws)
+            ops.append((start, count, len(tx.ops)-1))
+
+        def decode(res):
+            vals = {}
+            for start, count, k in ops:
+                data = res[k].value
+                for i in range(count):
+                    vals[start+i] = int.from_bytes(data[i*ws:(i+1)*ws], self.byteorder)
+            return vals
+
+        return decode
+
+    def read_regs(self, regs):
+        regs = list(regs)
+        tx = self.i2c.transaction()
+        decode = self.submit_read_regs(tx, regs)
+        vals = decode(tx.execute())
+        return [vals[r] for r in regs]
+
+    def read_reg(self, reg):
+        return self.read_regs([reg])[0]
+
+    def submit_write_regs(self, tx, values):
+        # queue writes for {reg: value}
+        ws = self.value_width
+
+        for start, count in self.runs(values):
+            data = b''.join(values[start+i].to_bytes(ws, self.byteorder) for i in range(count))
+            tx.write_reg(self.addr, self.reg_bytes(start)+data)
+
+    def write_regs(self, values):
+        # values is {reg: value} or a sequence of (reg, value) pairs, the
+        # latter written in order without merging (configuration sequences)
+        tx = self.i2c.transaction()
+        if isinstance(values, dict):
+            self.submit_write_regs(tx, values)
+        else:
+            for reg, val in values:
+                self.submit_write_regs(tx, {reg: val})
+        tx.execute()
+
+    def write_reg(self, reg, value):
+        self.write_regs({reg: value})
+
+    def update_reg(self, reg, mask, value):
+        # read-modify-write
+        val = self.read_reg(reg)
+        self.write_reg(reg, (val & ~mask) | (value & mask))
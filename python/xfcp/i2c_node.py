@@ -22,6 +22,8 @@ THE SOFTWARE.
 
 """
 
+import asyncio
+import collections
 import struct
 
 from . import packet
@@ -29,6 +31,8 @@ from . import node
 
 
 class I2CPacket(packet.Packet):
+    __slots__ = ()
+
     def __init__(self, payload=b'', path=(), rpath=(), ptype=0x2C):
         super().__init__(payload, path, rpath, ptype)
 
@@ -174,6 +178,8 @@ class I2CPacket(packet.Packet):
 
 
 class I2CRequestPacket(I2CPacket):
+    __slots__ = ()
+
     def __init__(self, payload=b'', path=(), rpath=(), ptype=0x2C):
         super().__init__(payload, path, rpath, ptype)
 
@@ -199,6 +205,8 @@ packet.register(I2CRequestPacket, 0x2C)
 
 
 class I2CResponsePacket(I2CPacket):
+    __slots__ = ()
+
     def __init__(self, payload=b'', path=(), rpath=(), ptype=0x2D):
         super().__init__(payload, path, rpath, ptype)
 
@@ -223,59 +231,311 @@ class I2CResponsePacket(I2CPacket):
 packet.register(I2CResponsePacket, 0x2D)
 
 
+I2CResult = collections.namedtuple('I2CResult', ['op', 'addr', 'value'])
+
+
+class I2CTransaction(object):
+    # chains I2C operations into as few requests as possible; transfers are
+    # split at the 255 byte count limit and at the interface packet size
+    def __init__(self, node):
+        self.node = node
+        self.ops = []
+
+    def set_addr(self, addr):
+        self.ops.append(('set_addr', addr))
+        return self
+
+    def write(self, data, start=False, stop=False):
+        self.ops.append(('write', bytes(data), start, stop))
+        return self
+
+    def read(self, count=1, start=False, stop=False):
+        self.ops.append(('read', count, start, stop))
+        return self
+
+    def status(self):
+        self.ops.append(('status',))
+        return self
+
+    def set_prescale(self, prescale):
+        self.ops.append(('prescale', prescale))
+        return self
+
+    def write_reg(self, addr, data):
+        # complete register write to a device
+        return self.set_addr(addr).write(data, stop=True)
+
+    def write_read(self, addr, data, count):
+        # register read with repeated start
+        return self.set_addr(addr).write(data).read(count, start=True, stop=True)
+
+    def build(self):
+        # returns a list of (packet, parts), with parts listing the op index
+        # and kind of each command in the packet, in order
+        room = None
+        if self.node.interface.max_packet_size is not None:
+            # path/rpath, rpath tag, transaction tag, start tag, ptype
+            room = self.node.interface.max_packet_size-(len(self.node.path)+1+packet.TAG_LEN+1+1)
+
+        pkts = []
+        cur = None
+
+        def new_pkt():
+            nonlocal cur
+            pkt = I2CRequestPacket()
+            pkt.path = self.node.path
+            # the master keeps its address and bus state between requests,
+            # so split transfers continue without a repeated start
+            cur = [pkt, [], 0, 0]
+            pkts.append(cur)
+
+        def free():
+            # bytes left in the current request and its response
+            if room is None:
+                return 0x10000
+            return room-max(cur[2], cur[3])
+
+        for index, op in enumerate(self.ops):
+            kind = op[0]
+
+            if kind in ('set_addr', 'status', 'prescale'):
+                req, resp = {'set_addr': (1, 1), 'status': (1, 2), 'prescale': (3, 3)}[kind]
+                if cur is None or free() < resp:
+                    new_pkt()
+                if kind == 'set_addr':
+                    cur[0].pack_set_addr(op[1])
+                elif kind == 'status':
+                    cur[0].pack_status_query()
+                else:
+                    cur[0].pack_set_prescale(op[1])
+                cur[1].append((index, kind))
+                cur[2] += req
+                cur[3] += resp
+                continue
+
+            data, start, stop = op[1:]
+            count = len(data) if kind == 'write' else data
+            offset = 0
+
+            while True:
+                # command and count bytes, then at least one data byte
+                n = min(count-offset, 255)
+                if cur is None or free() < 2+min(n, 1):
+                    new_pkt()
+                n = min(n, free()-2)
+                last = offset+n >= count
+
+                if kind == 'write':
+                    cur[0].pack_write(data[offset:offset+n], start and offset == 0, stop and last)
+                    req = resp = 2+n if n != 1 else 2
+                else:
+                    cur[0].pack_read(n, start and offset == 0, stop and last)
+                    req, resp = (1, 2) if n == 1 else (2, 2+n)
+
+                cur[1].append((index, kind))
+                cur[2] += req
+                cur[3] += resp
+                offset += n
+
+                if last:
+                    break
+
+        return [(c[0], c[1]) for c in pkts]
+
+    def parse(self, pkt, parts):
+        res = []
+
+        for index, kind in parts:
+            if kind == 'set_addr':
+                val = pkt.unpack_set_addr()
+            elif kind == 'status':
+                val = pkt.unpack_status_query()
+            elif kind == 'prescale':
+                val = pkt.unpack_set_prescale()
+            elif kind == 'write':
+                val = pkt.unpack_write()
+                val = len(val[0]) if val is not None else None
+            else:
+                val = pkt.unpack_read()
+                val = bytes(val[0]) if val is not None else None
+            if val is None:
+                raise Exception("Truncated I2C response")
+            res.append((index, val))
+
+        return res
+
+    def submit(self):
+        return [self.node.interface.submit(pkt, lambda pkt, parts=parts: self.parse(pkt, parts)) for pkt, parts in self.build()]
+
+    def combine(self, parts):
+        # one result per operation, merging the chunks of split transfers
+        vals = {}
+        for lst in parts:
+            for index, val in lst:
+                if index in vals:
+                    vals[index] += val
+                else:
+                    vals[index] = val
+
+        res = []
+        addr = None
+        for index, op in enumerate(self.ops):
+            if op[0] == 'set_addr':
+                addr = op[1]
+            res.append(I2CResult(op[0], addr, vals[index]))
+        return res
+
+    def execute(self):
+        with self.node.interface.batch():
+            txns = self.submit()
+        return self.combine([txn.result() for txn in txns])
+
+    async def execute_async(self):
+        return self.combine(await asyncio.gather(*self.submit()))
+
+
 class I2CNode(node.Node):
     def __init__(self, obj=None):
         super(I2CNode, self).__init__(obj)
 
-    def read_i2c(self, addr, count):
+    def submit_read_i2c(self, addr, count):
         pkt = I2CRequestPacket()
         pkt.path = self.path
         pkt.pack_set_addr(addr)
         pkt.pack_read(count, stop=True)
-        self.interface.send(pkt)
-        pkt = self.interface.receive()
+        return self.interface.submit(pkt, self.parse_read_i2c)
+
+    def parse_read_i2c(self, pkt):
         pkt.unpack_set_addr()
         read = pkt.unpack_read()
-        return read[0]
+        return bytes(read[0])
 
-    def write_i2c(self, addr, data):
+    def read_i2c(self, addr, count):
+        return self.submit_read_i2c(addr, count).result()
+
+    async def read_i2c_async(self, addr, count):
+        return await self.submit_read_i2c(addr, count)
+
+    def submit_write_i2c(self, addr, data):
         pkt = I2CRequestPacket()
         pkt.path = self.path
         pkt.pack_set_addr(addr)
         pkt.pack_write(data, stop=True)
-        self.interface.send(pkt)
-        pkt = self.interface.receive()
+        return self.interface.submit(pkt, self.parse_write_i2c)
+
+    def parse_write_i2c(self, pkt):
         pkt.unpack_set_addr()
         write = pkt.unpack_write()
         return len(write[0])
 
-    def write_read_i2c(self, addr, data, count):
+    def write_i2c(self, addr, data):
+        return self.submit_write_i2c(addr, data).result()
+
+    async def write_i2c_async(self, addr, data):
+        return await self.submit_write_i2c(addr, data)
+
+    def submit_write_read_i2c(self, addr, data, count):
         pkt = I2CRequestPacket()
         pkt.path = self.path
         pkt.pack_set_addr(addr)
         pkt.pack_write(data)
         pkt.pack_read(count, stop=True)
-        self.interface.send(pkt)
-        pkt = self.interface.receive()
+        return self.interface.submit(pkt, self.parse_write_read_i2c)
+
+    def parse_write_read_i2c(self, pkt):
         pkt.unpack_set_addr()
         write = pkt.unpack_write()
         read = pkt.unpack_read()
-        return read[0]
+        return bytes(read[0])
 
-    def get_i2c_status(self):
+    def write_read_i2c(self, addr, data, count):
+        return self.submit_write_read_i2c(addr, data, count).result()
+
+    async def write_read_i2c_async(self, addr, data, count):
+        return await self.submit_write_read_i2c(addr, data, count)
+
+    def submit_get_i2c_status(self):
         pkt = I2CRequestPacket()
         pkt.path = self.path
         pkt.pack_status_query()
-        self.interface.send(pkt)
-        pkt = self.interface.receive()
-        return pkt.unpack_status_query()
+        return self.interface.submit(pkt, lambda pkt: pkt.unpack_status_query())
 
-    def set_i2c_prescale(self, prescale):
+    def get_i2c_status(self):
+        return self.submit_get_i2c_status().result()
+
+    async def get_i2c_status_async(self):
+        return await self.submit_get_i2c_status()
+
+    def submit_set_i2c_prescale(self, prescale):
         pkt = I2CRequestPacket()
         pkt.path = self.path
         pkt.pack_set_prescale(prescale)
-        self.interface.send(pkt)
-        pkt = self.interface.receive()
-        return pkt.unpack_set_prescale()
+        return self.interface.submit(pkt, lambda pkt: pkt.unpack_set_prescale())
+
+    def set_i2c_prescale(self, prescale):
+        return self.submit_set_i2c_prescale(prescale).result()
+
+    async def set_i2c_prescale_async(self, prescale):
+        return await self.submit_set_i2c_prescale(prescale)
+
+    def transaction(self):
+        return I2CTransaction(self)
+
+    def max_scan_probes(self):
+        # probes that fit in a single request; each probe is a 3 byte
+        # request (address, read, status) and a 5 byte response
+        if self.interface.max_packet_size is None:
+            return 128
+
+        # path/rpath, rpath tag, transaction tag, start tag, ptype, leading status query
+        hdr = len(self.path)+1+packet.TAG_LEN+1+1+2
+        return max((self.interface.max_packet_size-hdr)//5, 1)
+
+    def submit_scan(self, addrs=range(128)):
+        # probe each address with a one byte read followed by a status
+        # query, as many per request as fit; returns one transaction per
+        # request, each decoding to the addresses that acked
+        addrs = list(addrs)
+        size = self.max_scan_probes()
+        txns = []
+
+        for k in range(0, len(addrs), size):
+            pkt = I2CRequestPacket()
+            pkt.path = self.path
+            # clear missed ack flag left over from earlier transfers
+            pkt.pack_status_query()
+            for addr in addrs[k:k+size]:
+                pkt.pack_set_addr(addr)
+                pkt.pack_read(1, stop=True)
+                pkt.pack_status_query()
+            txns.append(self.interface.submit(pkt, self.parse_scan))
+
+        return txns
+
+    def parse_scan(self, pkt):
+        found = []
+
+        pkt.unpack_status_query()
+
+        while pkt.payload:
+            addr = pkt.unpack_set_addr()
+            pkt.unpack_read()
+            status = pkt.unpack_status_query()
+            if addr is None or status is None:
+                break
+            # bit 3: missed ack
+            if not status & 0x08:
+                found.append(addr)
+
+        return found
+
+    def scan(self, addrs=range(128)):
+        with self.interface.batch():
+            txns = self.submit_scan(addrs)
+        return [addr for txn in txns for addr in txn.result()]
+
+    async def scan_async(self, addrs=range(128)):
+        found = await asyncio.gather(*self.submit_scan(addrs))
+        return [addr for lst in found for addr in lst]
 
 node.register(I2CNode, 0x2C00, 8)
@@ -22,83 +22,543 @@ THE SOFTWARE.
 
 """
 
+import asyncio
+import collections
+import logging
+import queue
 import serial
 import socket
+import threading
 
 from . import packet
 from . import node
+from . import enum_cache
+
+logger = logging.getLogger(__name__)
+
+# raised by receive when a response does not arrive
+TIMEOUT_ERRORS = (TimeoutError, socket.timeout)
+
+
+class StaleEnumerationError(Exception):
+    # an access on a tree from the enumeration cache failed because the
+    # design has changed; the cache entry is gone and the interface has to
+    # be enumerated again
+    pass
+
+
+# single byte COBS code values
+_cobs_codes = [bytes([k]) for k in range(256)]
 
 
 def cobs_encode(block):
-    block = bytearray(block)
-    enc = bytearray()
+    # encode whole zero-delimited segments at a time
+    enc = []
 
-    seg = bytearray()
-    code = 1
+    segs = bytes(block).split(b'\x00')
+    last = len(segs)-1
 
-    new_data = True
+    for k, seg in enumerate(segs):
+        n = len(seg)
+        i = 0
 
-    for b in block:
-        if b == 0:
-            enc.append(code)
-            enc.extend(seg)
-            code = 1
-            seg = bytearray()
-            new_data = True
-        else:
-            code += 1
-            seg.append(b)
-            new_data = True
-            if code == 255:
-                enc.append(code)
-                enc.extend(seg)
-                code = 1
-                seg = bytearray()
-                new_data = False
+        # full 254 byte runs get code 255 and no implied zero
+        while n-i >= 254:
+            enc.append(b'\xff')
+            enc.append(seg[i:i+254])
+            i += 254
 
-    if new_data:
-        enc.append(code)
-        enc.extend(seg)
+        # no trailing code after the last segment if it ended on a full run
+        if i < n or k < last or n == 0:
+            enc.append(_cobs_codes[n-i+1])
+            enc.append(seg[i:])
 
-    return bytes(enc)
+    return b''.join(enc)
+
+
+def _cobs_decode_groups(block):
+    # copy whole code groups at a time
+    dec = []
+
+    i = 0
+    n = len(block)
+
+    while i < n:
+        code = block[i]
+        j = i+code
+        if j > n:
+            return None
+        dec.append(block[i+1:j])
+        i = j
+        if code < 255 and i < n:
+            dec.append(b'\x00')
+
+    return b''.join(dec)
 
 
 def cobs_decode(block):
-    block = bytearray(block)
-    dec = bytearray()
+    block = bytes(block)
+
+    if b'\x00' in block:
+        return None
 
-    code = 0
+    n = len(block)
 
+    # single code group, the frame holds no zero bytes
+    if not n or block[0] == n:
+        return block[1:]
+
+    if n >= 255:
+        return _cobs_decode_groups(block)
+
+    # a short frame has no full 254 byte runs, so every code byte but the
+    # first stands for a zero byte and the frame can be decoded in place
+    dec = bytearray(block)
     i = 0
 
-    if 0 in block:
-        return None
+    while i < n:
+        code = dec[i]
+        dec[i] = 0
+        i += code
 
-    while i < len(block):
-        code = block[i]
-        i += 1
-        if i+code-1 > len(block):
-            return None
-        dec.extend(block[i:i+code-1])
-        i += code-1
-        if code < 255 and i < len(block):
-            dec.append(0)
+    if i > n:
+        return None
 
+    del dec[0]
     return bytes(dec)
 
 
+class Transaction(object):
+    def __init__(self, interface, pkt, decode=None):
+        self.interface = interface
+        self.pkt = pkt
+        self.decode = decode
+        self.tag = None
+        self.response = None
+        self._done = False
+        self._value = None
+        self._exception = None
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        while not self._done:
+            self.interface.process()
+
+        if self._exception is not None:
+            raise self._exception
+
+        if self.decode is not None:
+            self._value = self.decode(self.response)
+            self.decode = None
+
+        return self._value
+
+    def __await__(self):
+        # lets the node coroutines run on a synchronous interface; the
+        # response is waited for in place, blocking the event loop
+        yield from ()
+        return self.result()
+
+    def set_response(self, pkt):
+        self.response = pkt
+        if self.decode is None:
+            self._value = pkt
+        self._done = True
+
+    def set_exception(self, exc):
+        self._exception = exc
+        self._done = True
+
+
+class TransactionGroup(object):
+    def __init__(self, txns, combine):
+        self.txns = txns
+        self.combine = combine
+
+    def done(self):
+        return all(txn.done() for txn in self.txns)
+
+    def result(self):
+        return self.combine([txn.result() for txn in self.txns])
+
+    def __await__(self):
+        yield from ()
+        return self.result()
+
+
+class Batch(object):
+    def __init__(self, interface):
+        self.interface = interface
+        self.txns = []
+
+    def __enter__(self):
+        self.interface._hold += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.interface._hold -= 1
+
+        if exc_type is not None:
+            # drop requests that have not been sent yet
+            for txn in self.txns:
+                if txn in self.interface._queue:
+                    self.interface._queue.remove(txn)
+                    txn.set_exception(exc)
+            return False
+
+        if self.interface._hold == 0:
+            self.interface.flush()
+
+        return False
+
+    def submit(self, pkt, decode=None):
+        txn = self.interface.submit(pkt, decode)
+        self.txns.append(txn)
+        return txn
+
+    # memory access
+    def read(self, node, addr, count, decode=None):
+        size = node.max_transfer_size()
+        if count <= size:
+            txn = node.submit_read(addr, count, decode)
+            self.txns.append(txn)
+            return txn
+
+        txns = [node.submit_read(addr+k, min(size, count-k), lambda data: data) for k in range(0, count, size)]
+        self.txns.extend(txns)
+        if decode is None:
+            return TransactionGroup(txns, b''.join)
+        return TransactionGroup(txns, lambda data: decode(b''.join(data)))
+
+    def read_words(self, node, addr, count, ws=2):
+        return self.read(node, addr, count*ws,
+            lambda data: [int.from_bytes(data[ws*k:ws*(k+1)], 'little') for k in range(count)])
+
+    def read_dwords(self, node, addr, count):
+        return self.read_words(node, addr, count, 4)
+
+    def read_qwords(self, node, addr, count):
+        return self.read_words(node, addr, count, 8)
+
+    def read_int(self, node, addr, ws):
+        txn = node.submit_read_int(addr, ws)
+        self.txns.append(txn)
+        return txn
+
+    def read_byte(self, node, addr):
+        return self.read_int(node, addr, 1)
+
+    def read_word(self, node, addr):
+        return self.read_int(node, addr, 2)
+
+    def read_dword(self, node, addr):
+        return self.read_int(node, addr, 4)
+
+    def read_qword(self, node, addr):
+        return self.read_int(node, addr, 8)
+
+    def write(self, node, addr, data):
+        size = node.max_transfer_size()
+        if len(data) <= size:
+            txn = node.submit_write(addr, data)
+            self.txns.append(txn)
+            return txn
+
+        view = memoryview(data)
+        txns = [node.submit_write(addr+k, view[k:k+size]) for k in range(0, len(data), size)]
+        self.txns.extend(txns)
+        return TransactionGroup(txns, sum)
+
+    def write_words(self, node, addr, data, ws=2):
+        return self.write(node, addr, b''.join(w.to_bytes(ws, 'little') for w in data))
+
+    def write_dwords(self, node, addr, data):
+        return self.write_words(node, addr, data, 4)
+
+    def write_qwords(self, node, addr, data):
+        return self.write_words(node, addr, data, 8)
+
+    def write_byte(self, node, addr, data):
+        return self.write(node, addr, bytes([data]))
+
+    def write_word(self, node, addr, data):
+        return self.write_words(node, addr, [data])
+
+    def write_dword(self, node, addr, data):
+        return self.write_dwords(node, addr, [data])
+
+    def write_qword(self, node, addr, data):
+        return self.write_qwords(node, addr, [data])
+
+    # I2C
+    def read_i2c(self, node, addr, count):
+        txn = node.submit_read_i2c(addr, count)
+        self.txns.append(txn)
+        return txn
+
+    def write_i2c(self, node, addr, data):
+        txn = node.submit_write_i2c(addr, data)
+        self.txns.append(txn)
+        return txn
+
+    def write_read_i2c(self, node, addr, data, count):
+        txn = node.submit_write_read_i2c(addr, data, count)
+        self.txns.append(txn)
+        return txn
+
+    def get_i2c_status(self, node):
+        txn = node.submit_get_i2c_status()
+        self.txns.append(txn)
+        return txn
+
+    def set_i2c_prescale(self, node, prescale):
+        txn = node.submit_set_i2c_prescale(prescale)
+        self.txns.append(txn)
+        return txn
+
+
 class Interface(object):
-    def __init__(self):
+    def __init__(self, window=1):
         self._root = None
 
+        self.window = window
+
+        # transport address, used as the enumeration cache key
+        self.address = None
+
+        # identify switch children on first access
+        self.lazy = False
+
+        # largest packet the transport can carry, None for no limit
+        self.max_packet_size = None
+
+        self._tag = 0
+        self._hold = 0
+        self._queue = collections.deque()
+        self._in_flight = collections.OrderedDict()
+        self._id_pkts = {}
+        self._cache = None
+
     def send(self, packet):
         raise NotImplementedError()
 
     def receive(self):
         raise NotImplementedError()
 
-    def enumerate(self):
-        self._root = node.enumerate_interface(self)
+    def submit(self, pkt, decode=None):
+        txn = Transaction(self, pkt, decode)
+        self._queue.append(txn)
+        if not self._hold:
+            self.issue()
+        return txn
+
+    def transact(self, pkt, decode=None):
+        return self.submit(pkt, decode).result()
+
+    def identify(self, path):
+        pkt = self._id_pkts.get(tuple(path))
+        if pkt is not None:
+            return pkt
+        return self.transact(packet.IDRequestPacket(path=path))
+
+    def identify_paths(self, paths):
+        # send ID requests for several nodes at once, regardless of window;
+        # switches prepend their port to the response path on the way up,
+        # so an untagged response comes back with the path of its node
+        self.flush()
+
+        paths = [tuple(p) for p in paths]
+        pending = set(paths)
+        pkts = {}
+
+        self.send_packets([packet.IDRequestPacket(path=p) for p in paths])
+
+        while pending:
+            pkt = self.receive()
+            p = tuple(pkt.path)
+            if not pkt.rpath and p in pending:
+                pending.remove(p)
+                pkts[p] = pkt
+
+        return [pkts[p] for p in paths]
+
+    def get_id_pkts(self, paths):
+        # ID packets for several nodes, taken from the enumeration cache
+        # where possible, identifying the rest together
+        paths = [tuple(p) for p in paths]
+        missing = [p for p in paths if p not in self._id_pkts]
+
+        if missing:
+            for p, pkt in zip(missing, self.identify_paths(missing)):
+                self._id_pkts[p] = pkt
+
+        return [self._id_pkts[p] for p in paths]
+
+    def send_packets(self, pkts):
+        for pkt in pkts:
+            self.send(pkt)
+
+    def issue(self):
+        pkts = []
+
+        while self._queue and len(self._in_flight) < max(self.window, 1):
+            txn = self._queue.popleft()
+
+            if self.window > 1:
+                # tag request via rpath so that the response can be matched
+                t = self._tag
+                self._tag = (self._tag + 1) % packet.TAG_COUNT
+                txn.tag = tuple((t // 0xfe**k) % 0xfe for k in range(packet.TAG_LEN))
+                txn.pkt.rpath = tuple(txn.pkt.rpath) + txn.tag
+
+            self._in_flight[txn.tag] = txn
+            pkts.append(txn.pkt)
+
+        if pkts:
+            try:
+                self.send_packets(pkts)
+            except Exception as ex:
+                err = self.abort(ex)
+                if err is not ex:
+                    raise err
+                raise
+
+    def process(self):
+        if not self._in_flight:
+            self.issue()
+            if not self._in_flight:
+                return
+
+        try:
+            pkt = self.receive()
+        except Exception as ex:
+            err = self.abort(ex)
+            if err is not ex:
+                raise err
+            raise
+
+        if None in self._in_flight:
+            txn = self._in_flight.pop(None)
+        else:
+            txn = self._in_flight.pop(tuple(pkt.rpath[-packet.TAG_LEN:]), None)
+            if txn is None:
+                # stale or unknown response, drop it
+                return
+            pkt.rpath = pkt.rpath[:-packet.TAG_LEN]
+
+        txn.set_response(pkt)
+
+        self.issue()
+
+    def flush(self):
+        while self._queue or self._in_flight:
+            self.process()
+
+    def abort(self, ex):
+        # fail every outstanding transaction, returns the exception to raise
+        txns = list(self._in_flight.values()) + list(self._queue)
+        self._in_flight.clear()
+        self._queue.clear()
+
+        try:
+            # a node missing from the design shows up as a timeout
+            if self._cache is not None and txns and isinstance(ex, TIMEOUT_ERRORS):
+                path = tuple(txns[0].pkt.path)
+                if self._check_cached_node(path):
+                    stale = StaleEnumerationError("node %s is missing or has changed since the cached enumeration, enumerate again" %
+                        ('.'.join(str(p) for p in path) or 'root'))
+                    stale.__cause__ = ex
+                    ex = stale
+        finally:
+            for txn in txns:
+                txn.set_exception(ex)
+
+        return ex
+
+    def _check_cached_node(self, path):
+        # an access on a tree built from the enumeration cache failed:
+        # re-identify the node; if it is gone or has changed, drop the
+        # cache entry and the tree built from it and return True
+        cache, self._cache = self._cache, None
+
+        n = self._root.get_by_path(path) if self._root is not None else None
+
+        try:
+            pkt = self.identify_paths([path])[0]
+            stale = n is None or bytes(pkt.payload) != bytes(n.id_pkt.payload)
+        except TIMEOUT_ERRORS:
+            # no response, node is gone
+            stale = True
+        except Exception:
+            # transport failure, says nothing about the tree
+            self._cache = cache
+            raise
+
+        if stale:
+            cache.invalidate(self.address)
+            self._root = None
+        else:
+            self._cache = cache
+
+        return stale
+
+    def batch(self):
+        return Batch(self)
+
+    def enumerate(self, cache=None, lazy=False):
+        # cache is an EnumerationCache, a cache file name or True for the
+        # default cache file; a cached tree is used if the root node still
+        # returns the same ID.  With lazy, switch children are identified
+        # on first access instead of up front.
+        if cache is True or isinstance(cache, str):
+            cache = enum_cache.EnumerationCache(cache if isinstance(cache, str) else None)
+        if not cache or self.address is None:
+            cache = None
+
+        self.lazy = lazy
+        self._id_pkts = {}
+        self._cache = None
+        level = [()] if cache is not None or not lazy else []
+        pkts = None
+
+        try:
+            if cache is not None:
+                pkts = self.identify_paths(level)
+                id_pkts = cache.load(self.address, pkts[0])
+                if id_pkts is not None:
+                    self._id_pkts = id_pkts
+                    self._root = node.enumerate_interface(self)
+                    self._cache = cache
+                    return self._root
+
+            while level:
+                if pkts is None:
+                    pkts = self.identify_paths(level)
+
+                next_level = []
+
+                for p, pkt in zip(level, pkts):
+                    self._id_pkts[p] = pkt
+                    n = node.Node().init(pkt)
+                    cls = node.match_type(n.ntype)
+                    if cls is not None and issubclass(cls, node.SwitchNode):
+                        next_level.extend(p+(k,) for k in range(pkt.payload[3]))
+
+                level = next_level
+                pkts = None
+
+            # build node tree from collected ID packets
+            self._root = node.enumerate_interface(self)
+
+            if cache is not None:
+                cache.store(self.address, self._id_pkts)
+                self._cache = cache
+        finally:
+            if not lazy:
+                self._id_pkts = {}
+
         return self._root
 
     def get_root(self):
@@ -108,14 +568,23 @@ class Interface(object):
 
 
 class SerialInterface(Interface):
-    def __init__(self, port='/dev/ttyUSB0', baud=115200, timeout=10, driver=None):
+    def __init__(self, port='/dev/ttyUSB0', baud=115200, timeout=10, driver=None, window=4):
         """
         driver is expected to be a SerialDriver class from the labgrid module
         """
-        super().__init__()
+        # the link delivers responses in order, so keeping several requests
+        # in flight hides the turnaround; requests are still tagged, as the
+        # UART interface drops frames when its 512 byte receive FIFO is
+        # full, and an untagged response stream would then pair every later
+        # response with the wrong request.  The window is kept small so
+        # that a few write requests fit in that FIFO.
+        super().__init__(window)
 
         self.port = port
         self.baud = baud
+        self.address = f"serial:{port}"
+
+        self._timeout = timeout
 
         # if labgrid driver is given, use labgrid driver
         if driver is None:
@@ -123,24 +592,104 @@ class SerialInterface(Interface):
         else:
             self.serial_port = driver.serial
 
+        # without cancel_read (e.g. some labgrid transports), close() can
+        # only stop the reader thread once its read returns, so bound the
+        # read with a short timeout; the response timeout is applied on
+        # the receive queue, not on the port
+        if not hasattr(self.serial_port, 'cancel_read'):
+            self.serial_port.timeout = self.READ_POLL_PERIOD
+
+        # received packets are parsed by a background reader thread; an
+        # exception from the port stops it and is raised on every later
+        # send and receive
+        self._rx_queue = queue.Queue()
+        self._error = None
+        self._running = True
+        self._reader = threading.Thread(target=self._run_reader, daemon=True)
+        self._reader.start()
+
+    READ_POLL_PERIOD = 0.1
+
     @property
     def timeout(self):
-        return self.serial_port.timeout
+        return self._timeout
 
     @timeout.setter
     def timeout(self, value):
-        self.serial_port.timeout = value
+        self._timeout = value
+
+    def close(self):
+        self._running = False
+        if hasattr(self.serial_port, 'cancel_read'):
+            self.serial_port.cancel_read()
+        self._reader.join()
+        self.serial_port.close()
+
+    def _check_error(self):
+        if self._error is not None:
+            raise self._error
 
     def send(self, pkt):
+        self._check_error()
         self.serial_port.write(cobs_encode(pkt.build())+b'\x00')
 
+    def send_packets(self, pkts):
+        self._check_error()
+        # coalesce packets into a single write
+        self.serial_port.write(b''.join(cobs_encode(pkt.build())+b'\x00' for pkt in pkts))
+
     def receive(self):
-        return packet.parse(cobs_decode(self.serial_port.read_until(b'\x00')[:-1]))
+        self._check_error()
+
+        try:
+            pkt = self._rx_queue.get(timeout=self._timeout)
+        except queue.Empty:
+            raise TimeoutError("timed out waiting for response")
+
+        # None wakes up a receive waiting when the reader failed
+        if pkt is None:
+            self._rx_queue.put(None)
+            self._check_error()
+
+        return pkt
+
+    def _run_reader(self):
+        buf = b''
+
+        try:
+            while self._running:
+                # read whatever is buffered, blocking for at least one byte
+                data = self.serial_port.read(max(self.serial_port.in_waiting, 1))
+                if not data:
+                    continue
+
+                frames = (buf+data).split(b'\x00')
+                buf = frames.pop()
+
+                for frame in frames:
+                    if not frame:
+                        continue
+                    try:
+                        pkt = cobs_decode(frame)
+                        if pkt is None:
+                            raise ValueError("invalid COBS encoding")
+                        if not pkt:
+                            continue
+                        self._rx_queue.put(packet.parse(pkt))
+                    except Exception as ex:
+                        # drop malformed packet; the request it answered
+                        # times out
+                        logger.warning("%s: dropping malformed frame %s: %s", self.address, frame.hex(), ex)
+        except Exception as ex:
+            if self._running:
+                logger.error("%s: serial reader stopped: %s", self.address, ex)
+                self._error = ex
+                self._rx_queue.put(None)
 
 
 class UDPInterface(Interface):
-    def __init__(self, host, port=14000, timeout=10):
-        super().__init__()
+    def __init__(self, host, port=14000, timeout=10, window=8, mtu=1500):
+        super().__init__(window)
 
         if ':' in host:
             host, port = host.rsplit(':', 2)
@@ -148,6 +697,10 @@ class UDPInterface(Interface):
 
         self.host = host
         self.port = port
+        self.address = f"udp:{host}:{port}"
+        self.mtu = mtu
+        # IPv4 and UDP headers
+        self.max_packet_size = mtu-28
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.socket.settimeout(timeout)
 
@@ -163,4 +716,201 @@ class UDPInterface(Interface):
         self.socket.sendto(pkt.build(), (self.host, self.port))
 
     def receive(self):
-        return packet.parse(self.socket.recvfrom(1500)[0])
+        return packet.parse(self.socket.recvfrom(65536)[0])
+
+
+class AsyncInterface(object):
+    def __init__(self, timeout=10, window=1):
+        self._root = None
+
+        self.timeout = timeout
+        self.window = window
+
+        # largest packet the transport can carry, None for no limit
+        self.max_packet_size = None
+
+        self._tag = 0
+        self._in_flight = {}
+        self._semaphore = None
+        self._id_pkts = {}
+
+    async def open(self):
+        raise NotImplementedError()
+
+    def close(self):
+        raise NotImplementedError()
+
+    def send(self, pkt):
+        raise NotImplementedError()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def packet_received(self, pkt):
+        fut = self._in_flight.pop(tuple(pkt.rpath[-packet.TAG_LEN:]), None)
+        if fut is None:
+            # stale or unknown response, drop it
+            return
+        pkt.rpath = pkt.rpath[:-packet.TAG_LEN]
+
+        if not fut.done():
+            fut.set_result(pkt)
+
+    def connection_lost(self, exc):
+        if exc is None:
+            exc = ConnectionError("connection closed")
+        for fut in self._in_flight.values():
+            if not fut.done():
+                fut.set_exception(exc)
+        self._in_flight.clear()
+
+    async def transact(self, pkt, decode=None):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(self.window, 1))
+
+        async with self._semaphore:
+            # tag request via rpath so that the response can be matched;
+            # always, as a response arriving after its request timed out
+            # must not be taken for the answer to the next one
+            t = self._tag
+            self._tag = (self._tag + 1) % packet.TAG_COUNT
+            tag = tuple((t // 0xfe**k) % 0xfe for k in range(packet.TAG_LEN))
+            pkt.rpath = tuple(pkt.rpath) + tag
+
+            fut = asyncio.get_event_loop().create_future()
+            self._in_flight[tag] = fut
+
+            try:
+                self.send(pkt)
+                pkt = await asyncio.wait_for(fut, self.timeout)
+            finally:
+                if self._in_flight.get(tag) is fut:
+                    del self._in_flight[tag]
+
+        if decode is not None:
+            return decode(pkt)
+
+        return pkt
+
+    def submit(self, pkt, decode=None):
+        return asyncio.ensure_future(self.transact(pkt, decode))
+
+    def identify(self, path):
+        return self._id_pkts[tuple(path)]
+
+    async def enumerate(self):
+        # collect ID packets for the whole tree, one level at a time
+        self._id_pkts = {}
+        level = [()]
+
+        while level:
+            pkts = await asyncio.gather(*[self.transact(packet.IDRequestPacket(path=p)) for p in level])
+
+            next_level = []
+
+            for p, pkt in zip(level, pkts):
+                self._id_pkts[p] = pkt
+                n = node.Node().init(pkt)
+                cls = node.match_type(n.ntype)
+                if cls is not None and issubclass(cls, node.SwitchNode):
+                    next_level.extend(p+(k,) for k in range(pkt.payload[3]))
+
+            level = next_level
+
+        # build node tree from collected ID packets
+        self._root = node.enumerate_interface(self)
+        return self._root
+
+    async def get_root(self):
+        if self._root is None:
+            await self.enumerate()
+        return self._root
+
+
+class _AsyncDatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, interface):
+        self.interface = interface
+
+    def datagram_received(self, data, addr):
+        self.interface.packet_received(packet.parse(data))
+
+    def error_received(self, exc):
+        self.interface.connection_lost(exc)
+
+    def connection_lost(self, exc):
+        self.interface.connection_lost(exc)
+
+
+class AsyncUDPInterface(AsyncInterface):
+    def __init__(self, host, port=14000, timeout=10, window=64, mtu=1500):
+        super().__init__(timeout, window)
+
+        if ':' in host:
+            host, port = host.rsplit(':', 2)
+            port = int(port)
+
+        self.host = host
+        self.port = port
+        self.mtu = mtu
+        # IPv4 and UDP headers
+        self.max_packet_size = mtu-28
+        self.transport = None
+
+    async def open(self):
+        self.transport, protocol = await asyncio.get_event_loop().create_datagram_endpoint(
+            lambda: _AsyncDatagramProtocol(self), remote_addr=(self.host, self.port))
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+    def send(self, pkt):
+        self.transport.sendto(pkt.build())
+
+
+class AsyncSerialInterface(AsyncInterface):
+    def __init__(self, port='/dev/ttyUSB0', baud=115200, timeout=10, window=4):
+        super().__init__(timeout, window)
+
+        self.port = port
+        self.baud = baud
+        self.reader = None
+        self.writer = None
+        self._reader_task = None
+
+    async def open(self):
+        try:
+            import serial_asyncio
+        except ImportError:
+            raise ImportError("AsyncSerialInterface requires the pyserial-asyncio package")
+
+        self.reader, self.writer = await serial_asyncio.open_serial_connection(url=self.port, baudrate=self.baud)
+        self._reader_task = asyncio.ensure_future(self._run_reader())
+
+    def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def send(self, pkt):
+        self.writer.write(cobs_encode(pkt.build())+b'\x00')
+
+    async def _run_reader(self):
+        try:
+            while True:
+                data = await self.reader.readuntil(b'\x00')
+                data = cobs_decode(data[:-1])
+                if data:
+                    self.packet_received(packet.parse(data))
+        except asyncio.CancelledError:
+            raise
+        except Exception as ex:
+            self.connection_lost(ex)
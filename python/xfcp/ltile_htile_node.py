@@ -23,15 +23,51 @@ THE SOFTWARE.
 
 """
 
+import array
+import logging
+import sys
+import time
+import types
+import warnings
+
 from . import node
 
+logger = logging.getLogger(__name__)
 
+# deprecated: verbosity of the print based tracing this module used to do;
+# tracing now goes through the module logger, and setting PRINT_VERBOSITY
+# sets the logger level (messages then need a logging handler to show up)
 PRINT_VERBOSITY_TRACE = 4
 PRINT_VERBOSITY_INFO = 3
 PRINT_VERBOSITY_WARN = 2
 PRINT_VERBOSITY_ERROR = 1
 PRINT_VERBOSITY_QUIET = 0
-PRINT_VERBOSITY = PRINT_VERBOSITY_INFO
+
+_verbosity_levels = {
+    PRINT_VERBOSITY_TRACE: logging.DEBUG,
+    PRINT_VERBOSITY_INFO: logging.INFO,
+    PRINT_VERBOSITY_WARN: logging.WARNING,
+    PRINT_VERBOSITY_ERROR: logging.ERROR,
+    PRINT_VERBOSITY_QUIET: logging.CRITICAL+1,
+}
+
+
+class _LTileHTileModule(types.ModuleType):
+    # module type with PRINT_VERBOSITY mapped onto the logger level
+    @property
+    def PRINT_VERBOSITY(self):
+        level = logger.getEffectiveLevel()
+        return max([v for v, l in _verbosity_levels.items() if l >= level] or [PRINT_VERBOSITY_QUIET])
+
+    @PRINT_VERBOSITY.setter
+    def PRINT_VERBOSITY(self, val):
+        warnings.warn("PRINT_VERBOSITY is deprecated, set the level of the "
+            "'%s' logger instead" % __name__, DeprecationWarning, stacklevel=2)
+        val = min(max(val, PRINT_VERBOSITY_QUIET), PRINT_VERBOSITY_TRACE)
+        logger.setLevel(_verbosity_levels[val])
+
+
+sys.modules[__name__].__class__ = _LTileHTileModule
 
 # register offsets taken from Intel document:
 # L- and H-Tile Transceiver PHY User Guide 683621 | 2022.07.20
@@ -76,101 +112,206 @@ prbs_verifier_deserializer_factor_mapping = {
     10: PRBS_VERIFIER_DESERIALIZER_FACTOR_10BIT
 }
 
+# PRBS soft accumulator block: control at 0x500, accumulated error count
+# at 0x501 - 0x507 and accumulated bit count at 0x50D - 0x513, one byte
+# per register, least significant byte first, 50 bits each
+PRBS_SOFT_ACC_BASE = 0x500
+PRBS_SOFT_ACC_LEN = 0x14
+PRBS_SOFT_ACC_SNAP = 0x0004
+PRBS_SOFT_ACC_DONE = 0x0008
+PRBS_SOFT_ACC_ERR_CNT = 0x501
+PRBS_SOFT_ACC_BIT_CNT = 0x50D
+
+
+def decode_prbs_soft_acc_cnt(data, reg, start=PRBS_SOFT_ACC_BASE):
+    # data is a ranged read starting at register start, 4 byte stride
+    k = (reg - start)*4
+    val = 0
+    for i in range(7):
+        val |= data[k+i*4] << (i*8)
+    return val & ((1 << 50)-1)
+
+
+# channel register window, addr_off << 11
+CHANNEL_REG_SPACE = 0x800
+
+
+def diff_reg_space(dump, ref, start=0):
+    """Compare two register dumps, returns [(addr, dump value, ref value)]
+
+    ref is either another dump starting at the same register or a dict of
+    {addr: value} holding only the registers of interest (e.g. a known-good
+    configuration).
+    """
+    if isinstance(ref, dict):
+        items = ((addr, val) for addr, val in sorted(ref.items()) if 0 <= addr-start < len(dump))
+    else:
+        items = ((start+k, val) for k, val in enumerate(ref[:len(dump)]))
+    return [(addr, dump[addr-start], val) for addr, val in items if dump[addr-start] != val]
+
+
+# configuration sequences, (channel register, mask, value) applied in order
+# with LTileHTileNode.apply_sequence
+
+# see set_transceiver_prbs_components
+TRANSCEIVER_PRBS_COMPONENTS_SEQ = (
+    (0x164, 0x80, 0x80),
+    (0x210, 0x1F, 0x09),
+    (0x212, 0xE0, 0x00),
+    (0x213, 0xFF, 0x47),
+    (0x214, 0x01, 0x00),
+    (0x215, 0x01, 0x00),
+    (0x218, 0xC1, 0x40),
+    (0x223, 0x1F, 0x00),
+    (0x300, 0x3F, 0x00),
+    (0x312, 0xFF, 0x07),
+    (0x313, 0xFF, 0x02),
+    (0x315, 0x47, 0x00),
+    (0x318, 0x03, 0x02),
+    (0x31A, 0x1C, 0x04),
+    (0x320, 0x07, 0x02),
+    (0x321, 0x1E, 0x18),
+    (0x322, 0x73, 0x41),
+)
+
+# see set_transceiver_bounded_channels_configuration
+TRANSCEIVER_BOUNDED_CHANNELS_SEQ = (
+    (0x0B, 0x02, 0x02),
+    (0x0C, 0x02, 0x02),
+    (0x10A, 0x01, 0x00),
+    (0x10B, 0x01, 0x01),
+    (0x111, 0x19, 0x18),
+    (0x123, 0xC0, 0x80),
+    (0x12A, 0x90, 0x90),
+)
+
+# see set_prbs_soft_accumulator
+PRBS_SOFT_ACCUMULATOR_SEQ = (
+    # counter enable
+    (0x500, 0x0001, 0x0001),
+    # reset pulse
+    (0x500, 0x0002, 0x0002),
+    (0x500, 0x0002, 0x0000),
+    # clear snapshot
+    (0x500, 0x0004, 0x0000),
+)
+
 class LTileHTileNode(node.MemoryNode):
     # expected byte address
     def masked_read(self, addr, mask):
         # multiple byte address by 4 so it does not get
         # truncated because of 32 bit access of AXI4-Lite (converted to Avalon-MM)
         val = self.read_word(addr << 2) & mask
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: masked_read: address: " + str(hex(addr)) + ", mask: " + str(hex(mask)) + ", data: " + str(hex(val)))
+        logger.debug("masked_read: address: %#x, mask: %#x, data: %#x", addr, mask, val)
         return val
 
     # expected byte address
     def masked_write(self, addr, mask, val):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: masked_write: address: " + str(hex(addr)) + ", mask: " + str(hex(mask) + ", data: " + str(hex(val))))
+        logger.debug("masked_write: address: %#x, mask: %#x, data: %#x", addr, mask, val)
         # multiple byte address by 4 so it does not get
         # truncated because of 32 bit access of AXI4-Lite (converted to Avalon-MM)
         return self.write_word(addr << 2, (self.read_word(addr << 2) & ~mask) | (val & mask))
 
+    def apply_sequence(self, addr_off, seq):
+        # pipelined read-modify-write of a configuration sequence, split
+        # into runs that touch each register at most once; a register is
+        # read again before every repeat write (pulsed control bits share
+        # registers with status bits), and the reads for the next run go
+        # out in the same batch as the writes of the current one
+        base = addr_off << 11
+        runs = []
+        for addr, mask, val in seq:
+            if not runs or any(addr == r[0] for r in runs[-1]):
+                runs.append([])
+            runs[-1].append((addr, mask, val))
+
+        trace = logger.isEnabledFor(logging.DEBUG)
+
+        with self.interface.batch() as b:
+            txns = [b.read_word(self, (base + addr) << 2) for addr, mask, val in runs[0]] if runs else []
+
+        for k, run in enumerate(runs):
+            words = [txn.result() for txn in txns]
+            with self.interface.batch() as b:
+                for (addr, mask, val), word in zip(run, words):
+                    if trace:
+                        logger.debug("masked_write: address: %#x, mask: %#x, data: %#x", base + addr, mask, val)
+                    b.write_word(self, (base + addr) << 2, (word & ~mask) | (val & mask))
+                if k+1 < len(runs):
+                    txns = [b.read_word(self, (base + addr) << 2) for addr, mask, val in runs[k+1]]
+
+    def read_reg_space(self, addr_off, start=0, stop=CHANNEL_REG_SPACE):
+        # registers start to stop-1 of a channel as an array of bytes, read
+        # with a few large pipelined reads over the addr << 2 stride
+        logger.debug("read_reg_space: addr_off: %d, start: %#x, stop: %#x", addr_off, start, stop)
+        data = self.read(((addr_off << 11) + start) << 2, (stop-start)*4)
+        return array.array('B', data[::4])
+
     def dump_reg_space(self, addr_off, start, stop):
-        for addr in range(start, stop, 0x001):
-            print("Address: " + str(hex(addr)) + ": " + str(hex(self.masked_read(addr, 0xFF))))
+        dump = self.read_reg_space(addr_off, start, stop)
+        print('\n'.join("Address: " + str(hex(start+k)) + ": " + str(hex(val)) for k, val in enumerate(dump)))
+        return dump
 
     # return True if the receiver is locked to data
     def get_rx_locked_to_data(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_rx_locked_to_data")
+        logger.debug("get_rx_locked_to_data")
         return bool(self.masked_read((addr_off << 11) + 0x480, 0x0001))
 
     # return True if the receiver is locked to reference clock
     def get_rx_locked_to_ref(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_rx_locked_to_ref")
+        logger.debug("get_rx_locked_to_ref")
         return bool(self.masked_read((addr_off << 11) + 0x480, 0x0002))
 
     # steps to follow to view Eyescan may also apply to run BER measurement
     # presented in documentation L- and H-Tile Transceiver PHY User Guide 683621 | 2022.07.20
     # on pages 161 - 162
     def disable_background_calibration(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: disable_background_calibration")
+        logger.debug("disable_background_calibration")
         self.masked_write((addr_off << 11) + 0x542, 0x01, 0x00)
 
     def is_avmm_bus_busy(self, addr_off):
         # return True if PreSICE has control of the internal configuration bus
         # return False if you have control of internal configuration bus
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: is_avmm_bus_busy")
+        logger.debug("is_avmm_bus_busy")
         return bool(self.masked_read((addr_off << 11) + 0x481, 0x04))
 
     def is_rx_adaption_mode_manual(self, addr_off):
         # return True if RX adaptation is in manual mode, return False otherwise
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: is_rx_adaption_mode_manual")
+        logger.debug("is_rx_adaption_mode_manual")
         return bool(self.masked_read((addr_off << 11) + 0x161, 0x20))
 
     def release_adaptation_from_reset(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: release_adaptation_from_reset")
+        logger.debug("release_adaptation_from_reset")
         self.masked_write((addr_off << 11) + 0x148, 0x01, 0x01)
 
     def enable_cnt_to_detect_error_bits(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: enable_cnt_to_detect_error_bits")
+        logger.debug("enable_cnt_to_detect_error_bits")
         self.masked_write((addr_off << 11) + 0x169, 0x40, 0x01)
 
     def enable_serial_bit_checker(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: enable_serial_bit_checker")
+        logger.debug("enable_serial_bit_checker")
         self.masked_write((addr_off << 11) + 0x168, 0x01, 0x01)
 
     def is_dfe_enabled(self, addr_off):
         # return True if DFE is enabled, return False otherwise
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: is_dfe_enabled")
+        logger.debug("is_dfe_enabled")
         return True if (self.masked_read((addr_off << 11) + 0x161, 0x40) == 0) else False
 
     def enable_dfe_speculation(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: enable_dfe_speculation")
+        logger.debug("enable_dfe_speculation")
         self.masked_write((addr_off << 11) + 0x169, 0x04, 0x04)
 
     def disable_dfe_speculation(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: disable_dfe_speculation")
+        logger.debug("disable_dfe_speculation")
         self.masked_write((addr_off << 11) + 0x169, 0x04, 0x00)
 
     def enable_serial_bit_checker_control(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: enable_serial_bit_checker_control")
+        logger.debug("enable_serial_bit_checker_control")
         self.masked_write((addr_off << 11) + 0x158, 0x20, 0x20)
 
     # PRBS Generator registers
     def get_prbs_gen_prbs_tx_pma_data_sel(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_gen_prbs_tx_pma_data_sel")
+        logger.debug("get_prbs_gen_prbs_tx_pma_data_sel")
         # bits[4:3] from 0x008[6:5]
         msb = self.masked_read((addr_off << 11) + 0x008, 0b1100000) >> 5
         # bits[2:0] from 0x006[2:0]
@@ -179,39 +320,38 @@ class LTileHTileNode(node.MemoryNode):
         return val
 
     def set_prbs_gen_prbs_tx_pma_data_sel(self, addr_off, val):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_prbs_gen_prbs_tx_pma_data_sel")
+        logger.debug("set_prbs_gen_prbs_tx_pma_data_sel")
+        self.apply_sequence(addr_off, self.prbs_gen_prbs_tx_pma_data_sel_seq(val))
+
+    def prbs_gen_prbs_tx_pma_data_sel_seq(self, val):
         if ((val != PRBS_GENERATOR_TX_PMA_DATA_SEL_SQUARE_WAVE) and \
                 (val != PRBS_GENERATOR_TX_PMA_DATA_SEL_PRBS_PATTERN)):
             raise Exception("set_prbs_gen_prbs_tx_pma_data_sel: unsupport TX PMA data selected: " + str(hex(val)))
-        # bits[4:3] to 0x008[6:5]
-        self.masked_write((addr_off << 11) + 0x008, 0b1100000, (val & 0b11000) << 2)
-        # bits[2:0] to 0x006[2:0]
-        self.masked_write((addr_off << 11) + 0x006, 0b00111, val & 0b00111)
+        return [
+            # bits[4:3] to 0x008[6:5]
+            (0x008, 0b1100000, (val & 0b11000) << 2),
+            # bits[2:0] to 0x006[2:0]
+            (0x006, 0b00111, val & 0b00111),
+        ]
 
     def get_prbs_gen_prbs9_dwidth(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_gen_prbs9_dwidth")
+        logger.debug("get_prbs_gen_prbs9_dwidth")
         return bool(self.masked_read((addr_off << 11) + 0x006, 0x0008))
 
     def set_prbs_gen_prbs9_dwidth(self, addr_off, val):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_prbs_gen_prbs9_dwidth")
+        logger.debug("set_prbs_gen_prbs9_dwidth")
         self.masked_write((addr_off << 11) + 0x006, 0x0008, 0x0008 if val else 0x0000)
 
     def get_prbs_gen_prbs_clken(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_gen_prbs_clken")
+        logger.debug("get_prbs_gen_prbs_clken")
         return bool(self.masked_read((addr_off << 11) + 0x006, 0x0040))
 
     def set_prbs_gen_prbs_clken(self, addr_off, val):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_prbs_gen_prbs_clken")
+        logger.debug("set_prbs_gen_prbs_clken")
         self.masked_write((addr_off << 11) + 0x006, 0x0040, 0x0040 if val else 0x0000)
 
     def get_prbs_gen_prbs_pat(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_gen_prbs_pat")
+        logger.debug("get_prbs_gen_prbs_pat")
         # bit[4] from 0x008[4]
         msb = self.masked_read((addr_off << 11) + 0x008, 0x0010)
         # bits[3:0] from 0x007[7:4]
@@ -220,8 +360,10 @@ class LTileHTileNode(node.MemoryNode):
         return val
 
     def set_prbs_gen_prbs_pat(self, addr_off, val):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_prbs_gen_prbs_pat")
+        logger.debug("set_prbs_gen_prbs_pat")
+        self.apply_sequence(addr_off, self.prbs_gen_prbs_pat_seq(val))
+
+    def prbs_gen_prbs_pat_seq(self, val):
         # check if argument is a string and map it to register value
         if type(val) is str:
             val = prbs_mode_mapping[val]
@@ -234,27 +376,29 @@ class LTileHTileNode(node.MemoryNode):
                  (val != PRBS_MODE_PRBS23) and \
                  (val != PRBS_MODE_PRBS31)):
             raise Exception("set_prbs_gen_prbs_pat: unsupported PRBS pattern selected: " + str(hex(val)))
-        # bit[4] to 0x008[4]
-        self.masked_write((addr_off << 11) + 0x008, 0x0010, val & 0x0010)
-        # bits[3:0] to 0x007[7:4]
-        self.masked_write((addr_off << 11) + 0x007, 0x00F0, (val & 0x000F) << 4)
+        return [
+            # bit[4] to 0x008[4]
+            (0x008, 0x0010, val & 0x0010),
+            # bits[3:0] to 0x007[7:4]
+            (0x007, 0x00F0, (val & 0x000F) << 4),
+        ]
 
     def get_prbs_gen_ser_mode(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_gen_ser_mode")
+        logger.debug("get_prbs_gen_ser_mode")
         read = self.masked_read((addr_off << 11) + 0x110, 0x0007)
         if (read == PRBS_GENERATOR_SERIALIZER_MODE_64BIT):
             return 64
         elif (read == PRBS_GENERATOR_SERIALIZER_MODE_10BIT):
             return 10
         else:
-            if (PRINT_VERBOSITY >= PRINT_VERBOSITY_WARN):
-                print("WARN: get_prbs_gen_ser_mode: unknown PRBS generator serializer mode: " + str(hex(read)))
+            logger.warning("get_prbs_gen_ser_mode: unknown PRBS generator serializer mode: %#x", read)
             return 0
 
     def set_prbs_gen_ser_mode(self, addr_off, val):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_prbs_gen_ser_mode")
+        logger.debug("set_prbs_gen_ser_mode")
+        self.apply_sequence(addr_off, self.prbs_gen_ser_mode_seq(val))
+
+    def prbs_gen_ser_mode_seq(self, val):
         if type(val) is int:
             val = prbs_generator_serializer_mode_mapping[val]
         else:
@@ -262,32 +406,27 @@ class LTileHTileNode(node.MemoryNode):
         if ((val != PRBS_GENERATOR_SERIALIZER_MODE_64BIT) and
                 (val != PRBS_GENERATOR_SERIALIZER_MODE_10BIT)):
             raise Exception("set_prbs_gen_ser_mode: unsupported PRBS generator serializer mode: " + str(hex(val)))
-        self.masked_write((addr_off << 11) + 0x110, 0x0007, val & 0x0007)
+        return [(0x110, 0x0007, val & 0x0007)]
 
     # PRBS Verifier registers
     def get_prbs_ver_prbs_clken(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_ver_prbs_clken")
+        logger.debug("get_prbs_ver_prbs_clken")
         return bool(self.masked_read((addr_off << 11) + 0x00A, 0x0080))
 
     def set_prbs_ver_prbs_clken(self, addr_off, val):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_prbs_ver_prbs_clken")
+        logger.debug("set_prbs_ver_prbs_clken")
         self.masked_write((addr_off << 11) + 0x00A, 0x0080, 0x0080 if val else 0x0000)
 
     def get_prbs_ver_rx_prbs_mask(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_ver_rx_prbs_mask")
+        logger.debug("get_prbs_ver_rx_prbs_mask")
         return (self.masked_read((addr_off << 11) + 0x00B, 0x000C) >> 2)
 
     def set_prbs_ver_rx_prbs_mask(self, addr_off, val):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_prbs_ver_rx_prbs_mask")
+        logger.debug("set_prbs_ver_rx_prbs_mask")
         self.masked_write((addr_off << 11) + 0x00B, 0x000C, val << 2)
 
     def get_prbs_ver_prbs_pat(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_ver_prbs_pat")
+        logger.debug("get_prbs_ver_prbs_pat")
         # bit[4] from 0x00C[0]
         msb = self.masked_read((addr_off << 11) + 0x00C, 0x0001)
         # bits[3:0] from 0x00B[7:4]
@@ -296,8 +435,10 @@ class LTileHTileNode(node.MemoryNode):
         return val
 
     def set_prbs_ver_prbs_pat(self, addr_off, val):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_prbs_ver_prbs_pat")
+        logger.debug("set_prbs_ver_prbs_pat")
+        self.apply_sequence(addr_off, self.prbs_ver_prbs_pat_seq(val))
+
+    def prbs_ver_prbs_pat_seq(self, val):
         # check if argument is a string and map it to register value
         if type(val) is str:
             val = prbs_mode_mapping[val]
@@ -310,37 +451,37 @@ class LTileHTileNode(node.MemoryNode):
                  (val != PRBS_MODE_PRBS23) and \
                  (val != PRBS_MODE_PRBS31)):
             raise Exception("set_prbs_ver_prbs_pat: unsupported PRBS pattern selected: " + str(hex(val)))
-        # bit[4] to 0x00C[0]
-        self.masked_write((addr_off << 11) + 0x00C, 0x0001, (val & 0x0010) >> 4)
-        # bits[3:0] to 0x00B[7:4]
-        self.masked_write((addr_off << 11) + 0x00B, 0x00F0, (val & 0x000F) << 4)
+        return [
+            # bit[4] to 0x00C[0]
+            (0x00C, 0x0001, (val & 0x0010) >> 4),
+            # bits[3:0] to 0x00B[7:4]
+            (0x00B, 0x00F0, (val & 0x000F) << 4),
+        ]
 
     def get_prbs_ver_prbs9_dwidth(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_ver_prbs9_dwidth")
+        logger.debug("get_prbs_ver_prbs9_dwidth")
         return bool(self.masked_read((addr_off << 11) + 0x00C, 0x0008))
 
     def set_prbs_ver_prbs9_dwidth(self, addr_off, val):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_prbs_ver_prbs9_dwidth")
+        logger.debug("set_prbs_ver_prbs9_dwidth")
         self.masked_write((addr_off << 11) + 0x00C, 0x0008, 0x0008 if val else 0x0000)
 
     def get_prbs_ver_deser_factor(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_ver_deser_factor")
+        logger.debug("get_prbs_ver_deser_factor")
         read = self.masked_read((addr_off << 11) + 0x13F, 0x000F)
         if (read == PRBS_VERIFIER_DESERIALIZER_FACTOR_64BIT):
             return 64
         elif (read == PRBS_VERIFIER_DESERIALIZER_FACTOR_10BIT):
             return 10
         else:
-            if (PRINT_VERBOSITY >= PRINT_VERBOSITY_WARN):
-                print("WARN: get_prbs_ver_deser_factor: unknown PRBS verifier deserializer factor: " + str(hex(read)))
+            logger.warning("get_prbs_ver_deser_factor: unknown PRBS verifier deserializer factor: %#x", read)
             return 0
 
     def set_prbs_ver_deser_factor(self, addr_off, val):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_prbs_ver_deser_factor")
+        logger.debug("set_prbs_ver_deser_factor")
+        self.apply_sequence(addr_off, self.prbs_ver_deser_factor_seq(val))
+
+    def prbs_ver_deser_factor_seq(self, val):
         if type(val) is int:
             val = prbs_verifier_deserializer_factor_mapping[val]
         else:
@@ -348,104 +489,111 @@ class LTileHTileNode(node.MemoryNode):
         if ((val != PRBS_VERIFIER_DESERIALIZER_FACTOR_64BIT) and
                 (val != PRBS_VERIFIER_DESERIALIZER_FACTOR_10BIT)):
             raise Exception("set_prbs_ver_deser_factor: unsupported PRBS verifier deserializer factor: " + str(hex(val)))
-        self.masked_write((addr_off << 11) + 0x13F, 0x000F, val & 0x000F)
+        return [(0x13F, 0x000F, val & 0x000F)]
 
     # PRBS Soft Accumulators registers
     def get_prbs_soft_acc_prbs_counter_en(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_soft_acc_prbs_counter_en")
+        logger.debug("get_prbs_soft_acc_prbs_counter_en")
         return bool(self.masked_read((addr_off << 11) + 0x500, 0x0001))
 
     def set_prbs_soft_acc_prbs_counter_en(self, addr_off, val):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_prbs_soft_acc_prbs_counter_en")
+        logger.debug("set_prbs_soft_acc_prbs_counter_en")
         self.masked_write((addr_off << 11) + 0x500, 0x0001, 0x0001 if val else 0x0000)
 
     def get_prbs_soft_acc_prbs_reset(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_soft_acc_prbs_reset")
+        logger.debug("get_prbs_soft_acc_prbs_reset")
         return bool(self.masked_read((addr_off << 11) + 0x500, 0x0002))
 
     def set_prbs_soft_acc_prbs_reset(self, addr_off, val):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_prbs_soft_acc_prbs_reset")
+        logger.debug("set_prbs_soft_acc_prbs_reset")
         self.masked_write((addr_off << 11) + 0x500, 0x0002, 0x0002 if val else 0x0000)
 
     def get_prbs_soft_acc_prbs_snap(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_soft_acc_prbs_snap")
+        logger.debug("get_prbs_soft_acc_prbs_snap")
         return bool(self.masked_read((addr_off << 11) + 0x500, 0x0004))
 
     def set_prbs_soft_acc_prbs_snap(self, addr_off, val):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_prbs_soft_acc_prbs_snap")
+        logger.debug("set_prbs_soft_acc_prbs_snap")
         self.masked_write((addr_off << 11) + 0x500, 0x0004, 0x0004 if val else 0x0000)
 
     def get_prbs_soft_acc_prbs_done(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_soft_acc_prbs_done")
+        logger.debug("get_prbs_soft_acc_prbs_done")
         return bool(self.masked_read((addr_off << 11) + 0x500, 0x0008))
 
+    def read_prbs_soft_acc_block(self, addr_off, start=PRBS_SOFT_ACC_BASE, stop=PRBS_SOFT_ACC_BASE+PRBS_SOFT_ACC_LEN):
+        # one ranged read over registers start to stop-1 (addr << 2 stride)
+        return self.read(((addr_off << 11) + start) << 2, (stop-start)*4)
+
     def get_prbs_soft_acc_prbs_acc_err_cnt(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_soft_acc_prbs_acc_err_cnt")
-        val = 0
-        move_iter = 0
+        logger.debug("get_prbs_soft_acc_prbs_acc_err_cnt")
         # accumulated error count under addresses 0x507 - 0x501
-        for addr in range(0x501, 0x508):
-            # use only two bits from the most significant byte
-            if (addr == 0x507):
-                mask = 0x0003
-            else:
-                mask = 0x00FF
-            read = self.masked_read((addr_off << 11) + addr, mask)
-            # move each byte (8 * byte indicator) bits to the right
-            val += read << (move_iter * 8)
-            move_iter += 1
-        return val
+        data = self.read_prbs_soft_acc_block(addr_off, PRBS_SOFT_ACC_ERR_CNT, PRBS_SOFT_ACC_ERR_CNT+7)
+        return decode_prbs_soft_acc_cnt(data, PRBS_SOFT_ACC_ERR_CNT, PRBS_SOFT_ACC_ERR_CNT)
 
     def get_prbs_soft_acc_prbs_acc_bit_cnt(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: get_prbs_soft_acc_prbs_acc_bit_cnt")
-        val = 0
-        move_iter = 0
+        logger.debug("get_prbs_soft_acc_prbs_acc_bit_cnt")
         # accumulated bit count under addresses 0x513 - 0x50D
-        for addr in range(0x50D, 0x514):
-            # use only two bits from the most significant byte
-            if (addr == 0x513):
-                mask = 0x0003
-            else:
-                mask = 0x00FF
-            read = self.masked_read((addr_off << 11) + addr, mask)
-            # move each byte (8 * byte indicator) bits to the right
-            val += read << (move_iter * 8)
-            move_iter += 1
-        return val
+        data = self.read_prbs_soft_acc_block(addr_off, PRBS_SOFT_ACC_BIT_CNT, PRBS_SOFT_ACC_BIT_CNT+7)
+        return decode_prbs_soft_acc_cnt(data, PRBS_SOFT_ACC_BIT_CNT, PRBS_SOFT_ACC_BIT_CNT)
+
+    def get_prbs_soft_acc_cnt(self, addr_off):
+        # (error count, bit count) of one channel from a single snapshot
+        return self.snapshot_prbs_soft_acc([addr_off])[addr_off]
+
+    def snapshot_prbs_soft_acc(self, addr_offs, timeout=1.0):
+        # snapshot the accumulators of several channels together: set the
+        # snap bit on all of them, poll prbs_done on all of them, then read
+        # each accumulator block with one ranged read and put the snap bit
+        # back, batching every step across the channels; the read-only
+        # done bit is never written back
+        logger.debug("snapshot_prbs_soft_acc")
+        addr_offs = list(addr_offs)
+        ctrl_addr = {a: ((a << 11) + PRBS_SOFT_ACC_BASE) << 2 for a in addr_offs}
+
+        with self.interface.batch() as b:
+            txns = [b.read_word(self, ctrl_addr[a]) for a in addr_offs]
+        ctrl = {a: txn.result() for a, txn in zip(addr_offs, txns)}
+
+        with self.interface.batch() as b:
+            for a in addr_offs:
+                c = ctrl[a] & ~PRBS_SOFT_ACC_DONE
+                if c & PRBS_SOFT_ACC_SNAP:
+                    # a new snapshot needs a rising edge
+                    b.write_word(self, ctrl_addr[a], c & ~PRBS_SOFT_ACC_SNAP)
+                b.write_word(self, ctrl_addr[a], c | PRBS_SOFT_ACC_SNAP)
+
+        status = {}
+        pending = addr_offs
+        deadline = time.monotonic()+timeout
+        while pending:
+            with self.interface.batch() as b:
+                txns = [b.read_word(self, ctrl_addr[a]) for a in pending]
+            for a, txn in zip(pending, txns):
+                status[a] = txn.result()
+            pending = [a for a in pending if not status[a] & PRBS_SOFT_ACC_DONE]
+            if pending and time.monotonic() > deadline:
+                raise Exception("snapshot_prbs_soft_acc: timed out waiting for prbs_done on channel(s) " + ", ".join(str(a) for a in pending))
+
+        with self.interface.batch() as b:
+            txns = [b.read(self, ctrl_addr[a], PRBS_SOFT_ACC_LEN*4) for a in addr_offs]
+            for a in addr_offs:
+                c = status[a] & ~(PRBS_SOFT_ACC_SNAP | PRBS_SOFT_ACC_DONE)
+                b.write_word(self, ctrl_addr[a], c | (ctrl[a] & PRBS_SOFT_ACC_SNAP))
+
+        res = {}
+        for a, txn in zip(addr_offs, txns):
+            data = txn.result()
+            res[a] = (decode_prbs_soft_acc_cnt(data, PRBS_SOFT_ACC_ERR_CNT),
+                decode_prbs_soft_acc_cnt(data, PRBS_SOFT_ACC_BIT_CNT))
+        return res
 
     # function sets transceiver PRBS components to do BER measurement according to Intel example found on
     # https://community.intel.com/t5/FPGA-Wiki/High-Speed-Transceiver-Demo-Designs-Stratix-10-GX-Series/ta-p/735749
     # and downloaded via link https://www.intel.com/content/dam/altera-www/global/en_US/uploads/1/1c/Stratix10GX_software_lib.zip
     # no guide references for these operations have ben found in L- and H-Tile Transceiver PHY User Guide 683621 | 2022.07.20
     def set_transceiver_prbs_components(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_transceiver_prbs_components")
-        self.masked_write((addr_off << 11) + 0x164, 0x80, 0x80)
-        self.masked_write((addr_off << 11) + 0x210, 0x1F, 0x09)
-        self.masked_write((addr_off << 11) + 0x212, 0xE0, 0x00)
-        self.masked_write((addr_off << 11) + 0x213, 0xFF, 0x47)
-        self.masked_write((addr_off << 11) + 0x214, 0x01, 0x00)
-        self.masked_write((addr_off << 11) + 0x215, 0x01, 0x00)
-        self.masked_write((addr_off << 11) + 0x218, 0xC1, 0x40)
-        self.masked_write((addr_off << 11) + 0x223, 0x1F, 0x00)
-        self.masked_write((addr_off << 11) + 0x300, 0x3F, 0x00)
-        self.masked_write((addr_off << 11) + 0x312, 0xFF, 0x07)
-        self.masked_write((addr_off << 11) + 0x313, 0xFF, 0x02)
-        self.masked_write((addr_off << 11) + 0x315, 0x47, 0x00)
-        self.masked_write((addr_off << 11) + 0x318, 0x03, 0x02)
-        self.masked_write((addr_off << 11) + 0x31A, 0x1C, 0x04)
-        self.masked_write((addr_off << 11) + 0x320, 0x07, 0x02)
-        self.masked_write((addr_off << 11) + 0x321, 0x1E, 0x18)
-        self.masked_write((addr_off << 11) + 0x322, 0x73, 0x41)
+        logger.debug("set_transceiver_prbs_components")
+        self.apply_sequence(addr_off, TRANSCEIVER_PRBS_COMPONENTS_SEQ)
 
     # function sets PRBS generator and PRBS verifier
     def set_prbs_gen_and_ver(self, addr_off, \
@@ -453,19 +601,17 @@ class LTileHTileNode(node.MemoryNode):
             use_bounded_channels_config = False, \
             serializer_mode = 64, \
             deserializer_factor = 64):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_prbs_gen_and_ver")
-        self.set_prbs_gen_prbs_pat(addr_off, prbs_pattern)
-        self.set_prbs_ver_prbs_pat(addr_off, prbs_pattern)
-        self.set_prbs_gen_ser_mode(addr_off, serializer_mode)
-        self.masked_write((addr_off << 11) + 0x06, 0xCF, 0x44)
-        self.masked_write((addr_off << 11) + 0x0B, 0x0E, 0x00)
-        self.masked_write((addr_off << 11) + 0x0C, 0x0A, 0x00)
-        self.set_prbs_ver_deser_factor(addr_off, serializer_mode)
-        self.masked_write((addr_off << 11) + 0x0A, 0x80, 0x80)
-        self.masked_write((addr_off << 11) + 0x500, 0x07, 0x01)
+        logger.debug("set_prbs_gen_and_ver")
+        seq = []
+        seq += self.prbs_gen_prbs_pat_seq(prbs_pattern)
+        seq += self.prbs_ver_prbs_pat_seq(prbs_pattern)
+        seq += self.prbs_gen_ser_mode_seq(serializer_mode)
+        seq += [(0x06, 0xCF, 0x44), (0x0B, 0x0E, 0x00), (0x0C, 0x0A, 0x00)]
+        seq += self.prbs_ver_deser_factor_seq(serializer_mode)
+        seq += [(0x0A, 0x80, 0x80), (0x500, 0x07, 0x01)]
         if (use_bounded_channels_config):
-            self.set_transceiver_bounded_channels_configuration(addr_off)
+            seq += TRANSCEIVER_BOUNDED_CHANNELS_SEQ
+        self.apply_sequence(addr_off, seq)
 
     # function performs bounded channels transceiver configuration
     # reverse engineered from transceiver register space dump
@@ -473,24 +619,13 @@ class LTileHTileNode(node.MemoryNode):
     # neither Intel SW example perform these steps, nor they have not been described in
     # L- and H-Tile Transceiver PHY User Guide 683621 | 2022.07.20
     def set_transceiver_bounded_channels_configuration(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_transceiver_bounded_channels_configuration")
-        self.masked_write((addr_off << 11) + 0x0B, 0x02, 0x02)
-        self.masked_write((addr_off << 11) + 0x0C, 0x02, 0x02)
-        self.masked_write((addr_off << 11) + 0x10A, 0x01, 0x00)
-        self.masked_write((addr_off << 11) + 0x10B, 0x01, 0x01)
-        self.masked_write((addr_off << 11) + 0x111, 0x19, 0x18)
-        self.masked_write((addr_off << 11) + 0x123, 0xC0, 0x80)
-        self.masked_write((addr_off << 11) + 0x12A, 0x90, 0x90)
+        logger.debug("set_transceiver_bounded_channels_configuration")
+        self.apply_sequence(addr_off, TRANSCEIVER_BOUNDED_CHANNELS_SEQ)
 
     # function sets PRBS accumulator
     def set_prbs_soft_accumulator(self, addr_off):
-        if (PRINT_VERBOSITY >= PRINT_VERBOSITY_TRACE):
-            print("TRACE: set_prbs_soft_accumulator")
-        self.set_prbs_soft_acc_prbs_counter_en(addr_off, 1)
-        self.set_prbs_soft_acc_prbs_reset(addr_off, 1)
-        self.set_prbs_soft_acc_prbs_reset(addr_off, 0)
-        self.set_prbs_soft_acc_prbs_snap(addr_off, 0)
+        logger.debug("set_prbs_soft_accumulator")
+        self.apply_sequence(addr_off, PRBS_SOFT_ACCUMULATOR_SEQ)
         if (self.get_prbs_soft_acc_prbs_acc_err_cnt(addr_off)):
             raise Exception("set_prbs_soft_accumulator: PRBS error counter has not been reseted")
         if (self.get_prbs_soft_acc_prbs_acc_bit_cnt(addr_off)):
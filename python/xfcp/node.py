@@ -22,6 +22,9 @@ THE SOFTWARE.
 
 """
 
+import asyncio
+import bisect
+import heapq
 import struct
 
 from . import packet
@@ -38,23 +41,122 @@ def register(cls, ntype, prefix=16):
     node_types.append((cls, ntype, prefix))
 
 
-def enumerate_interface(interface, path=(), parent=None):
-    node = Node()
-    node.interface = interface
-    node.path = path
-    node.parent = parent
-    node.init()
-
+def match_type(ntype):
     match_cls = None
     match_prefix = 0
 
     for nt in node_types:
-        if node.ntype & (0xffff0000 >> nt[2]) == nt[1] and nt[2] > match_prefix:
+        if ntype & (0xffff0000 >> nt[2]) == nt[1] and nt[2] > match_prefix:
             match_cls = nt[0]
             match_prefix = nt[2]
 
+    return match_cls
+
+
+def coalesce(addrs, stride=1, gap=0):
+    # merge addresses into (start, count) runs of consecutive words, reading
+    # through holes of up to gap words to save a request
+    runs = []
+
+    for a in sorted(set(addrs)):
+        if runs and a <= runs[-1][0]+(runs[-1][1]+gap)*stride and (a-runs[-1][0]) % stride == 0:
+            runs[-1][1] = (a-runs[-1][0])//stride+1
+        else:
+            runs.append([a, 1])
+
+    return [tuple(r) for r in runs]
+
+
+def _subtree_range(paths, path):
+    # slice of a sorted path list holding the nodes below path
+    lo = bisect.bisect_right(paths, path)
+    if path:
+        hi = bisect.bisect_left(paths, path[:-1]+(path[-1]+1,), lo)
+    else:
+        hi = len(paths)
+    return paths[lo:hi]
+
+
+class NodeIndex(object):
+    # lookup tables for the nodes of one tree, filled in as nodes are
+    # enumerated; each table maps to a sorted list of paths, so the nodes
+    # below a given node are a contiguous range in tree (depth first) order
+    def __init__(self, root=None):
+        self.nodes = {}
+        self.names = {}
+        self.ntypes = {}
+        self.classes = {}
+        # switches with children not yet enumerated (lazy enumeration)
+        self.pending = set()
+
+        if root is not None:
+            lst = [root]
+            while lst:
+                n = lst.pop()
+                self.add(n)
+                lst.extend(n.children)
+
+    def _insert(self, table, key, path):
+        bisect.insort(table.setdefault(key, []), path)
+
+    def _delete(self, table, key, path):
+        lst = table[key]
+        del lst[bisect.bisect_left(lst, path)]
+        if not lst:
+            del table[key]
+
+    def add(self, node):
+        if node.path in self.nodes:
+            self.remove(self.nodes[node.path])
+
+        self.nodes[node.path] = node
+        self._insert(self.names, node.name, node.path)
+        self._insert(self.ntypes, node.ntype, node.path)
+        self._insert(self.classes, type(node), node.path)
+
+    def remove(self, node):
+        del self.nodes[node.path]
+        self._delete(self.names, node.name, node.path)
+        self._delete(self.ntypes, node.ntype, node.path)
+        self._delete(self.classes, type(node), node.path)
+        self.pending.discard(node.path)
+
+    def is_loaded(self, path=()):
+        return not any(p[:len(path)] == path for p in self.pending)
+
+    def get(self, path):
+        return self.nodes.get(tuple(path))
+
+    def get_by_name(self, name, path=()):
+        lst = _subtree_range(self.names.get(name, []), path)
+        return self.nodes[lst[0]] if lst else None
+
+    def _merge(self, keys, table, path):
+        lsts = [_subtree_range(table[k], path) for k in keys]
+        return [self.nodes[p] for p in heapq.merge(*lsts)]
+
+    def find_by_ntype(self, ntype, prefix=16, path=()):
+        mask = 0xffff0000 >> prefix
+        return self._merge([k for k in self.ntypes if k & mask == ntype & mask], self.ntypes, path)
+
+    def find_by_class(self, cls, path=()):
+        return self._merge([k for k in self.classes if issubclass(k, cls)], self.classes, path)
+
+
+def enumerate_interface(interface, path=(), parent=None, id_pkt=None):
+    node = Node()
+    node.interface = interface
+    node.path = path
+    node.parent = parent
+    node.index = parent.index if parent is not None and parent.index is not None else NodeIndex()
+    node.init(id_pkt)
+
+    match_cls = match_type(node.ntype)
+
     if match_cls is not None:
-        return match_cls(node).init()
+        node = match_cls(node).init()
+
+    node.index.add(node)
 
     return node
 
@@ -69,6 +171,7 @@ class Node(object):
         self.parent = None
         self.children = []
         self.id_pkt = None
+        self.index = None
 
         if isinstance(obj, Node):
             self.interface = obj.interface
@@ -77,16 +180,17 @@ class Node(object):
             self.name = obj.name
             self.ext_str = obj.ext_str
             self.parent = obj.parent
-            self.children = obj.children
+            # copy the child list as is, without triggering lazy enumeration
+            self.children = obj._children if '_children' in vars(obj) else obj.children
             self.id_pkt = obj.id_pkt
+            self.index = obj.index
 
     def init(self, id_pkt=None):
         if id_pkt is not None:
             self.id_pkt = id_pkt
 
         if self.id_pkt is None:
-            self.interface.send(packet.IDRequestPacket(path=self.path))
-            self.id_pkt = self.interface.receive()
+            self.id_pkt = self.interface.identify(self.path)
 
         self.ntype = struct.unpack_from('<H', self.id_pkt.payload, 0)[0]
         self.name = struct.unpack_from('16s', self.id_pkt.payload, 16)[0].rstrip(b'\x00').decode('utf-8')
@@ -96,6 +200,12 @@ class Node(object):
 
         return self
 
+    def get_index(self):
+        if self.index is None:
+            # tree not built by enumerate_interface
+            return NodeIndex(self)
+        return self.index
+
     def get_by_path(self, path):
         if type(path) is str:
             if len(path.strip()) == 0:
@@ -103,6 +213,11 @@ class Node(object):
             else:
                 path = [int(x) for x in path.split('.')]
 
+        if self.index is not None:
+            n = self.index.get(self.path+tuple(path))
+            if n is not None:
+                return n
+
         n = self
 
         for part in path:
@@ -114,34 +229,49 @@ class Node(object):
         return n
 
     def get_by_name(self, name, recursive=True):
-        for n in self.children:
-            if n.name == name:
-                return n
-            if recursive and len(n.children):
-                ret = n.get_by_name(name, recursive)
-                if ret:
-                    return ret
-        return None
+        if not recursive:
+            for n in self.children:
+                if n.name == name:
+                    return n
+            return None
 
-    def find_by_type(self, t, prefix=16):
-        l = []
+        self.load_subtree()
 
-        for n in self.children:
-            if type(t) is int:
-                if t & (0xffff0000 >> prefix) == n.ntype & (0xffff0000 >> prefix):
-                    l.append(n)
-            else:
-                if isinstance(n, t):
-                    l.append(n)
+        return self.get_index().get_by_name(name, self.path)
+
+    def load_subtree(self):
+        # identify all not yet enumerated nodes below this one (lazy
+        # enumeration), one tree level at a time
+        if self.index is not None and self.index.is_loaded(self.path):
+            return
+
+        level = [self]
+
+        while level:
+            pending = [n for n in level if isinstance(n, SwitchNode) and n._children is None]
 
-            l.extend(n.find_by_type(t, prefix))
+            if pending:
+                paths = [n.path+(p,) for n in pending for p in range(n.down_ports)]
+                pkts = iter(self.interface.get_id_pkts(paths))
+                for n in pending:
+                    n._children = [enumerate_interface(n.interface, n.path+(p,), n, next(pkts)) for p in range(n.down_ports)]
+                    n.index.pending.discard(n.path)
+
+            level = [c for n in level for c in n.children]
+
+    def find_by_type(self, t, prefix=16):
+        self.load_subtree()
 
-        return l
+        if type(t) is int:
+            return self.get_index().find_by_ntype(t, prefix, self.path)
+        return self.get_index().find_by_class(t, self.path)
 
     def path_string(self):
         return '.'.join(str(x) for x in self.path)
 
     def format_tree(self):
+        self.load_subtree()
+
         s = ''
         if len(self.path) > 0:
             s += '[{}] '.format(self.path_string())
@@ -201,13 +331,41 @@ class SwitchNode(Node):
             self.up_ports = obj.up_ports
             self.down_ports = obj.down_ports
 
+    @property
+    def children(self):
+        # None until first access with lazy enumeration
+        if self._children is None:
+            self._children = self.enumerate_children()
+            if self.index is not None:
+                self.index.pending.discard(self.path)
+        return self._children
+
+    @children.setter
+    def children(self, val):
+        self._children = val
+
+    def enumerate_children(self):
+        paths = [self.path+(p,) for p in range(self.down_ports)]
+
+        if getattr(self.interface, 'lazy', False):
+            # identify all down ports together
+            pkts = self.interface.get_id_pkts(paths)
+        else:
+            pkts = [None]*len(paths)
+
+        return [enumerate_interface(self.interface, p, self, pkt) for p, pkt in zip(paths, pkts)]
+
     def init(self, id_pkt=None):
         super().init(id_pkt)
 
         self.up_ports, self.down_ports = struct.unpack_from('BB', self.id_pkt.payload, 2)
 
-        for p in range(self.down_ports):
-            self.children.append(enumerate_interface(self.interface, self.path+(p,), self))
+        if getattr(self.interface, 'lazy', False):
+            self._children = None
+            if self.index is not None:
+                self.index.pending.add(self.path)
+        else:
+            self._children = self.enumerate_children()
 
         return self
 
@@ -231,28 +389,77 @@ class MemoryNode(Node):
 
         self.byte_addr_width = self.addr_width+((self.word_size-1)//8).bit_length()
 
+        self.read_template = None
+        self.write_template = None
+
+        if isinstance(obj, MemoryNode):
+            self.read_template = obj.read_template
+            self.write_template = obj.write_template
+
     def init(self, id_pkt=None):
         super().init(id_pkt)
 
         self.addr_width, self.data_width, self.word_size, self.count_width = struct.unpack_from('<HHHH', self.id_pkt.payload, 2)
         self.byte_addr_width = self.addr_width+((self.word_size-1)//8).bit_length()
 
+        # path and widths are fixed from here on, so precompile requests
+        self.read_template = packet.MemoryAccessTemplate(self.path, 0x10, self.byte_addr_width, self.count_width)
+        self.write_template = packet.MemoryAccessTemplate(self.path, 0x12, self.byte_addr_width, self.count_width)
+
         return self
 
-    def read(self, addr, count):
-        pkt = packet.ReadRequestPacket()
-        pkt.path = self.path
-        pkt.addr = addr
-        pkt.data = b''
-        pkt.count = count
-        pkt.addr_width = self.byte_addr_width
-        pkt.count_width = self.count_width
-        self.interface.send(pkt)
-        pkt = self.interface.receive()
+    def max_transfer_size(self):
+        # largest read or write that fits in a single request
+        size = 2**self.count_width-1
+
+        if self.interface.max_packet_size is not None:
+            # path/rpath, rpath tag, transaction tag, start tag, ptype, address, count
+            hdr = len(self.path)+1+packet.TAG_LEN+1+1+(self.byte_addr_width+7)//8+(self.count_width+7)//8
+            size = min(size, self.interface.max_packet_size-hdr)
+
+        # keep chunks aligned to the data width
+        step = max(self.data_width//8, 1)
+        if size >= step:
+            size -= size % step
+
+        return max(size, 1)
+
+    def parse_response(self, pkt):
         pkt.addr_width = self.byte_addr_width
         pkt.count_width = self.count_width
         pkt.parse()
-        return pkt.data
+        return pkt
+
+    def submit_read(self, addr, count, decode=None):
+        unpack = self.read_template.unpack
+        pkt = self.read_template.request(addr, count)
+        if decode is None:
+            return self.interface.submit(pkt, lambda pkt: bytes(unpack(pkt.payload)[2]))
+        # decode is handed a view into the response, not a copy
+        return self.interface.submit(pkt, lambda pkt: decode(unpack(pkt.payload)[2]))
+
+    def submit_read_int(self, addr, ws):
+        # single register read, decoded straight from the response
+        unpack = self.read_template.word_struct(ws).unpack_from
+        pkt = self.read_template.request(addr, ws)
+        return self.interface.submit(pkt, lambda pkt: unpack(pkt.payload)[-1])
+
+    def read(self, addr, count):
+        size = self.max_transfer_size()
+        if count <= size:
+            return self.submit_read(addr, count).result()
+
+        # split large reads, issuing all chunks before collecting responses
+        txns = [self.submit_read(addr+k, min(size, count-k), lambda data: data) for k in range(0, count, size)]
+        return b''.join(txn.result() for txn in txns)
+
+    async def read_async(self, addr, count):
+        size = self.max_transfer_size()
+        if count <= size:
+            return await self.submit_read(addr, count)
+
+        data = await asyncio.gather(*[self.submit_read(addr+k, min(size, count-k), lambda data: data) for k in range(0, count, size)])
+        return b''.join(data)
 
     def read_words(self, addr, count, ws=2):
         data = self.read(addr, count*ws)
@@ -261,6 +468,35 @@ class MemoryNode(Node):
             words.append(int.from_bytes(data[ws*k:ws*(k+1)], 'little'))
         return words
 
+    async def read_words_async(self, addr, count, ws=2):
+        data = await self.read_async(addr, count*ws)
+        words = []
+        for k in range(count):
+            words.append(int.from_bytes(data[ws*k:ws*(k+1)], 'little'))
+        return words
+
+    def read_scattered(self, addrs, ws=2, gap=0):
+        # one ranged read per run of adjacent words, all issued together
+        runs = coalesce(addrs, ws, gap)
+        with self.interface.batch() as b:
+            txns = [b.read_words(self, start, count, ws) for start, count in runs]
+
+        words = {}
+        for (start, count), txn in zip(runs, txns):
+            for k, w in enumerate(txn.result()):
+                words[start+k*ws] = w
+        return [words[a] for a in addrs]
+
+    async def read_scattered_async(self, addrs, ws=2, gap=0):
+        runs = coalesce(addrs, ws, gap)
+        data = await asyncio.gather(*[self.read_words_async(start, count, ws) for start, count in runs])
+
+        words = {}
+        for (start, count), d in zip(runs, data):
+            for k, w in enumerate(d):
+                words[start+k*ws] = w
+        return [words[a] for a in addrs]
+
     def read_dwords(self, addr, count):
         return self.read_words(addr, count, 4)
 
@@ -268,31 +504,58 @@ class MemoryNode(Node):
         return self.read_words(addr, count, 8)
 
     def read_byte(self, addr):
-        return self.read(addr, 1)[0]
+        return self.submit_read_int(addr, 1).result()
 
     def read_word(self, addr):
-        return self.read_words(addr, 1)[0]
+        return self.submit_read_int(addr, 2).result()
 
     def read_dword(self, addr):
-        return self.read_dwords(addr, 1)[0]
+        return self.submit_read_int(addr, 4).result()
 
     def read_qword(self, addr):
-        return self.read_qwords(addr, 1)[0]
+        return self.submit_read_int(addr, 8).result()
+
+    async def read_dwords_async(self, addr, count):
+        return await self.read_words_async(addr, count, 4)
+
+    async def read_qwords_async(self, addr, count):
+        return await self.read_words_async(addr, count, 8)
+
+    async def read_byte_async(self, addr):
+        return await self.submit_read_int(addr, 1)
+
+    async def read_word_async(self, addr):
+        return await self.submit_read_int(addr, 2)
+
+    async def read_dword_async(self, addr):
+        return await self.submit_read_int(addr, 4)
+
+    async def read_qword_async(self, addr):
+        return await self.submit_read_int(addr, 8)
+
+    def submit_write(self, addr, data):
+        unpack = self.write_template.unpack
+        pkt = self.write_template.request(addr, len(data), data)
+        return self.interface.submit(pkt, lambda pkt: unpack(pkt.payload)[1])
 
     def write(self, addr, data):
-        pkt = packet.WriteRequestPacket()
-        pkt.path = self.path
-        pkt.addr = addr
-        pkt.data = data
-        pkt.count = len(data)
-        pkt.addr_width = self.byte_addr_width
-        pkt.count_width = self.count_width
-        self.interface.send(pkt)
-        pkt = self.interface.receive()
-        pkt.addr_width = self.byte_addr_width
-        pkt.count_width = self.count_width
-        pkt.parse()
-        return pkt.count
+        size = self.max_transfer_size()
+        if len(data) <= size:
+            return self.submit_write(addr, data).result()
+
+        # split large writes, issuing all chunks before collecting responses
+        view = memoryview(data)
+        txns = [self.submit_write(addr+k, view[k:k+size]) for k in range(0, len(data), size)]
+        return sum(txn.result() for txn in txns)
+
+    async def write_async(self, addr, data):
+        size = self.max_transfer_size()
+        if len(data) <= size:
+            return await self.submit_write(addr, data)
+
+        view = memoryview(data)
+        counts = await asyncio.gather(*[self.submit_write(addr+k, view[k:k+size]) for k in range(0, len(data), size)])
+        return sum(counts)
 
     def write_words(self, addr, data, ws=2):
         words = data
@@ -301,6 +564,27 @@ class MemoryNode(Node):
             data += w.to_bytes(ws, 'little')
         return int(self.write(addr, data)/ws)
 
+    async def write_words_async(self, addr, data, ws=2):
+        words = data
+        data = b''
+        for w in words:
+            data += w.to_bytes(ws, 'little')
+        return int(await self.write_async(addr, data)/ws)
+
+    def write_scattered(self, addrs, data, ws=2):
+        # one ranged write per run of adjacent words, all issued together
+        words = dict(zip(addrs, data))
+        runs = coalesce(words, ws)
+        with self.interface.batch() as b:
+            txns = [b.write_words(self, start, [words[start+k*ws] for k in range(count)], ws) for start, count in runs]
+        return sum(txn.result() for txn in txns)//ws
+
+    async def write_scattered_async(self, addrs, data, ws=2):
+        words = dict(zip(addrs, data))
+        runs = coalesce(words, ws)
+        counts = await asyncio.gather(*[self.write_words_async(start, [words[start+k*ws] for k in range(count)], ws) for start, count in runs])
+        return sum(counts)
+
     def write_dwords(self, addr, data):
         return self.write_words(addr, data, 4)
 
@@ -308,7 +592,7 @@ class MemoryNode(Node):
         return self.write_words(addr, data, 8)
 
     def write_byte(self, addr, data):
-        return self.write(addr, [data])
+        return self.write(addr, bytes([data]))
 
     def write_word(self, addr, data):
         return self.write_words(addr, [data])
@@ -319,4 +603,22 @@ class MemoryNode(Node):
     def write_qword(self, addr, data):
         return self.write_qwords(addr, [data])
 
+    async def write_dwords_async(self, addr, data):
+        return await self.write_words_async(addr, data, 4)
+
+    async def write_qwords_async(self, addr, data):
+        return await self.write_words_async(addr, data, 8)
+
+    async def write_byte_async(self, addr, data):
+        return await self.write_async(addr, bytes([data]))
+
+    async def write_word_async(self, addr, data):
+        return await self.write_words_async(addr, [data])
+
+    async def write_dword_async(self, addr, data):
+        return await self.write_dwords_async(addr, [data])
+
+    async def write_qword_async(self, addr, data):
+        return await self.write_qwords_async(addr, [data])
+
 register(MemoryNode, 0x8000, 1)
@@ -24,8 +24,54 @@ THE SOFTWARE.
 
 import struct
 
+# length of the rpath tag used to match pipelined requests and responses
+TAG_LEN = 2
+TAG_COUNT = 0xfe**TAG_LEN
+
 packet_types = {}
 
+# struct codes for little-endian address and count fields
+_int_codes = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+_structs = {}
+
+# bytes searched for the path terminator before falling back to the whole
+# packet
+_HEAD_LEN = 64
+
+
+def _field_struct(n, aw, cw):
+    # cached struct for n header bytes followed by an address/count field pair
+    key = (n, aw, cw)
+    s = _structs.get(key)
+    if s is None:
+        s = struct.Struct('<%dB%s%s' % (n, _int_codes.get(aw, '%ds' % aw), _int_codes.get(cw, '%ds' % cw)))
+        _structs[key] = s
+    return s
+
+
+def _split(data):
+    # locate the rpath delimiter and path terminator without copying the data
+    if isinstance(data, (bytes, bytearray)):
+        head = data
+    else:
+        # the header is short, so search a copy of its first bytes only
+        data = memoryview(data).cast('B')
+        head = bytes(data[:_HEAD_LEN])
+        if 0xFF not in head:
+            head = bytes(data)
+
+    end = head.index(0xFF)
+    rp = head.find(0xFE, 0, end)
+
+    if rp < 0:
+        path = tuple(head[:end])
+        rpath = ()
+    else:
+        path = tuple(head[:rp])
+        rpath = tuple(head[rp+1:end])
+
+    return path, rpath, data[end+1], memoryview(data)[end+2:]
+
 
 def register(cls, ptype):
     if ptype in packet_types:
@@ -35,16 +81,13 @@ def register(cls, ptype):
 
 
 def parse(data):
-    pkt = Packet()
-    pkt.parse(data)
-
-    if pkt.ptype in packet_types:
-        return packet_types[pkt.ptype](pkt)
-
-    return pkt
+    path, rpath, ptype, payload = _split(data)
+    return packet_types.get(ptype, Packet)(payload, path, rpath, ptype)
 
 
 class Packet(object):
+    __slots__ = ('payload', 'path', 'rpath', 'ptype')
+
     def __init__(self, payload=b'', path=(), rpath=(), ptype=0):
         self.payload = payload
         self.path = path
@@ -52,66 +95,35 @@ class Packet(object):
         self.ptype = ptype
 
         if isinstance(payload, Packet):
-            self.payload = bytes(payload.payload)
+            self.payload = payload.payload
             self.path = tuple(payload.path)
             self.rpath = tuple(payload.rpath)
             self.ptype = payload.ptype
 
-    def build(self):
-        data = bytearray()
-
-        for p in self.path:
-            data.append(p)
-
-        if len(self.rpath) > 0:
-            data.append(0xFE)
-            for p in self.rpath:
-                data.append(p)
+    def header(self):
+        if self.rpath:
+            return (*self.path, 0xFE, *self.rpath, 0xFF, self.ptype)
+        return (*self.path, 0xFF, self.ptype)
 
-        data.append(0xFF)
-        data.append(self.ptype)
-
-        data.extend(self.payload)
-
-        return bytes(data)
+    def build(self):
+        # a single concatenation copies the payload once and yields bytes
+        return bytes(self.header()) + self.payload
 
     def parse(self, data):
-        i = 0
-
-        data = bytearray(data)
-
-        self.path = []
-        self.rpath = []
-
-        while i < len(data) and data[i] < 0xFE:
-            self.path.append(data[i])
-            i += 1
-
-        if data[i] == 0xFE:
-            i += 1
-            while i < len(data) and data[i] < 0xFE:
-                self.rpath.append(data[i])
-                i += 1
-
-        assert data[i] == 0xFF
-        i += 1
-
-        self.ptype = data[i]
-        i += 1
-
-        self.payload = bytes(data[i:])
+        # payload is a view of data, not a copy
+        self.path, self.rpath, self.ptype, self.payload = _split(data)
 
     def __eq__(self, other):
         if isinstance(other, Packet):
-            return (self.path == other.path and
-                self.rpath == other.rpath and
+            return (tuple(self.path) == tuple(other.path) and
+                tuple(self.rpath) == tuple(other.rpath) and
                 self.ptype == other.ptype and
                 self.payload == other.payload)
         return False
 
     def __repr__(self):
         return (
-            f"{type(self).__name__}(payload={self.payload}, "
+            f"{type(self).__name__}(payload={bytes(self.payload)}, "
             f"path={self.path}, "
             f"rpath={self.rpath}, "
             f"ptype={self.ptype:#x})"
@@ -119,6 +131,8 @@ class Packet(object):
 
 
 class IDRequestPacket(Packet):
+    __slots__ = ()
+
     def __init__(self, payload=b'', path=(), rpath=(), ptype=0xfe):
         super().__init__(payload, path, rpath, ptype)
 
@@ -126,6 +140,8 @@ register(IDRequestPacket, 0xfe)
 
 
 class IDResponsePacket(Packet):
+    __slots__ = ()
+
     def __init__(self, payload=b'', path=(), rpath=(), ptype=0xff):
         super().__init__(payload, path, rpath, ptype)
 
@@ -133,6 +149,8 @@ register(IDResponsePacket, 0xff)
 
 
 class MemoryAccessPacket(Packet):
+    __slots__ = ('addr', 'count', 'data', 'addr_width', 'count_width')
+
     def __init__(self, payload=b'', path=(), rpath=(), ptype=0):
         super().__init__(payload, path, rpath, ptype)
 
@@ -152,11 +170,15 @@ class MemoryAccessPacket(Packet):
     def build(self):
         aw = (self.addr_width+7)//8
         cw = (self.count_width+7)//8
-        self.payload = self.addr.to_bytes(aw, 'little')
-        self.payload += self.count.to_bytes(cw, 'little')
-        self.payload += self.data
 
-        return super().build()
+        hdr = self.header()
+        s = _field_struct(len(hdr), aw, cw)
+
+        addr = self.addr if aw in _int_codes else self.addr.to_bytes(aw, 'little')
+        count = self.count if cw in _int_codes else self.count.to_bytes(cw, 'little')
+
+        # header, address and count in one pack, data copied in behind
+        return s.pack(*hdr, addr, count) + self.data
 
     def parse(self, data=None):
         if data is not None:
@@ -164,25 +186,30 @@ class MemoryAccessPacket(Packet):
 
         aw = (self.addr_width+7)//8
         cw = (self.count_width+7)//8
-        self.addr = int.from_bytes(self.payload[0:aw], 'little')
-        self.count = int.from_bytes(self.payload[aw:aw+cw], 'little')
-        self.data = self.payload[aw+cw:]
+        s = _field_struct(0, aw, cw)
+
+        addr, count = s.unpack_from(self.payload)
+        self.addr = addr if aw in _int_codes else int.from_bytes(addr, 'little')
+        self.count = count if cw in _int_codes else int.from_bytes(count, 'little')
+        self.data = memoryview(self.payload)[s.size:]
 
     def __repr__(self):
         return (
-            f"{type(self).__name__}(payload={self.payload}, "
+            f"{type(self).__name__}(payload={bytes(self.payload)}, "
             f"path={self.path}, "
             f"rpath={self.rpath}, "
             f"ptype={self.ptype:#x}, "
             f"addr={self.addr:#x}, "
             f"count={self.count}, "
-            f"data={self.data}, "
+            f"data={bytes(self.data)}, "
             f"addr_width={self.addr_width}, "
             f"count_width={self.count_width})"
         )
 
 
 class ReadRequestPacket(MemoryAccessPacket):
+    __slots__ = ()
+
     def __init__(self, payload=b'', path=(), rpath=(), ptype=0x10):
         super().__init__(payload, path, rpath, ptype)
 
@@ -190,6 +217,8 @@ register(ReadRequestPacket, 0x10)
 
 
 class ReadResponsePacket(MemoryAccessPacket):
+    __slots__ = ()
+
     def __init__(self, payload=b'', path=(), rpath=(), ptype=0x11):
         super().__init__(payload, path, rpath, ptype)
 
@@ -197,6 +226,8 @@ register(ReadResponsePacket, 0x11)
 
 
 class WriteRequestPacket(MemoryAccessPacket):
+    __slots__ = ()
+
     def __init__(self, payload=b'', path=(), rpath=(), ptype=0x12):
         super().__init__(payload, path, rpath, ptype)
 
@@ -208,7 +239,104 @@ register(WriteRequestPacket, 0x12)
 
 
 class WriteResponsePacket(MemoryAccessPacket):
+    __slots__ = ()
+
     def __init__(self, payload=b'', path=(), rpath=(), ptype=0x13):
         super().__init__(payload, path, rpath, ptype)
 
 register(WriteResponsePacket, 0x13)
+
+
+class TemplatePacket(Packet):
+    __slots__ = ('template', 'addr', 'count', 'data')
+
+    def __init__(self, template, addr=0, count=0, data=b'', rpath=()):
+        super().__init__(b'', template.path, rpath, template.ptype)
+
+        self.template = template
+        self.addr = addr
+        self.count = count
+        self.data = data
+
+    def build(self):
+        return self.template.build(self.addr, self.count, self.data, self.rpath)
+
+
+class MemoryAccessTemplate(object):
+    """Precompiled memory access requests to a fixed path
+
+    Encodes the path and ptype once; requests are then packed with a single
+    cached struct and responses unpacked with one unpack_from.
+    """
+
+    __slots__ = ('path', 'ptype', 'addr_width', 'count_width', 'fields', '_aw', '_cw', '_prefix', '_suffix', '_requests', '_responses')
+
+    def __init__(self, path=(), ptype=0x10, addr_width=32, count_width=16):
+        self.path = tuple(path)
+        self.ptype = ptype
+        self.addr_width = addr_width
+        self.count_width = count_width
+
+        aw = (addr_width+7)//8
+        cw = (count_width+7)//8
+
+        # odd widths go through to_bytes
+        self._aw = None if aw in _int_codes else aw
+        self._cw = None if cw in _int_codes else cw
+
+        self.fields = _int_codes.get(aw, '%ds' % aw) + _int_codes.get(cw, '%ds' % cw)
+
+        self._prefix = bytes(self.path)
+        self._suffix = bytes([0xFF, ptype])
+        self._requests = {}
+        self._responses = {}
+
+    def request(self, addr, count, data=b''):
+        return TemplatePacket(self, addr, count, data)
+
+    def request_struct(self, rpath_len=0):
+        s = self._requests.get(rpath_len)
+        if s is None:
+            if rpath_len:
+                s = struct.Struct('<%dsB%dB2s%s' % (len(self._prefix), rpath_len, self.fields))
+            else:
+                s = struct.Struct('<%ds2s%s' % (len(self._prefix), self.fields))
+            self._requests[rpath_len] = s
+        return s
+
+    def response_struct(self, fmt=''):
+        # response payload: address and count followed by fmt
+        s = self._responses.get(fmt)
+        if s is None:
+            s = struct.Struct('<' + self.fields + fmt)
+            self._responses[fmt] = s
+        return s
+
+    def word_struct(self, ws):
+        # response payload: address and count followed by one ws byte word
+        return self.response_struct(_int_codes[ws])
+
+    def build(self, addr, count, data=b'', rpath=()):
+        if self._aw:
+            addr = addr.to_bytes(self._aw, 'little')
+        if self._cw:
+            count = count.to_bytes(self._cw, 'little')
+
+        s = self.request_struct(len(rpath))
+
+        if rpath:
+            args = (self._prefix, 0xFE, *rpath, self._suffix, addr, count)
+        else:
+            args = (self._prefix, self._suffix, addr, count)
+
+        return s.pack(*args) + data
+
+    def unpack(self, payload):
+        # address, count and a view of the data
+        s = self.response_struct()
+        addr, count = s.unpack_from(payload)
+        if self._aw:
+            addr = int.from_bytes(addr, 'little')
+        if self._cw:
+            count = int.from_bytes(count, 'little')
+        return addr, count, memoryview(payload)[s.size:]
@@ -36,6 +36,7 @@ def main():
     parser.add_argument('-p', '--port', type=str, default='/dev/ttyUSB0', help="Port")
     parser.add_argument('-b', '--baud', type=int, default=115200, help="Baud rate")
     parser.add_argument('-H', '--host', type=str, help="Host (i.e. 192.168.1.128:14000)")
+    parser.add_argument('--no_cache', action='store_true', help="Do not use the enumeration cache")
     parser.add_argument('--enum', action='store_true', help="Enumerate modules")
     parser.add_argument('--id', type=str, nargs=1, metavar=('PATH',), action='append', help="Identify module")
     parser.add_argument('--write', type=str, nargs=3, metavar=('PATH', 'ADDR', 'DATA'), action='append', help="Memory write")
@@ -59,7 +60,12 @@ def main():
         # serial interface
         intf = xfcp.interface.SerialInterface(port, baud)
 
-    n = intf.enumerate()
+    # the tree is printed with --enum and when nothing else is asked for;
+    # it has to show the live design, so the cache is bypassed for it
+    actions = (args.id, args.write, args.read, args.write_i2c, args.read_i2c, args.enum_i2c)
+    live = args.enum or all(a is None for a in actions)
+
+    n = intf.enumerate(cache=not (args.no_cache or live))
 
     do_enumerate = args.enum
 
@@ -140,10 +146,8 @@ def main():
                 print("Error: invalid path (%s)" % path)
             elif isinstance(n2, xfcp.i2c_node.I2CNode):
                 s = "%s I2C bus device addresses: " % path
-                for k in range(128):
-                    n2.read_i2c(k, 1)
-                    if n2.get_i2c_status() == 0:
-                        s += hex(k) + " "
+                for k in n2.scan():
+                    s += hex(k) + " "
                 print(s)
             else:
                 print("Error: not a I2CNode (%s)" % path)